@@ -0,0 +1,34 @@
+# railway/lazy.py
+# --- Ліниві імпорти важких бібліотек (pandas, plotly, bokeh, numpy, psutil) ---
+# pd = LazyModule('pandas') нічого не імпортує: справжній import відбувається при першому
+# зверненні до атрибута (pd.DataFrame). CRUD-сторінки, яким аналітика не потрібна,
+# не платять за неї ні часом старту воркера, ні RSS.
+import importlib
+import threading
+
+
+class LazyModule:
+    __slots__ = ('_name', '_module', '_lock')
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<LazyModule '{self._name}' ({state})>"
@@ -0,0 +1,47 @@
+# railway/middleware.py
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .querycount import collect_queries
+
+logger = logging.getLogger(__name__)
+
+
+class QueryInspectorMiddleware:
+    """
+    Opt-in (QUERY_INSPECTOR_ENABLED): рахує SQL-запити і час БД на кожен запит,
+    додає заголовки X-DB-Queries / X-DB-Time (мс), позначає ймовірні N+1
+    (X-DB-Duplicates) і перевіряє бюджет QUERY_BUDGETS[url_name].
+    З QUERY_BUDGET_STRICT=True перевищення бюджету кидає QueryBudgetExceeded.
+    Запити, виконані під час ітерації StreamingHttpResponse, не враховуються.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSPECTOR_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_queries() as stats:
+            response = self.get_response(request)
+
+        response['X-DB-Queries'] = str(stats.count)
+        response['X-DB-Time'] = f"{stats.duration * 1000:.2f}"
+
+        duplicates = stats.duplicates(settings.QUERY_DUPLICATE_THRESHOLD)
+        if duplicates:
+            response['X-DB-Duplicates'] = str(sum(duplicates.values()))
+            for shape, n in duplicates.items():
+                logger.warning("Ймовірний N+1 у %s: %dx %s", request.path, n, shape[:200])
+
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        budget = settings.QUERY_BUDGETS.get(url_name, settings.QUERY_BUDGET_DEFAULT)
+        if budget is not None and stats.count > budget:
+            response['X-DB-Budget-Exceeded'] = f"{stats.count}/{budget}"
+            if settings.QUERY_BUDGET_STRICT:
+                stats.check_budget(budget, request.path, settings.QUERY_DUPLICATE_THRESHOLD)
+            logger.warning("%s: %d SQL-запитів при бюджеті %d", request.path, stats.count, budget)
+        return response
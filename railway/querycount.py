@@ -0,0 +1,66 @@
+# railway/querycount.py
+# --- Підрахунок SQL-запитів: спільна частина для middleware і тестів ---
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+
+# Однакові за формою запити з різною кількістю параметрів IN (...) - одна "форма"
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+def query_shape(sql: str) -> str:
+    return _NUMBER.sub('?', _IN_LIST.sub('(...)', sql))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Перевищено бюджет запитів (AssertionError, щоб валити тести)."""
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обгортка для connection.execute_wrapper()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def duplicates(self, threshold: int):
+        """Форми запитів, що повторились threshold+ разів - ймовірний N+1."""
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+    def check_budget(self, max_queries, label='', duplicate_threshold=None):
+        if max_queries is not None and self.count > max_queries:
+            details = ''
+            if duplicate_threshold:
+                details = ''.join(f"\n  {n}x {shape[:200]}" for shape, n in self.duplicates(duplicate_threshold).items())
+            raise QueryBudgetExceeded(f"{label or 'Блок'}: {self.count} SQL-запитів при бюджеті {max_queries}{details}")
+
+
+@contextmanager
+def collect_queries():
+    stats = QueryStats()
+    with connection.execute_wrapper(stats):
+        yield stats
+
+
+@contextmanager
+def query_budget(max_queries, duplicate_threshold=3, label=''):
+    """
+    Для тестів: with query_budget(5): client.get(url)
+    Падає з QueryBudgetExceeded і списком повторюваних запитів, якщо їх більше за max_queries.
+    """
+    with collect_queries() as stats:
+        yield stats
+    stats.check_budget(max_queries, label, duplicate_threshold)
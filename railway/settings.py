@@ -49,11 +49,22 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
 }
+# Розмір сторінки для keyset-пагінації list() у REST (?limit= може змінити до API_MAX_PAGE_SIZE).
+# Не REST_FRAMEWORK['PAGE_SIZE']: без DEFAULT_PAGINATION_CLASS DRF видає попередження W001
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+# Максимум id в одному ?ids=1,2,3 (пакетне читання list() у REST)
+API_MAX_BATCH_IDS = 1000
+# Скільки id в одному IN (...) у BaseRepository.get_many
+REPOSITORY_GET_MANY_CHUNK_SIZE = 500
+# Рядків в одному UPDATE/INSERT у BaseRepository.bulk_update/upsert
+REPOSITORY_BULK_BATCH_SIZE = 500
 
 
 MIDDLEWARE = [
+    'railway.middleware.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,7 +107,11 @@ DATABASES = {
         'PORT': '3306',
         'OPTIONS': {
             'init_command' : "SET sql_mode='STRICT_TRANS_TABLES'"
-        }
+        },
+        # Постійні з'єднання: кожен потік (у т.ч. воркери tickets.executor) тримає своє
+        # з'єднання до CONN_MAX_AGE секунд і перевіряє його живість перед повторним використанням
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 300)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -152,3 +167,98 @@ LOGIN_URL = '/register/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Аналітика: матеріалізовані знімки (tickets.repositories.RepositoryManager)
+# Знімок старший за ANALYTICS_SNAPSHOT_MAX_AGE секунд вважається застарілим.
+ANALYTICS_SNAPSHOT_MAX_AGE = 300
+# True - застарілий знімок перераховується під час запиту;
+# False - оновлення лише командою `manage.py refresh_analytics`.
+ANALYTICS_SNAPSHOT_REFRESH_ON_READ = True
+# Максимальний топ-N пасажирів на дашбордах (LIMIT по індексу Passenger.total_spent)
+ANALYTICS_TOP_N_MAX = 50
+
+# Розмір пачки bulk_create для TicketRepository.bulk_sell (/api/tickets/bulk/)
+TICKETS_BULK_CHUNK_SIZE = 500
+TICKETS_BULK_CHUNK_SIZE_MAX = 5000
+
+# Потоковий експорт /api/export/<entity>/: рядків на один запит до БД
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CHUNK_SIZE_MAX = 10000
+
+# Лічильник SQL-запитів (railway.middleware.QueryInspectorMiddleware), вмикається явно:
+# QUERY_INSPECTOR=1 python manage.py runserver
+QUERY_INSPECTOR_ENABLED = os.environ.get('QUERY_INSPECTOR') == '1'
+# Однакова форма запиту стільки разів за один HTTP-запит - ймовірний N+1
+QUERY_DUPLICATE_THRESHOLD = 3
+# Бюджет запитів по url name; None - без обмеження
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {
+    'tickets_list': 5,
+    'ticket_detail': 5,
+    'passenger_list': 5,
+    'trip_list': 5,
+    'cashier_list': 5,
+    # REST: автентифікація + сторінка / пакет ?ids= / один рядок
+    'passengers-list': 3,
+    'passengers-detail': 3,
+    'cashiers-list': 3,
+    'cashiers-detail': 3,
+    'trips-list': 3,
+    'trips-detail': 3,
+}
+# True - перевищення бюджету кидає QueryBudgetExceeded (валить тести)
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT') == '1'
+
+# Кеші: 'default' - версії аналітики, фрагменти графіків, звіти; 'repository' - читання репозиторіїв.
+# Бекенд кешу репозиторіїв - REPOSITORY_CACHE_BACKEND: locmem (LRU у процесі), file або redis
+# (спільний для всіх воркерів; LRU - maxmemory-policy allkeys-lru на сервері, потрібен пакет redis).
+# locmem/file інвалідуються лише у своєму процесі/хості - з кількома воркерами тримайте TTL короткими або беріть redis.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+REPOSITORY_CACHE_BACKEND = os.environ.get('REPOSITORY_CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS['locmem'],
+        'LOCATION': 'railway-default',
+    },
+    'repository': {
+        'BACKEND': CACHE_BACKENDS[REPOSITORY_CACHE_BACKEND],
+        'LOCATION': {
+            'locmem': 'railway-repository',
+            'file': str(BASE_DIR / '.cache' / 'repository'),
+            'redis': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }[REPOSITORY_CACHE_BACKEND],
+        # Для locmem/file: понад MAX_ENTRIES витісняється 1/CULL_FREQUENCY найстаріших (locmem - за LRU)
+        'OPTIONS': {} if REPOSITORY_CACHE_BACKEND == 'redis' else {'MAX_ENTRIES': 5000, 'CULL_FREQUENCY': 4},
+        'KEY_PREFIX': 'railway',
+    },
+}
+
+# Read-through кеш репозиторіїв (tickets.cache), вмикається явно: REPOSITORY_CACHE=1
+REPOSITORY_CACHE_ENABLED = os.environ.get('REPOSITORY_CACHE') == '1'
+REPOSITORY_CACHE_ALIAS = 'repository'
+# TTL (секунд) по моделях; моделі без запису не кешуються
+REPOSITORY_CACHE_TTL = {
+    'tickets.TicketOffice': 3600,
+    'tickets.Cashier': 300,
+    'tickets.Trip': 60,
+    'tickets.Passenger': 60,
+}
+
+# Кеш /api/reports/summary/ (секунд)
+REPORT_SUMMARY_CACHE_TTL = 60
+
+# Кеш готових HTML-фрагментів графіків дашборду (секунд); інвалідовується версією даних
+CHART_CACHE_TTL = 600
+
+# Спільний пул потоків tickets.executor для паралельних запитів до БД (аналітика, benchmark).
+# Кожен воркер тримає одне постійне з'єднання, тож це і є розмір пулу з'єднань:
+# разом з потоками веб-сервера має вміщатись у max_connections MySQL.
+DB_EXECUTOR_WORKERS = int(os.environ.get('DB_EXECUTOR_WORKERS', 8))
+
+# Результати `manage.py benchmark` (за замовчуванням); сторінка /performance/ лише показує цей файл
+BENCHMARK_RESULTS_FILE = Path(os.environ.get('BENCHMARK_RESULTS_FILE', BASE_DIR / 'benchmarks' / 'latest.json'))
@@ -0,0 +1,176 @@
+// Клієнтський Bokeh-дашборд (/dashboard/v2/?mode=client).
+// Фігури будуються один раз через BokehJS API, а при зміні фільтрів
+// з /api/analytics/<chart>/ тягнуться лише колонки і підміняється source.data.
+(function () {
+  var root = document.getElementById("dashboardClient");
+  var form = document.getElementById("filtersForm");
+  if (!root || !form || typeof Bokeh === "undefined") return;
+
+  var apiBase = root.dataset.api;
+  var plt = Bokeh.Plotting;
+  var TOOLS = "pan,wheel_zoom,box_zoom,reset,save";
+
+  // Ті самі палітри, що й у серверній версії (Category20c[20], Viridis)
+  var CATEGORY20C = ["#3182bd", "#6baed6", "#9ecae1", "#c6dbef", "#e6550d", "#fd8d3c", "#fdae6b", "#fdd0a2",
+                     "#31a354", "#74c476", "#a1d99b", "#c7e9c0", "#756bb1", "#9e9ac8", "#bcbddc", "#dadaeb",
+                     "#636363", "#969696", "#bdbdbd", "#d9d9d9"];
+  var VIRIDIS = ["#440154", "#482374", "#404387", "#345E8D", "#29788E", "#208F8C",
+                 "#22A784", "#42BE71", "#79D151", "#BADE27", "#FDE724"];
+
+  function hover(tooltips) {
+    return new Bokeh.HoverTool({tooltips: tooltips});
+  }
+
+  // --- Опис графіків: побудова фігури + підготовка даних + підпис ---
+  var CHARTS = {
+    revenue: {
+      build: function (source) {
+        var p = plt.figure({x_range: new Bokeh.FactorRange({factors: []}), height: 350, tools: TOOLS});
+        p.segment({x0: {field: "x"}, y0: 0, x1: {field: "x"}, y1: {field: "y"}, line_width: 2, color: "#390650", source: source});
+        p.scatter({x: {field: "x"}, y: {field: "y"}, size: 15, fill_color: "#390650", line_color: "white", line_width: 2, source: source});
+        p.add_tools(hover([["Рейс", "@x"], ["Маршрут", "@route"], ["Сума", "@y{0.00} грн"]]));
+        return p;
+      },
+      update: function (p, data) { p.x_range.factors = data.x; },
+      title: function (f) { return "1. Прибуток > " + f.min_revenue + " грн"; },
+      key: "x"
+    },
+    cashiers: {
+      build: function (source) {
+        var p = plt.figure({height: 350, tools: TOOLS, x_range: [-0.5, 1.0]});
+        p.wedge({x: 0, y: 1, radius: 0.4, start_angle: {field: "start"}, end_angle: {field: "end"},
+                 line_color: "white", fill_color: {field: "color"}, legend_field: "name", source: source});
+        p.xaxis.visible = false;
+        p.yaxis.visible = false;
+        p.xgrid.grid_line_color = null;
+        p.ygrid.grid_line_color = null;
+        return p;
+      },
+      // Кути сегментів рахуються тут, API віддає лише суми
+      prepare: function (data) {
+        var total = data.sales.reduce(function (a, b) { return a + b; }, 0) || 1;
+        var angle = 0;
+        data.start = [];
+        data.end = [];
+        data.color = [];
+        data.sales.forEach(function (sales, i) {
+          data.start.push(angle);
+          angle += sales / total * 2 * Math.PI;
+          data.end.push(angle);
+          data.color.push(CATEGORY20C[i % CATEGORY20C.length]);
+        });
+        return data;
+      },
+      title: function () { return "2. Частка продажів касирів"; },
+      key: "name"
+    },
+    occupancy: {
+      build: function (source) {
+        var p = plt.figure({y_range: new Bokeh.FactorRange({factors: []}), height: 350, tools: TOOLS});
+        var mapper = new Bokeh.LinearColorMapper({palette: VIRIDIS, low: 0, high: 100});
+        p.hbar({y: {field: "y_routes"}, right: {field: "right"}, height: 0.6, source: source,
+                fill_color: {field: "right", transform: mapper}});
+        p.add_tools(hover([["Рейс", "@y_routes"], ["Заповнено", "@right{0.0}%"]]));
+        return p;
+      },
+      update: function (p, data) { p.y_range.factors = data.y_routes; },
+      title: function (f) { return "3. Завантаженість > " + f.min_occupancy + "%"; },
+      key: "y_routes"
+    },
+    train_types: {
+      build: function (source) {
+        var p = plt.figure({height: 350, tools: TOOLS});
+        p.scatter({x: {field: "x"}, y: {field: "y"}, size: 20, source: source, color: "firebrick", alpha: 0.6});
+        p.add_tools(hover([["Тип", "@t_type"], ["Вік", "@x{0.0}"], ["Ціна", "@y{0.00}"]]));
+        return p;
+      },
+      title: function () { return "4. Ціна vs Вік"; },
+      key: "t_type"
+    },
+    months: {
+      build: function (source) {
+        var p = plt.figure({x_range: new Bokeh.FactorRange({factors: []}), height: 350, tools: TOOLS});
+        p.line({x: {field: "x"}, y: {field: "y"}, line_width: 3, color: "green", source: source});
+        p.scatter({x: {field: "x"}, y: {field: "y"}, size: 8, fill_color: "white", source: source});
+        p.add_tools(hover([["Місяць", "@x"], ["Продано", "@y{0} шт"]]));
+        return p;
+      },
+      update: function (p, data) { p.x_range.factors = data.x; },
+      title: function () { return "5. Динаміка продажів"; },
+      key: "x"
+    },
+    top_passengers: {
+      build: function (source) {
+        var p = plt.figure({y_range: new Bokeh.FactorRange({factors: []}), height: 350, tools: TOOLS});
+        p.hbar({y: {field: "y"}, right: {field: "right"}, height: 0.6, source: source, color: "purple"});
+        p.add_tools(hover([["Клієнт", "@y"], ["Витрачено", "@right{0.00} грн"]]));
+        return p;
+      },
+      update: function (p, data) { p.y_range.factors = data.y; },
+      title: function (f) { return "6. Топ-" + f.top_n + " VIP Клієнтів"; },
+      key: "y"
+    }
+  };
+
+  var state = {};
+
+  function showEmpty(name, message) {
+    var empty = document.getElementById("empty-" + name);
+    if (message) empty.textContent = message;
+    empty.hidden = false;
+    document.getElementById("chart-" + name).style.display = "none";
+  }
+
+  function render(name, payload) {
+    var chart = CHARTS[name];
+    var data = chart.prepare ? chart.prepare(payload.columns) : payload.columns;
+    var empty = !data[chart.key] || data[chart.key].length === 0;
+
+    document.getElementById("empty-" + name).hidden = !empty;
+    document.getElementById("chart-" + name).style.display = empty ? "none" : "";
+    if (empty) return;
+
+    var current = state[name];
+    if (!current) {
+      var source = new Bokeh.ColumnDataSource({data: data});
+      var plot = chart.build(source);
+      if (chart.update) chart.update(plot, data);
+      plot.title.text = chart.title(payload.filters);
+      state[name] = {source: source, plot: plot};
+      plt.show(plot, "#chart-" + name);
+      return;
+    }
+    // Фігура вже є: міняємо лише дані/категорії осей, без повторного рендерингу сторінки
+    if (chart.update) chart.update(current.plot, data);
+    current.source.data = data;
+    current.plot.title.text = chart.title(payload.filters);
+  }
+
+  function refresh() {
+    var params = new URLSearchParams(new FormData(form));
+    params.delete("mode");
+    var query = params.toString();
+
+    Object.keys(CHARTS).forEach(function (name) {
+      fetch(apiBase + name + "/?" + query, {credentials: "same-origin", headers: {"Accept": "application/json"}})
+        .then(function (response) {
+          if (response.status === 401 || response.status === 403) throw new Error("Потрібно увійти в систему");
+          if (!response.ok) throw new Error("Помилка " + response.status);
+          return response.json();
+        })
+        .then(function (payload) { render(name, payload); })
+        .catch(function (err) { showEmpty(name, err.message); });
+    });
+
+    // Фільтри в адресі, щоб сторінку можна було оновити/поділитись нею
+    history.replaceState(null, "", "?" + (query ? query + "&" : "") + "mode=client");
+  }
+
+  form.addEventListener("submit", function (event) {
+    event.preventDefault();
+    refresh();
+  });
+  form.addEventListener("change", refresh);
+
+  refresh();
+})();
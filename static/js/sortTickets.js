@@ -1,68 +0,0 @@
-function sortTable(n) {
-  var table, rows, switching, i, x, y, shouldSwitch, dir, switchcount = 0;
-  table = document.getElementById("ticketsTable");
-  switching = true;
-  // Set the sorting direction to ascending:
-  dir = "asc";
-
-  /* Make a loop that will continue until
-  no switching has been done: */
-  while (switching) {
-    // Start by saying: no switching is done:
-    switching = false;
-    rows = table.rows;
-
-    /* Loop through all table rows (except the
-    first, which contains table headers): */
-    for (i = 1; i < (rows.length - 1); i++) {
-      // Start by saying there should be no switching:
-      shouldSwitch = false;
-
-      /* Get the two elements you want to compare,
-      one from current row and one from the next: */
-      x = rows[i].getElementsByTagName("TD")[n];
-      y = rows[i + 1].getElementsByTagName("TD")[n];
-
-      /* Check if the two rows should switch place,
-      based on the direction, asc or desc: */
-      var xContent = x.innerHTML.toLowerCase();
-      var yContent = y.innerHTML.toLowerCase();
-
-      // Check if content is a Number (for Price/ID columns)
-      var xNum = parseFloat(xContent);
-      var yNum = parseFloat(yContent);
-
-      if (!isNaN(xNum) && !isNaN(yNum)) {
-        // Compare Numbers
-        if (dir == "asc") {
-          if (xNum > yNum) { shouldSwitch = true; break; }
-        } else if (dir == "desc") {
-          if (xNum < yNum) { shouldSwitch = true; break; }
-        }
-      } else {
-        // Compare Text
-        if (dir == "asc") {
-          if (xContent > yContent) { shouldSwitch = true; break; }
-        } else if (dir == "desc") {
-          if (xContent < yContent) { shouldSwitch = true; break; }
-        }
-      }
-    }
-
-    if (shouldSwitch) {
-      /* If a switch has been marked, make the switch
-      and mark that a switch has been done: */
-      rows[i].parentNode.insertBefore(rows[i + 1], rows[i]);
-      switching = true;
-      // Each time a switch is done, increase this count by 1:
-      switchcount++;
-    } else {
-      /* If no switching has been done AND the direction is "asc",
-      set the direction to "desc" and run the while loop again. */
-      if (switchcount == 0 && dir == "asc") {
-        dir = "desc";
-        switching = true;
-      }
-    }
-  }
-}
\ No newline at end of file
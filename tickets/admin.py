@@ -3,7 +3,20 @@ from django.contrib import admin
 from .models import TicketOffice, Passenger, Cashier, Trip, Ticket
 
 admin.site.register(TicketOffice)
-admin.site.register(Passenger)
-admin.site.register(Cashier)
-admin.site.register(Trip)
 admin.site.register(Ticket)
+
+
+# Лічильники (editable=False) підтримує Ticket.save() - в адмінці лише показуємо їх
+@admin.register(Passenger)
+class PassengerAdmin(admin.ModelAdmin):
+    readonly_fields = ('total_spent',)
+
+
+@admin.register(Cashier)
+class CashierAdmin(admin.ModelAdmin):
+    readonly_fields = ('tickets_count', 'total_sales')
+
+
+@admin.register(Trip)
+class TripAdmin(admin.ModelAdmin):
+    readonly_fields = ('sold_count', 'revenue_total')
@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .api_views import AnalyticsAPIView, PassengerViewSet, CashierViewSet, TripViewSet, ReportViewSet
+from .async_views import analytics_async_view
+from .api_views import AnalyticsAPIView, PassengerViewSet, CashierViewSet, TripViewSet, ReportViewSet, TicketBulkSellAPIView, ExportAPIView, ChartDataAPIView
+from .api_views import RepositoryCacheStatsAPIView
 
 router = DefaultRouter()
 router.register(r'passengers', PassengerViewSet, basename='passengers')
@@ -11,4 +13,9 @@ router.register(r'reports', ReportViewSet, basename='reports')
 urlpatterns = [
     path('', include(router.urls)),
     path('analytics/', AnalyticsAPIView.as_view(), name='api_analytics'),
+    path('async/analytics/', analytics_async_view, name='api_analytics_async'),
+    path('analytics/<str:chart>/', ChartDataAPIView.as_view(), name='api_chart_data'),
+    path('tickets/bulk/', TicketBulkSellAPIView.as_view(), name='api_tickets_bulk'),
+    path('export/<str:entity>/', ExportAPIView.as_view(), name='api_export'),
+    path('cache/stats/', RepositoryCacheStatsAPIView.as_view(), name='api_cache_stats'),
 ]
@@ -2,39 +2,133 @@ from rest_framework import viewsets
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework import status
+from django.db import IntegrityError
 from django.db.models import Count, Sum, Avg, F
 from .models import Trip, Ticket, Cashier, Passenger
-from .models import Passenger, Cashier, Trip, TicketOffice, Ticket
-import pandas as pd
-import numpy as np
+from .models import Passenger, Cashier, Trip, TicketOffice, Ticket, SoldOut
 from .serializers import (
-    PassengerSerializer, CashierSerializer, TripSerializer, TicketOfficeSerializer, TicketSerializer
+    PassengerSerializer, CashierSerializer, TripSerializer, TicketOfficeSerializer, TicketSerializer,
+    BulkSellSerializer, ReserveSerializer,
 )
+from .fast_serializers import for_shapes
+from .repositories import PassengerRepository, CashierRepository, TripRepository
 from .repositories import RepositoryManager
+from .reservations import sell_seats
+from .pagination import paginate_keyset
+from django.conf import settings
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.renderers import JSONRenderer
+from django.http import Http404, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from .charts import CHART_SOURCES, CHARTS, chart_columns
+from .filters import AnalyticsFilters
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from .export import EXPORT_ENTITIES, NDJSONRenderer, iter_rows, json_array_stream, ndjson_stream
+from rest_framework.permissions import IsAdminUser
+from . import cache as repository_cache
 
 repo = RepositoryManager()
 
+
+# ---- Keyset-пагінація для list(): ?cursor=...&limit=N[&count=1] ----
+def keyset_list_response(request, queryset, serializer, ordering=('id',)):
+    try:
+        limit = int(request.query_params.get('limit') or settings.API_PAGE_SIZE)
+    except ValueError:
+        limit = settings.API_PAGE_SIZE
+    limit = max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+    page = paginate_keyset(queryset, ordering, request.query_params.get('cursor'), limit)
+    url = request.build_absolute_uri()
+
+    def link(cursor):
+        return replace_query_param(url, 'cursor', cursor) if cursor else None
+
+    body = {
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+        'results': serializer.many(page.object_list),
+    }
+    # Загальна кількість - лише на вимогу, бо це повний COUNT(*)
+    if request.query_params.get('count') == '1':
+        body['count'] = queryset.count()
+    return Response(body)
+
+
+# ---- Пакетне читання для list(): ?ids=1,2,3 замість N запитів retrieve ----
+def batch_retrieve_response(request, repository, serializer):
+    raw = [part.strip() for part in request.query_params['ids'].split(',') if part.strip()]
+    try:
+        ids = list(dict.fromkeys(int(part) for part in raw))
+    except ValueError:
+        return Response({'ids': "Очікується список цілих id через кому"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > settings.API_MAX_BATCH_IDS:
+        return Response({'ids': f"Не більше {settings.API_MAX_BATCH_IDS} id за запит"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    found = repository.get_many(ids)
+    # Порядок як у ?ids=, відсутні id - окремим списком
+    return Response({
+        'results': serializer.many(found[pk] for pk in ids if pk in found),
+        'missing': [pk for pk in ids if pk not in found],
+    })
+
+
+def list_response(request, repository, shape_serializers: dict):
+    # ?shape=list_row|detail; за замовчуванням список - list_row, а ?ids= (заміна retrieve у циклі) - detail
+    batch = 'ids' in request.query_params
+    shape = request.query_params.get('shape') or ('detail' if batch else 'list_row')
+    if shape not in shape_serializers:
+        return Response({'shape': f"Очікується одне з: {', '.join(shape_serializers)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    # Швидкий шлях: values()-рядки без інстансів моделей -> FastSerializer
+    serializer = shape_serializers[shape]
+    if batch:
+        return batch_retrieve_response(request, repository, serializer)
+    return keyset_list_response(request, serializer.values(repository.queryset()), serializer)
+
+
+# ---- Перевірка зв'язків перед продажем: один get_many на модель замість IntegrityError посеред транзакції ----
+def missing_related(**ids_by_repository) -> dict:
+    # missing_related(passengers=[1, 2], cashiers=[5]) -> {'passengers': [2]} для відсутніх id
+    missing = {}
+    for name, ids in ids_by_repository.items():
+        ids = {pk for pk in ids if pk is not None}
+        absent = sorted(ids - getattr(repo, name).get_many(ids).keys())
+        if absent:
+            missing[name] = absent
+    return missing
+
+
+# ---- Запис через репозиторій: лічильники (protected_fields) і невідомі поля -> 400, а не 500 ----
+def write_response(write, serializer_class):
+    try:
+        obj = write()
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(serializer_class(obj).data)
+
+
 # ---- CRUD через репозиторій ----
 class PassengerViewSet(viewsets.ViewSet):
+    # list/retrieve - швидкий read-only шлях; запис - через PassengerSerializer (валідація)
+    shape_serializers = for_shapes(Passenger, PassengerRepository.shapes)
+
     def list(self, request):
-        data = repo.passengers.all()
-        serializer = PassengerSerializer(data, many=True)
-        return Response(serializer.data)
+        return list_response(request, repo.passengers, self.shape_serializers)
 
     def retrieve(self, request, pk=None):
         obj = repo.passengers.get_by_id(pk)
-        serializer = PassengerSerializer(obj)
-        return Response(serializer.data)
+        if obj is None:
+            raise Http404
+        return Response(self.shape_serializers['detail'].to_representation(obj))
 
     def create(self, request):
-        obj = repo.passengers.add(**request.data)
-        serializer = PassengerSerializer(obj)
-        return Response(serializer.data)
+        return write_response(lambda: repo.passengers.add(**request.data), PassengerSerializer)
 
     def update(self, request, pk=None):
-        obj = repo.passengers.update(pk, **request.data)
-        serializer = PassengerSerializer(obj)
-        return Response(serializer.data)
+        return write_response(lambda: repo.passengers.update(pk, **request.data), PassengerSerializer)
 
     def destroy(self, request, pk=None):
         success = repo.passengers.delete(pk)
@@ -42,25 +136,23 @@ class PassengerViewSet(viewsets.ViewSet):
 
 
 class CashierViewSet(viewsets.ViewSet):
+    # list/retrieve - швидкий read-only шлях; запис - через CashierSerializer (валідація)
+    shape_serializers = for_shapes(Cashier, CashierRepository.shapes)
+
     def list(self, request):
-        data = repo.cashiers.all()
-        serializer = CashierSerializer(data, many=True)
-        return Response(serializer.data)
+        return list_response(request, repo.cashiers, self.shape_serializers)
 
     def retrieve(self, request, pk=None):
         obj = repo.cashiers.get_by_id(pk)
-        serializer = CashierSerializer(obj)
-        return Response(serializer.data)
+        if obj is None:
+            raise Http404
+        return Response(self.shape_serializers['detail'].to_representation(obj))
 
     def create(self, request):
-        obj = repo.cashiers.add(**request.data)
-        serializer = CashierSerializer(obj)
-        return Response(serializer.data)
+        return write_response(lambda: repo.cashiers.add(**request.data), CashierSerializer)
 
     def update(self, request, pk=None):
-        obj = repo.cashiers.update(pk, **request.data)
-        serializer = CashierSerializer(obj)
-        return Response(serializer.data)
+        return write_response(lambda: repo.cashiers.update(pk, **request.data), CashierSerializer)
 
     def destroy(self, request, pk=None):
         success = repo.cashiers.delete(pk)
@@ -68,30 +160,116 @@ class CashierViewSet(viewsets.ViewSet):
 
 
 class TripViewSet(viewsets.ViewSet):
+    # list/retrieve - швидкий read-only шлях; запис - через TripSerializer (валідація)
+    shape_serializers = for_shapes(Trip, TripRepository.shapes)
+
     def list(self, request):
-        data = repo.trips.all()
-        serializer = TripSerializer(data, many=True)
-        return Response(serializer.data)
+        return list_response(request, repo.trips, self.shape_serializers)
 
     def retrieve(self, request, pk=None):
         obj = repo.trips.get_by_id(pk)
-        serializer = TripSerializer(obj)
-        return Response(serializer.data)
+        if obj is None:
+            raise Http404
+        return Response(self.shape_serializers['detail'].to_representation(obj))
 
     def create(self, request):
-        obj = repo.trips.add(**request.data)
-        serializer = TripSerializer(obj)
-        return Response(serializer.data)
+        return write_response(lambda: repo.trips.add(**request.data), TripSerializer)
 
     def update(self, request, pk=None):
-        obj = repo.trips.update(pk, **request.data)
-        serializer = TripSerializer(obj)
-        return Response(serializer.data)
+        return write_response(lambda: repo.trips.update(pk, **request.data), TripSerializer)
 
     def destroy(self, request, pk=None):
         success = repo.trips.delete(pk)
         return Response({'deleted': success})
 
+    @action(detail=True, methods=['post'])
+    def reserve(self, request, pk=None):
+        # {"passengers": [1, 2, 3], "cashier": 5, "payment_method": "Card"}
+        try:
+            trip_id = int(pk)
+        except ValueError:
+            raise Http404("Рейс не знайдено")
+        serializer = ReserveSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        missing = missing_related(passengers=data['passengers'], cashiers=[data.get('cashier')])
+        if missing:
+            return Response({'detail': "Невідомий пасажир або касир", **missing}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = sell_seats(
+                trip_id,
+                data['passengers'],
+                cashier_id=data.get('cashier'),
+                payment_method=data['payment_method'],
+            )
+        except Trip.DoesNotExist:
+            return Response({'detail': 'Рейс не знайдено'}, status=status.HTTP_404_NOT_FOUND)
+        except IntegrityError:
+            return Response({'detail': "Невідомий пасажир або касир"}, status=status.HTTP_400_BAD_REQUEST)
+        body = {
+            'trip': result.trip_id,
+            'requested': result.requested,
+            'sold': len(result.tickets),
+            'sold_out': result.sold_out,
+            'available_seats': result.available_seats,
+        }
+        return Response(body, status=status.HTTP_409_CONFLICT if result.sold_out else status.HTTP_201_CREATED)
+
+
+# ---- Пакетний продаж квитків ----
+class TicketBulkSellAPIView(APIView):
+    # {"tickets": [{"trip": 1, "passenger": 2, "cashier": 3, "payment_method": "Card"}, ...], "chunk_size": 200}
+    def post(self, request):
+        # id приводяться до int (рядок "2" - теж рейс 2), решта - 400 з помилками по полях
+        serializer = BulkSellSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        items = serializer.validated_data['tickets']
+        chunk_size = min(serializer.validated_data.get('chunk_size') or settings.TICKETS_BULK_CHUNK_SIZE,
+                         settings.TICKETS_BULK_CHUNK_SIZE_MAX)
+        missing = missing_related(
+            passengers=[item['passenger'] for item in items], cashiers=[item.get('cashier') for item in items]
+        )
+        if missing:
+            return Response({'detail': "Невідомий пасажир або касир", **missing}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            tickets = repo.tickets.bulk_sell(items, chunk_size=chunk_size)
+        except Trip.DoesNotExist as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_404_NOT_FOUND)
+        except SoldOut as exc:
+            return Response({'detail': str(exc), 'trip': exc.trip_id, 'sold_out': True}, status=status.HTTP_409_CONFLICT)
+        except IntegrityError:
+            return Response({'detail': "Невідомий пасажир або касир"}, status=status.HTTP_400_BAD_REQUEST)
+
+        per_trip = {}
+        for ticket in tickets:
+            per_trip[ticket.trip_id] = per_trip.get(ticket.trip_id, 0) + 1
+        return Response({'created': len(tickets), 'per_trip': per_trip}, status=status.HTTP_201_CREATED)
+
+
+# ---- Потоковий експорт: /api/export/<entity>/?format=json|ndjson[&chunk_size=N] ----
+class ExportAPIView(APIView):
+    renderer_classes = [JSONRenderer, NDJSONRenderer]
+
+    def get(self, request, entity):
+        if entity not in EXPORT_ENTITIES:
+            raise Http404(f"Невідома сутність: {entity}")
+        try:
+            chunk_size = int(request.query_params.get('chunk_size') or settings.EXPORT_CHUNK_SIZE)
+        except ValueError:
+            chunk_size = settings.EXPORT_CHUNK_SIZE
+        chunk_size = max(1, min(chunk_size, settings.EXPORT_CHUNK_SIZE_MAX))
+
+        rows = iter_rows(entity, chunk_size)
+        if request.accepted_renderer.format == 'ndjson':
+            response = StreamingHttpResponse(ndjson_stream(rows), content_type='application/x-ndjson; charset=utf-8')
+        else:
+            response = StreamingHttpResponse(json_array_stream(rows), content_type='application/json; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{entity}.{request.accepted_renderer.format}"'
+        return response
+
 
 # ---- Метод для агрегованого звіту ----
 from django.db.models import Avg, Count
@@ -99,132 +277,118 @@ from django.db.models import Avg, Count
 class ReportViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        total_passengers = len(repo.passengers.all())
-        total_cashiers = len(repo.cashiers.all())
-        total_trips = len(repo.trips.all())
-        avg_age_passenger = round(sum([p.age for p in repo.passengers.all()])/max(total_passengers,1), 2)
-
-        return Response({
-            'total_passengers': total_passengers,
-            'total_cashiers': total_cashiers,
-            'total_trips': total_trips,
-            'average_passenger_age': avg_age_passenger
-        })
-    
+        # ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&train_type=...
+        params = request.query_params
+        dates = {}
+        for name in ('date_from', 'date_to'):
+            raw = params.get(name)
+            try:
+                dates[name] = parse_date(raw) if raw else None
+            except ValueError:
+                dates[name] = None
+            if raw and dates[name] is None:
+                return Response({'detail': "Дати у форматі YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        train_type = params.get('train_type')
+        if train_type == 'All':
+            train_type = None
+        return Response(repo.get_summary(train_type=train_type, **dates))
 
 
 repo = RepositoryManager()
 
 class AnalyticsAPIView(APIView):
+    # ?orient=columns (за замовчуванням): {"columns": {"total_revenue": [...], ...}, "stats": {...}}
+    # ?orient=records: {"data": [{...}, ...], "stats": {...}} - попередній формат
     def get(self, request):
-        analytics_qs = repo.get_complex_analytics()
+        # ?min_revenue=&min_occupancy=&train_type=&top_n=&date_from=&date_to= - фільтри застосовуються в БД
+        filters = AnalyticsFilters.from_params(request.query_params)
+        analytics = repo.get_complex_analytics(filters, live=request.query_params.get('live') == '1')
+        orient = 'records' if request.query_params.get('orient') == 'records' else 'columns'
         response_data = {}
 
-        # Допоміжна функція
-        def safe_stat(value):
-            if pd.isna(value) or value is None:
-                return 0.0
-            return float(value)
+        def section(key, fields, stats):
+            table = analytics[key].select(*fields)
+            if len(table):
+                data = table.records() if orient == 'records' else table.as_dict()
+                response_data[key] = {'data' if orient == 'records' else 'columns': data, 'stats': stats(table)}
 
         # --- 1. Прибуток по рейсах ---
-        # (Переконайтесь, що ви виправили repositories.py, щоб там було поле 'tickets_sold')
-        df_revenue = pd.DataFrame(list(analytics_qs['revenue_by_trip'].values(
-            'start_station', 'end_station', 'total_revenue', 'tickets_sold'
-        )))
-        df_revenue = df_revenue.fillna(0)
-        
-        if not df_revenue.empty:
-            response_data['revenue_by_trip'] = {
-                "data": df_revenue.to_dict(orient="records"),
-                "stats": {
-                    # Основні показники (Revenue)
-                    "total_sum": safe_stat(df_revenue['total_revenue'].sum()),
-                    "mean": safe_stat(df_revenue['total_revenue'].mean()),
-                    "median": safe_stat(df_revenue['total_revenue'].median()), # Медіана
-                    "min": safe_stat(df_revenue['total_revenue'].min()),       # Мінімум
-                    "max": safe_stat(df_revenue['total_revenue'].max()),       # Максимум
-                }
-            }
+        def revenue_stats(t):
+            s = t.stats('total_revenue')
+            return {"total_sum": s['sum'], "mean": s['mean'], "median": s['median'], "min": s['min'], "max": s['max']}
 
         # --- 2. Ефективність касирів ---
-        df_cashiers = pd.DataFrame(list(analytics_qs['cashier_performance'].values(
-            'first_name', 'last_name', 'tickets_count', 'total_sales'
-        )))
-        df_cashiers = df_cashiers.fillna(0)
-
-        if not df_cashiers.empty:
-            response_data['cashier_performance'] = {
-                "data": df_cashiers.to_dict(orient="records"),
-                "stats": {
-                    "mean_sales": safe_stat(df_cashiers['total_sales'].mean()),
-                    "median_sales": safe_stat(df_cashiers['total_sales'].median()),
-                    "min_sales": safe_stat(df_cashiers['total_sales'].min()),
-                    "max_sales": safe_stat(df_cashiers['total_sales'].max()),
-                    "best_cashier": df_cashiers.loc[df_cashiers['total_sales'].idxmax()]['last_name'] if not df_cashiers.empty else "N/A"
-                }
+        def cashier_stats(t):
+            s = t.stats('total_sales')
+            best = t.argmax('total_sales')
+            return {
+                "mean_sales": s['mean'], "median_sales": s['median'], "min_sales": s['min'], "max_sales": s['max'],
+                "best_cashier": t['last_name'][best] if best is not None else "N/A",
             }
 
         # --- 3. Завантаженість ---
-        df_occupancy = pd.DataFrame(list(analytics_qs['trip_occupancy'].values(
-            'start_station', 'end_station', 'occupancy_rate', 'capacity'
-        )))
-        df_occupancy = df_occupancy.fillna(0)
-
-        if not df_occupancy.empty:
-            response_data['trip_occupancy'] = {
-                "data": df_occupancy.to_dict(orient="records"),
-                "stats": {
-                    "mean_occupancy": safe_stat(df_occupancy['occupancy_rate'].mean()),
-                    "median_occupancy": safe_stat(df_occupancy['occupancy_rate'].median()),
-                    "min_occupancy": safe_stat(df_occupancy['occupancy_rate'].min()),
-                    "max_occupancy": safe_stat(df_occupancy['occupancy_rate'].max()),
-                }
-            }
+        def occupancy_stats(t):
+            s = t.stats('occupancy_rate', ('mean', 'median', 'min', 'max'))
+            return {f"{op}_occupancy": value for op, value in s.items()}
 
         # --- 4. Типи потягів ---
-        df_trains = pd.DataFrame(list(analytics_qs['train_type_stats'].values(
-            'train_type', 'avg_passenger_age', 'max_ticket_price'
-        )))
-        df_trains = df_trains.fillna(0)
-
-        if not df_trains.empty:
-            response_data['train_type_stats'] = {
-                "data": df_trains.to_dict(orient="records"),
-                "stats": {
-                    # Статистика по ціні квитка серед типів
-                    "max_price_among_types": safe_stat(df_trains['max_ticket_price'].max()),
-                    "avg_age_overall": safe_stat(df_trains['avg_passenger_age'].mean())
-                }
+        def train_stats(t):
+            return {
+                # Статистика по ціні квитка серед типів
+                "max_price_among_types": t.stats('max_ticket_price', ('max',))['max'],
+                "avg_age_overall": t.stats('avg_passenger_age', ('mean',))['mean'],
             }
 
         # --- 5. Продажі по місяцях ---
-        # (Переконайтесь, що виправили repositories.py, додавши monthly_revenue)
-        df_months = pd.DataFrame(list(analytics_qs['sales_by_month'].values(
-            'month', 'monthly_revenue', 'tickets_sold'
-        )))
-        df_months = df_months.fillna(0)
-
-        if not df_months.empty:
-            response_data['sales_by_month'] = {
-                "data": df_months.to_dict(orient="records"),
-                "stats": {
-                    "total_tickets": safe_stat(df_months['tickets_sold'].sum()),
-                    "mean_monthly_revenue": safe_stat(df_months['monthly_revenue'].mean())
-                }
+        def month_stats(t):
+            return {
+                "total_tickets": t.stats('tickets_sold', ('sum',))['sum'],
+                "mean_monthly_revenue": t.stats('monthly_revenue', ('mean',))['mean'],
             }
-            
+
         # --- 6. Топ пасажири ---
-        df_passengers = pd.DataFrame(list(analytics_qs['top_passengers'].values(
-            'first_name', 'last_name', 'total_spent'
-        )))
-        df_passengers = df_passengers.fillna(0)
-
-        if not df_passengers.empty:
-            response_data['top_passengers'] = {
-                "data": df_passengers.to_dict(orient="records"),
-                "stats": {
-                    "median_spent_top10": safe_stat(df_passengers['total_spent'].median())
-                }
-            }
+        def passenger_stats(t):
+            return {"median_spent_top10": t.stats('total_spent', ('median',))['median']}
+
+        section('revenue_by_trip', ('start_station', 'end_station', 'total_revenue', 'tickets_sold'), revenue_stats)
+        section('cashier_performance', ('first_name', 'last_name', 'tickets_count', 'total_sales'), cashier_stats)
+        section('trip_occupancy', ('start_station', 'end_station', 'occupancy_rate', 'capacity'), occupancy_stats)
+        section('train_type_stats', ('train_type', 'avg_passenger_age', 'max_ticket_price'), train_stats)
+        section('sales_by_month', ('month', 'monthly_revenue', 'tickets_sold'), month_stats)
+        section('top_passengers', ('first_name', 'last_name', 'total_spent'), passenger_stats)
+
+        return Response(response_data)
+
+
+# ---- Дані одного графіка в колонковому форматі: /api/analytics/<chart>/?min_revenue=...&top_n=... ----
+class ChartDataAPIView(APIView):
+    # Сесія - для fetch() з клієнтського дашборду, Basic - для інших клієнтів API
+    authentication_classes = [SessionAuthentication, BasicAuthentication]
+
+    def get(self, request, chart):
+        if chart not in CHARTS:
+            raise Http404(f"Невідомий графік: {chart}")
+        filters = AnalyticsFilters.from_params(request.query_params)
+        # Лише один запит - той, з якого малюється цей графік
+        analytics = repo.get_complex_analytics(
+            filters, live=request.query_params.get('live') == '1', keys=[CHART_SOURCES[chart]]
+        )
+        return Response({
+            'chart': chart,
+            'filters': filters.as_dict(),
+            'columns': chart_columns(chart, analytics),
+        })
+
+
+# ---- Кеш репозиторіїв: конфігурація і лічильники влучань/промахів цього воркера ----
+class RepositoryCacheStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(repository_cache.info())
 
-        return Response(response_data)
\ No newline at end of file
+    def delete(self, request):
+        # Обнулити лічильники (наприклад, перед заміром)
+        repository_cache.stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,69 @@
+# tickets/async_views.py
+# --- Async-ендпоінти аналітики (запускати під ASGI: uvicorn railway.asgi:application) ---
+# DRF APIView не підтримує async-обробники, тож це звичайні Django async-в'юхи.
+# Під WSGI вони теж працюють, але Django виконує їх у власному event loop на кожен запит.
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .charts import CHART_SOURCES, CHARTS, chart_columns
+from .filters import AnalyticsFilters
+from .repositories import RepositoryManager
+
+repo = RepositoryManager()
+
+
+# DEFAULT_AUTHENTICATION_CLASSES (як /api/analytics/) + сесія (як /api/analytics/<chart>/ для браузера)
+AUTHENTICATION_CLASSES = [
+    *api_settings.DEFAULT_AUTHENTICATION_CLASSES,
+    *([] if SessionAuthentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES else [SessionAuthentication]),
+]
+
+
+def _authenticate(request):
+    """
+    Ті самі автентифікатори, що й у DRF-в'юх (Basic, сесія), -> (user, None)
+    або (None, JsonResponse 401/403). Синхронно: Basic перевіряє пароль через ORM.
+    """
+    drf_request = Request(request)
+    authenticators = [auth_class() for auth_class in AUTHENTICATION_CLASSES]
+    try:
+        for authenticator in authenticators:
+            result = authenticator.authenticate(drf_request)
+            if result is not None:
+                return result[0], None
+        detail = exceptions.NotAuthenticated.default_detail
+    except exceptions.AuthenticationFailed as exc:
+        detail = exc.detail
+    # Як DRF: 401 із WWW-Authenticate першого автентифікатора, якщо він його має, інакше 403
+    header = authenticators[0].authenticate_header(drf_request) if authenticators else None
+    response = JsonResponse({'detail': str(detail)}, status=401 if header else 403)
+    if header:
+        response['WWW-Authenticate'] = header
+    return None, response
+
+
+# ---- Колонки всіх (або ?chart=a&chart=b) графіків одним запитом: /api/async/analytics/ ----
+async def analytics_async_view(request):
+    user, error = await sync_to_async(_authenticate)(request)
+    if error is not None:
+        return error
+    if not user.is_authenticated:
+        return JsonResponse({'detail': str(exceptions.NotAuthenticated.default_detail)}, status=403)
+
+    charts = request.GET.getlist('chart') or list(CHARTS)
+    unknown = [chart for chart in charts if chart not in CHARTS]
+    if unknown:
+        return JsonResponse({'detail': f"Невідомий графік: {', '.join(unknown)}"}, status=404)
+
+    filters = AnalyticsFilters.from_params(request.GET)
+    analytics = await repo.aget_complex_analytics(
+        filters, live=request.GET.get('live') == '1', keys={CHART_SOURCES[chart] for chart in charts}
+    )
+    return JsonResponse({
+        'filters': filters.as_dict(),
+        'charts': {chart: chart_columns(chart, analytics) for chart in charts},
+    })
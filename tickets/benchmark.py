@@ -0,0 +1,337 @@
+# tickets/benchmark.py
+# --- Відтворюваний бенчмарк (manage.py benchmark) ---
+# Замість заміру всередині HTTP-запиту (performance_view): детермінований датасет
+# (--seed/--random-seed), іменовані сценарії з прогрівом і повторами, перцентилі
+# p50/p95/p99, пропускна здатність і пікова пам'ять у JSON. Два JSON порівнює compare().
+import datetime
+import json
+import platform
+import random
+import resource
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import cache as repository_cache
+from .fast_serializers import FastSerializer
+from .filters import AnalyticsFilters
+from .models import Cashier, Passenger, SalesRollup, Ticket, Trip
+from .repositories import RepositoryManager
+from .reservations import sell_seats
+from .serializers import PassengerSerializer
+
+# Мітки згенерованих даних: за ними --reset прибирає попередній датасет
+BENCH_TRIP_PREFIX = 'BENCH-'
+BENCH_PASSPORT_PREFIX = 'BENCH'
+BENCH_CASHIER_LAST_NAME = 'Bench'
+BENCH_USERNAME = 'benchmark'
+
+STATIONS = ('Київ', 'Львів', 'Одеса', 'Харків', 'Дніпро', 'Ужгород', 'Чернівці', 'Полтава')
+TRAIN_TYPES = ('Regular', 'Intercity', 'Intercity+', 'Night')
+PAYMENT_METHODS = ('Cash', 'Card', 'Online')
+
+# Метрики, що порівнюються в compare(); True - більше значить гірше
+COMPARED_METRICS = {'p50_ms': True, 'p95_ms': True, 'p99_ms': True, 'throughput_rps': False}
+# Рядків у serialize_model / serialize_fast (ModelSerializer проти FastSerializer)
+SERIALIZE_ROWS = 2000
+
+
+def bench_data_counts() -> dict:
+    return {
+        'trips': Trip.objects.filter(number__startswith=BENCH_TRIP_PREFIX).count(),
+        'passengers': Passenger.objects.filter(passport__startswith=BENCH_PASSPORT_PREFIX).count(),
+        'cashiers': Cashier.objects.filter(last_name=BENCH_CASHIER_LAST_NAME).count(),
+        'tickets': Ticket.objects.filter(trip__number__startswith=BENCH_TRIP_PREFIX).count(),
+    }
+
+
+def reset_bench_data():
+    trips = Trip.objects.filter(number__startswith=BENCH_TRIP_PREFIX)
+    # Квитки і кошики датасету посилаються лише на рейси/пасажирів/касирів датасету, які теж
+    # видаляються - тож один DELETE без post_delete на кожен квиток (лічильники зникнуть разом з рядками)
+    with transaction.atomic(), connection.cursor() as cursor:
+        trip_ids = list(trips.values_list('id', flat=True))
+        for i in range(0, len(trip_ids), 1000):
+            chunk = trip_ids[i:i + 1000]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            for model in (Ticket, SalesRollup):
+                cursor.execute(f"DELETE FROM {model._meta.db_table} WHERE trip_id IN ({placeholders})", chunk)
+        trips.delete()
+        Passenger.objects.filter(passport__startswith=BENCH_PASSPORT_PREFIX).delete()
+        Cashier.objects.filter(last_name=BENCH_CASHIER_LAST_NAME).delete()
+
+
+def seed_bench_data(tickets: int, random_seed: int = 42) -> dict:
+    """
+    Детермінований датасет на tickets квитків: пасажирів tickets/10, рейсів tickets/100,
+    касирів tickets/1000. Квитки продаються через bulk_sell (лічильники, SalesRollup, total_spent),
+    дати покупки розкидані по останньому року.
+    """
+    rng = random.Random(random_seed)
+    repo = RepositoryManager()
+    n_trips, n_passengers, n_cashiers = max(5, tickets // 100), max(10, tickets // 10), max(2, tickets // 1000)
+    capacity = tickets // n_trips * 2 + 10
+
+    Trip.objects.bulk_create([
+        Trip(
+            start_station=rng.choice(STATIONS), end_station=rng.choice(STATIONS), distance_km=rng.randint(50, 1200),
+            price=rng.randint(80, 1500), capacity=capacity, number=f'{BENCH_TRIP_PREFIX}{i:05d}',
+            train_type=rng.choice(TRAIN_TYPES),
+        )
+        for i in range(n_trips)
+    ], batch_size=settings.TICKETS_BULK_CHUNK_SIZE)
+    Passenger.objects.bulk_create([
+        Passenger(first_name=f"Пасажир{i}", last_name=f"Тест{i % 97}", passport=f'{BENCH_PASSPORT_PREFIX}{i:07d}',
+                  age=rng.randint(5, 90))
+        for i in range(n_passengers)
+    ], batch_size=settings.TICKETS_BULK_CHUNK_SIZE)
+    Cashier.objects.bulk_create([
+        Cashier(first_name=f"Касир{i}", last_name=BENCH_CASHIER_LAST_NAME,
+                hire_date=datetime.date(2015, 1, 1) + datetime.timedelta(days=rng.randint(0, 3000)))
+        for i in range(n_cashiers)
+    ])
+
+    # MySQL не повертає pk з bulk_create - перечитуємо
+    trip_ids = list(Trip.objects.filter(number__startswith=BENCH_TRIP_PREFIX).values_list('id', flat=True))
+    passenger_ids = list(Passenger.objects.filter(
+        passport__startswith=BENCH_PASSPORT_PREFIX).values_list('id', flat=True))
+    cashier_ids = list(Cashier.objects.filter(last_name=BENCH_CASHIER_LAST_NAME).values_list('id', flat=True))
+
+    items = [
+        {'trip': rng.choice(trip_ids), 'passenger': rng.choice(passenger_ids),
+         'cashier': rng.choice(cashier_ids), 'payment_method': rng.choice(PAYMENT_METHODS)}
+        for _ in range(tickets)
+    ]
+    chunk = settings.TICKETS_BULK_CHUNK_SIZE
+    for i in range(0, len(items), chunk):
+        repo.tickets.bulk_sell(items[i:i + chunk])
+
+    # Дата покупки - auto_now_add, тож розкидаємо її UPDATE-ом пачками і перераховуємо кошики
+    ticket_ids = list(Ticket.objects.filter(trip_id__in=trip_ids).order_by('id').values_list('id', flat=True))
+    now = timezone.now()
+    for i in range(0, len(ticket_ids), chunk):
+        Ticket.objects.filter(pk__in=ticket_ids[i:i + chunk]).update(
+            purchase_date=now - datetime.timedelta(days=rng.randint(0, 364), seconds=rng.randint(0, 86399))
+        )
+    repo.rebuild_sales_rollup()
+    repo.refresh_analytics_snapshots()
+    # bulk_create не шле post_save
+    for model in (Trip, Passenger, Cashier):
+        repository_cache.invalidate(model)
+    return bench_data_counts()
+
+
+# --- Сценарії: name -> фабрика, що повертає функцію одного виклику ---
+def _http_host() -> str:
+    hosts = [h for h in settings.ALLOWED_HOSTS if h and h != '*' and not h.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def _bench_user():
+    user, _ = get_user_model().objects.get_or_create(username=BENCH_USERNAME)
+    return user
+
+
+def _page(path: str, api: bool = False) -> Callable[[], Callable]:
+    def factory():
+        # Автентифікацію (сесія / force_authenticate) не міряємо - хешування пароля для Basic
+        # на кожен запит заглушило б усе інше
+        if api:
+            client = APIClient(HTTP_HOST=_http_host())
+            client.force_authenticate(_bench_user())
+        else:
+            client = Client(HTTP_HOST=_http_host())
+            client.force_login(_bench_user())
+
+        def call():
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path}: HTTP {response.status_code}")
+            # Потокові відповіді (експорт) треба дочитати до кінця
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            return response
+        return call
+    return factory
+
+
+def _analytics(filters_factory: Callable[[], AnalyticsFilters]):
+    def factory():
+        repo, filters = RepositoryManager(), filters_factory()
+        return lambda: repo.get_complex_analytics(filters)
+    return factory
+
+
+def _ticket_sale():
+    trip = Trip.objects.filter(capacity__gt=F('sold_count')).order_by('id').values_list('id', flat=True).first()
+    passenger = Passenger.objects.order_by('id').values_list('id', flat=True).first()
+    cashier = Cashier.objects.order_by('id').values_list('id', flat=True).first()
+    if trip is None or passenger is None:
+        raise RuntimeError("Немає рейсу з вільними місцями або пасажира - запустіть з --seed")
+
+    def call():
+        # Продаж з відкатом: кожен виклик бачить той самий стан БД
+        with transaction.atomic():
+            result = sell_seats(trip, [passenger], cashier_id=cashier)
+            transaction.set_rollback(True)
+        return result
+    return call
+
+
+def _serialize(fast: bool):
+    # Ті самі SERIALIZE_ROWS пасажирів (усі колонки); SQL входить в обидва варіанти
+    def factory():
+        if fast:
+            serializer = FastSerializer(Passenger)
+            return lambda: serializer.many(serializer.values(Passenger.objects.order_by('id'))[:SERIALIZE_ROWS])
+        return lambda: PassengerSerializer(Passenger.objects.order_by('id')[:SERIALIZE_ROWS], many=True).data
+    return factory
+
+
+def _last_90_days() -> AnalyticsFilters:
+    today = timezone.localdate()
+    return AnalyticsFilters(date_from=today - datetime.timedelta(days=90), date_to=today)
+
+
+SCENARIOS: Dict[str, Callable[[], Callable]] = {
+    'list_tickets': _page('/tickets/?sort=-price'),
+    'list_tickets_filtered': _page('/tickets/?payment_method=Card&sort=date'),
+    'list_passengers': _page('/passengers/?sort=name'),
+    'analytics': _analytics(AnalyticsFilters),
+    'analytics_window': _analytics(_last_90_days),
+    'analytics_api': _page('/api/analytics/', api=True),
+    'ticket_sale': _ticket_sale,
+    'api_export': _page('/api/export/tickets/?format=ndjson', api=True),
+    'api_passengers': _page(f'/api/passengers/?shape=detail&limit={settings.API_MAX_PAGE_SIZE}', api=True),
+    'serialize_model': _serialize(fast=False),
+    'serialize_fast': _serialize(fast=True),
+}
+
+
+@dataclass
+class ScenarioResult:
+    timings: list
+    wall: float
+    queries: int
+    peak_alloc: int
+
+    def summary(self) -> dict:
+        ms = sorted(t * 1000 for t in self.timings)
+        if len(ms) > 1:
+            cuts = statistics.quantiles(ms, n=100, method='inclusive')
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = ms[0]
+        return {
+            'trials': len(ms),
+            'p50_ms': round(p50, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+            'mean_ms': round(statistics.fmean(ms), 3),
+            'min_ms': round(ms[0], 3),
+            'max_ms': round(ms[-1], 3),
+            'throughput_rps': round(len(ms) / self.wall, 2) if self.wall else None,
+            'queries': self.queries,
+            'peak_alloc_mb': round(self.peak_alloc / 1024 / 1024, 3),
+        }
+
+
+def measure(call: Callable, warmup: int, trials: int, concurrency: int = 1) -> ScenarioResult:
+    for _ in range(warmup):
+        call()
+
+    def timed(_):
+        started = time.perf_counter()
+        call()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        # Власний пул, не tickets.executor: аналітика всередині виклику сама ставить задачі у спільний
+        # пул і чекає на них - зовнішні виклики, що зайняли всі його потоки, заблокували б її назавжди
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='benchmark') as pool:
+            timings = list(pool.map(timed, range(trials)))
+    else:
+        timings = [timed(i) for i in range(trials)]
+    wall = time.perf_counter() - started
+
+    # Окремий прохід під tracemalloc і лічильником запитів - щоб вони не спотворили таймінги.
+    # Рахуються запити потоку виклику; паралельні запити аналітики в пулі tickets.executor - ні
+    tracemalloc.start()
+    # Лог запитів - deque на 9000: заповнений (після --seed) він не росте, і різниця довжин дала б 0
+    connection.queries_log.clear()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return ScenarioResult(timings=timings, wall=wall, queries=len(queries), peak_alloc=peak)
+
+
+def run(scenarios, warmup: int, trials: int, concurrency: int = 1, progress: Optional[Callable] = None) -> dict:
+    results = {}
+    for name in scenarios:
+        call = SCENARIOS[name]()
+        results[name] = measure(call, warmup, trials, concurrency).summary()
+        if progress:
+            progress(name, results[name])
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': bench_data_counts(),
+            'totals': {'tickets': Ticket.objects.count(), 'passengers': Passenger.objects.count()},
+            'warmup': warmup,
+            'trials': trials,
+            'concurrency': concurrency,
+            # ru_maxrss у Linux - KB
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        'scenarios': results,
+    }
+
+
+def load_results(path) -> Optional[dict]:
+    path = Path(path)
+    if not path.exists():
+        return None
+    with path.open(encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(base: dict, new: dict, threshold: float = 10.0) -> list:
+    """
+    Рядки порівняння {scenario, metric, base, new, change_pct, regression} для сценаріїв,
+    що є в обох файлах. regression - погіршення більше ніж на threshold відсотків.
+    """
+    rows = []
+    for name in base['scenarios'].keys() & new['scenarios'].keys():
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            old, cur = base['scenarios'][name].get(metric), new['scenarios'][name].get(metric)
+            if not old or cur is None:
+                continue
+            change = (cur - old) / old * 100
+            worse = change if higher_is_worse else -change
+            rows.append({
+                'scenario': name, 'metric': metric, 'base': old, 'new': cur,
+                'change_pct': round(change, 1), 'regression': worse > threshold,
+            })
+    return sorted(rows, key=lambda r: (r['scenario'], list(COMPARED_METRICS).index(r['metric'])))
@@ -0,0 +1,163 @@
+# tickets/cache.py
+# --- Read-through кеш читань репозиторіїв (get_by_id, get_many, all, find_by_passport) ---
+# Вмикається REPOSITORY_CACHE_ENABLED, кешуються лише моделі з REPOSITORY_CACHE_TTL
+# (all() - лише для малих довідників з cache_all, див. BaseRepository).
+# Бекенд - окремий аліас CACHES (REPOSITORY_CACHE_ALIAS): locmem (LRU), файли або Redis.
+# Інвалідація як у tickets.signals.analytics_version: кожен ключ містить "покоління" моделі,
+# post_save/post_delete і F()-оновлення лічильників його збільшують - старі ключі просто
+# перестають читатись і витісняються за TTL/LRU.
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+_MISSING = object()
+# Закешований "не знайдено" (get_by_id -> None), щоб відсутній pk не ходив у БД щоразу
+NONE_MARKER = '__repository_cache_none__'
+
+
+class CacheStats:
+    """Лічильники влучань/промахів по моделях - на процес (у кожного воркера свої)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {'hits': 0, 'misses': 0, 'invalidations': 0})
+
+    def add(self, label: str, counter: str, count: int = 1):
+        with self._lock:
+            self._counters[label][counter] += count
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {label: dict(counters) for label, counters in self._counters.items()}
+        for counters in result.values():
+            reads = counters['hits'] + counters['misses']
+            counters['hit_rate'] = round(counters['hits'] / reads, 4) if reads else None
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+stats = CacheStats()
+
+
+def _label(model) -> str:
+    return model._meta.label
+
+
+def ttl_for(model) -> int:
+    if not settings.REPOSITORY_CACHE_ENABLED:
+        return 0
+    return settings.REPOSITORY_CACHE_TTL.get(_label(model), 0)
+
+
+def _backend():
+    return caches[settings.REPOSITORY_CACHE_ALIAS]
+
+
+def _generation(label: str) -> int:
+    key = f'repo:{label}:generation'
+    backend = _backend()
+    generation = backend.get(key)
+    if generation is None:
+        # Стартуємо з часу, а не з 0: якщо ключ витиснуто, старі покоління не повторяться
+        backend.add(key, int(time.time() * 1000), timeout=None)
+        generation = backend.get(key, 0)
+    return generation
+
+
+def cached(model, name: str, loader, *args):
+    """
+    loader(), закешований на REPOSITORY_CACHE_TTL[model] секунд під ключем (name, args).
+    Якщо модель не кешується - просто loader().
+    """
+    ttl = ttl_for(model)
+    if not ttl:
+        return loader()
+
+    label = _label(model)
+    # args хешуються: ключ безпечний для будь-якого бекенду (пробіли, юнікод, довжина)
+    digest = hashlib.md5(repr(args).encode()).hexdigest() if args else ''
+    key = f'repo:{label}:{_generation(label)}:{name}:{digest}'
+    backend = _backend()
+
+    value = backend.get(key, _MISSING)
+    if value is not _MISSING:
+        stats.add(label, 'hits')
+        return None if isinstance(value, str) and value == NONE_MARKER else value
+
+    stats.add(label, 'misses')
+    value = loader()
+    backend.set(key, NONE_MARKER if value is None else value, ttl)
+    return value
+
+
+def cached_many(model, name: str, loader, keys: list) -> dict:
+    """
+    Пакетний cached(): {key: loader-значення} для кожного key з keys.
+    Ключі ті самі, що й у cached(model, name, ..., key), тож get_by_id і get_many
+    ділять записи. loader(missing_keys) -> dict отримує лише промахи (одним викликом).
+    """
+    ttl = ttl_for(model)
+    if not ttl:
+        return loader(keys)
+
+    label = _label(model)
+    generation = _generation(label)
+    cache_keys = {
+        key: f'repo:{label}:{generation}:{name}:{hashlib.md5(repr((key,)).encode()).hexdigest()}'
+        for key in keys
+    }
+    backend = _backend()
+    found = backend.get_many(list(cache_keys.values()))
+
+    result, missing = {}, []
+    for key, cache_key in cache_keys.items():
+        if cache_key in found:
+            value = found[cache_key]
+            if not (isinstance(value, str) and value == NONE_MARKER):
+                result[key] = value
+        else:
+            missing.append(key)
+    stats.add(label, 'hits', len(keys) - len(missing))
+    stats.add(label, 'misses', len(missing))
+
+    if missing:
+        loaded = loader(missing)
+        backend.set_many({cache_keys[key]: loaded.get(key, NONE_MARKER) for key in missing}, ttl)
+        result.update(loaded)
+    return result
+
+
+def invalidate(model):
+    if not ttl_for(model):
+        return
+    label = _label(model)
+    try:
+        _backend().incr(f'repo:{label}:generation')
+    except ValueError:
+        _generation(label)
+    stats.add(label, 'invalidations')
+
+
+def invalidate_on_commit(model):
+    # Після коміту: інакше паралельне читання встигне закешувати ще незакомічений стан
+    if ttl_for(model):
+        transaction.on_commit(lambda: invalidate(model))
+
+
+def info() -> dict:
+    backend = settings.CACHES[settings.REPOSITORY_CACHE_ALIAS]['BACKEND']
+    return {
+        'enabled': settings.REPOSITORY_CACHE_ENABLED,
+        'alias': settings.REPOSITORY_CACHE_ALIAS,
+        'backend': backend,
+        'ttl': settings.REPOSITORY_CACHE_TTL,
+        'models': stats.snapshot(),
+    }
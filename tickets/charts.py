@@ -0,0 +1,89 @@
+# tickets/charts.py
+# --- Дані графіків дашборду у компактному колонковому форматі ---
+# {'x': [...], 'y': [...]} - саме те, що кладеться в ColumnDataSource.data.
+# Використовується і серверним Bokeh-дашбордом, і /api/analytics/<chart>/
+# для клієнтського рендерингу (static/js/dashboardCharts.js).
+
+# Графік -> ключ RepositoryManager.get_complex_analytics, з якого він малюється
+CHART_SOURCES = {
+    'revenue': 'revenue_by_trip',
+    'cashiers': 'cashier_performance',
+    'occupancy': 'trip_occupancy',
+    'train_types': 'train_type_stats',
+    'months': 'sales_by_month',
+    'top_passengers': 'top_passengers',
+}
+CHARTS = tuple(CHART_SOURCES)
+
+
+def trip_label(number, pk) -> str:
+    # ВАЖЛИВО: додаємо ID, щоб назва була унікальною (категорії осі Bokeh не можуть повторюватись)
+    if number and str(number).lower() != 'none' and str(number).strip() != '':
+        return f"{number} (id:{pk})"
+    return f"#{pk}"
+
+
+def _numbers(column) -> list:
+    return [value or 0.0 for value in column]
+
+
+# Дані вже відфільтровані й обрізані в БД (AnalyticsFilters) і прийшли колонками
+# (ColumnTable), тут лише перейменування/підписи
+def revenue_columns(t):
+    return {
+        'x': [trip_label(n, pk) for n, pk in zip(t['number'], t['id'])],
+        'y': _numbers(t['total_revenue']),
+        'route': [f"{a}-{b}" for a, b in zip(t['start_station'], t['end_station'])],
+    }
+
+
+def cashiers_columns(t):
+    return {
+        'name': [f"{f} {l}" for f, l in zip(t['first_name'], t['last_name'])],
+        'sales': _numbers(t['total_sales']),
+    }
+
+
+def occupancy_columns(t):
+    return {
+        'y_routes': [trip_label(n, pk) for n, pk in zip(t['number'], t['id'])],
+        'right': _numbers(t['occupancy_rate']),
+    }
+
+
+def train_types_columns(t):
+    return {
+        'x': _numbers(t['avg_passenger_age']),
+        'y': _numbers(t['max_ticket_price']),
+        't_type': t['train_type'],
+    }
+
+
+def months_columns(t):
+    # month - перший день місяця (date); мітка 'РРРР-ММ', вісь категоріальна
+    return {
+        'x': [month.strftime('%Y-%m') for month in t['month']],
+        'y': t['tickets_sold'],
+    }
+
+
+def top_passengers_columns(t):
+    # Розвертаємо: hbar малює знизу вгору, найбільший має бути зверху
+    return {
+        'y': [f"{f} {l} (#{pk})" for f, l, pk in zip(t['first_name'], t['last_name'], t['id'])][::-1],
+        'right': _numbers(t['total_spent'])[::-1],
+    }
+
+
+CHART_COLUMNS = {
+    'revenue': revenue_columns,
+    'cashiers': cashiers_columns,
+    'occupancy': occupancy_columns,
+    'train_types': train_types_columns,
+    'months': months_columns,
+    'top_passengers': top_passengers_columns,
+}
+
+
+def chart_columns(chart: str, analytics) -> dict:
+    return CHART_COLUMNS[chart](analytics[CHART_SOURCES[chart]])
@@ -0,0 +1,68 @@
+# tickets/columnar.py
+# --- Колонковий результат аналітики ---
+# Будується прямо з values_list(): {'колонка': [значення, ...]} без проміжних
+# dict на кожен рядок і без pandas. Decimal одразу стає float (JSON і NumPy),
+# статистика рахується векторно по np.ndarray.
+from decimal import Decimal
+from typing import Iterable, Sequence
+
+from railway.lazy import LazyModule
+
+# numpy потрібен лише для статистики - не тягнемо його в кожен імпорт репозиторію
+np = LazyModule('numpy')
+
+# Операція -> nan-редукція NumPy (np.nansum, np.nanmean, ...)
+STATS = ('sum', 'mean', 'median', 'min', 'max')
+
+
+def _plain(column: list) -> list:
+    if any(isinstance(value, Decimal) for value in column):
+        return [None if value is None else float(value) for value in column]
+    return column
+
+
+class ColumnTable:
+    __slots__ = ('names', 'columns')
+
+    def __init__(self, names: Sequence[str], columns: Sequence[list]):
+        self.names = tuple(names)
+        self.columns = [_plain(list(column)) for column in columns]
+
+    @classmethod
+    def from_rows(cls, names: Sequence[str], rows: Iterable[tuple]) -> 'ColumnTable':
+        """Кортежі з values_list() -> колонки (транспонування одним zip)."""
+        rows = list(rows)
+        columns = list(zip(*rows)) if rows else [() for _ in names]
+        return cls(names, columns)
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def __getitem__(self, name: str) -> list:
+        return self.columns[self.names.index(name)]
+
+    def select(self, *names: str) -> 'ColumnTable':
+        return ColumnTable(names, [self[name] for name in names])
+
+    def as_dict(self) -> dict:
+        return dict(zip(self.names, self.columns))
+
+    def records(self) -> list:
+        return [dict(zip(self.names, row)) for row in zip(*self.columns)]
+
+    def array(self, name: str):
+        # None -> NaN, щоб nan-функції NumPy його пропускали
+        return np.array([np.nan if v is None else v for v in self[name]], dtype=float)
+
+    def stats(self, name: str, ops: Sequence[str] = STATS) -> dict:
+        """Статистика колонки; порожня (або вся з None) колонка дає 0.0."""
+        values = self.array(name)
+        if not len(values) or np.isnan(values).all():
+            return {op: 0.0 for op in ops}
+        return {op: float(getattr(np, f'nan{op}')(values)) for op in ops}
+
+    def argmax(self, name: str):
+        values = self.array(name)
+        if not len(values) or np.isnan(values).all():
+            return None
+        return int(np.nanargmax(values))
@@ -0,0 +1,65 @@
+# tickets/executor.py
+# --- Спільний на процес пул потоків для паралельних запитів до БД ---
+# Замість нового ThreadPoolExecutor на кожен виклик: DB_EXECUTOR_WORKERS довгоживучих
+# потоків, кожен з власним постійним з'єднанням (CONN_MAX_AGE + CONN_HEALTH_CHECKS).
+# Тож паралельна аналітика бере вже "теплі" з'єднання, без TCP/auth на кожен запит.
+import atexit
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _run(func: Callable, *args):
+    # Як на початку HTTP-запиту: зламане або старше за CONN_MAX_AGE з'єднання закривається,
+    # а для живого наступний запит спершу зробить health check
+    close_old_connections()
+    return func(*args)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.DB_EXECUTOR_WORKERS, thread_name_prefix='tickets-db'
+                )
+    return _executor
+
+
+def pool_size() -> int:
+    return settings.DB_EXECUTOR_WORKERS
+
+
+def submit(func: Callable, *args) -> Future:
+    return get_executor().submit(_run, func, *args)
+
+
+def run_parallel(func: Callable, items: Iterable, parallelism: Optional[int] = None) -> List:
+    """
+    func(item) для кожного елемента у спільному пулі, не більше parallelism задач одночасно
+    (за замовчуванням - весь пул). Результати - у порядку items.
+    """
+    gate = threading.BoundedSemaphore(max(1, min(parallelism or pool_size(), pool_size())))
+    futures = []
+    for item in items:
+        gate.acquire()
+        future = submit(func, item)
+        future.add_done_callback(lambda _: gate.release())
+        futures.append(future)
+    return [future.result() for future in futures]
+
+
+@atexit.register
+def shutdown():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
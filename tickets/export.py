@@ -0,0 +1,59 @@
+# tickets/export.py
+# --- Потоковий експорт таблиць (JSON / NDJSON) ---
+# Рядки читаються values()-пачками по id (keyset), а не одним запитом:
+# mysqlclient буферизує весь результат на клієнті навіть для .iterator(),
+# тож лише короткі запити по chunk_size рядків тримають пам'ять сталою.
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+from .repositories import CashierRepository, PassengerRepository, TicketRepository, TripRepository
+from .pagination import paginate_keyset
+
+# Сутність -> репозиторій; колонки - його форма 'export'
+EXPORT_ENTITIES = {
+    'passengers': PassengerRepository,
+    'cashiers': CashierRepository,
+    'trips': TripRepository,
+    'tickets': TicketRepository,
+}
+
+
+class NDJSONRenderer(BaseRenderer):
+    # Потрібен лише для content negotiation (?format=ndjson); тіло віддає StreamingHttpResponse
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+
+
+def iter_rows(entity: str, chunk_size: int = 2000):
+    queryset = EXPORT_ENTITIES[entity]().values('export')
+    cursor = None
+    while True:
+        page = paginate_keyset(queryset, ('id',), cursor, chunk_size)
+        yield from page.object_list
+        if not page.has_next:
+            return
+        cursor = page.next_cursor
+
+
+def _dumps(row) -> str:
+    return json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def ndjson_stream(rows):
+    for row in rows:
+        yield _dumps(row) + '\n'
+
+
+def json_array_stream(rows):
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + _dumps(row)
+        separator = ','
+    yield ']'
@@ -0,0 +1,93 @@
+# tickets/fast_serializers.py
+# --- Швидкий read-only шлях серіалізації (list/retrieve у REST) ---
+# ModelSerializer на кожен рядок будує поля, викликає get_attribute/to_representation
+# і створює інстанс моделі - на тисячах рядків це дорожче за сам SQL.
+# Тут конвертер кожного поля обирається один раз (за типом поля моделі), а рядки -
+# dict-и з values() або вже готові інстанси (get_by_id / get_many з кешу).
+# Формат відповіді такий самий, як у ModelSerializer з fields='__all__'.
+from decimal import Decimal
+from typing import Callable, Iterable, Optional, Sequence
+
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
+
+
+def _decimal(field: models.DecimalField) -> Callable:
+    # Як serializers.DecimalField: квантування до decimal_places, рядок (COERCE_DECIMAL_TO_STRING)
+    exponent = Decimal(1).scaleb(-field.decimal_places)
+    if api_settings.COERCE_DECIMAL_TO_STRING:
+        return lambda value: '{:f}'.format(Decimal(value).quantize(exponent))
+    return lambda value: Decimal(value).quantize(exponent)
+
+
+def _datetime(value):
+    # Як serializers.DateTimeField: поточна таймзона, ISO 8601, '+00:00' -> 'Z'
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _file(field: models.FileField) -> Callable:
+    # values() дає шлях, інстанс - FieldFile; DRF без request у контексті віддає відносний URL
+    storage = field.storage
+    return lambda value: storage.url(str(value)) if value else None
+
+
+def _converter(field: models.Field) -> Optional[Callable]:
+    """Функція значення -> JSON-значення; None - значення як є (str, int, bool)."""
+    if isinstance(field, models.DecimalField):
+        return _decimal(field)
+    if isinstance(field, models.DateTimeField):
+        if api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+            return lambda value: timezone.localtime(value).strftime(api_settings.DATETIME_FORMAT)
+        return _datetime
+    if isinstance(field, models.DateField):
+        if api_settings.DATE_FORMAT.lower() != ISO_8601:
+            return lambda value: value.strftime(api_settings.DATE_FORMAT)
+        return lambda value: value.isoformat()
+    if isinstance(field, models.FileField):
+        return _file(field)
+    if isinstance(field, (models.UUIDField, models.DurationField)):
+        return str
+    return None
+
+
+class FastSerializer:
+    __slots__ = ('model', 'fields', '_columns')
+
+    def __init__(self, model, fields: Optional[Sequence[str]] = None):
+        """fields - форма репозиторію (None - усі колонки, як fields='__all__')."""
+        self.model = model
+        meta = model._meta
+        if fields is None:
+            fields = [field.name for field in meta.concrete_fields]
+        self.fields = tuple(fields)
+        # (ключ у відповіді, атрибут інстансу / ключ values(), конвертер)
+        self._columns = tuple(
+            (name, meta.get_field(name).attname, _converter(meta.get_field(name)))
+            for name in self.fields
+        )
+
+    def values(self, queryset) -> models.QuerySet:
+        """values() з тими самими ключами, що читає to_representation (attname: trip_id)."""
+        return queryset.values(*(attname for _, attname, _ in self._columns))
+
+    def to_representation(self, row) -> dict:
+        # Інстанс читаємо з __dict__ (сирі значення, без FieldFile/дескрипторів); відкладені поля - getattr
+        data = row if isinstance(row, dict) else row.__dict__
+        result = {}
+        for name, attname, convert in self._columns:
+            value = data[attname] if attname in data else getattr(row, attname)
+            result[name] = value if convert is None or value is None else convert(value)
+        return result
+
+    def many(self, rows: Iterable) -> list:
+        return [self.to_representation(row) for row in rows]
+
+
+def for_shapes(model, shapes: dict, names: Sequence[str] = ('list_row', 'detail')) -> dict:
+    """{форма: FastSerializer} для форм репозиторію (?shape= у list())."""
+    return {name: FastSerializer(model, shapes[name]) for name in names}
@@ -0,0 +1,93 @@
+# tickets/filters.py
+# --- Фільтри аналітики дашбордів ---
+# Один об'єкт замість розрізнених GET-параметрів: його приймає
+# RepositoryManager.get_complex_analytics і перетворює на WHERE/HAVING/LIMIT,
+# тож з БД виходять лише ті рядки, що реально малюються.
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def _float(value, default=0.0) -> float:
+    try:
+        value = float(value or default)
+    except (TypeError, ValueError):
+        return default
+    # nan/inf float() приймає, але в SQL-порівнянні (HAVING, Decimal) вони дають помилку
+    return value if math.isfinite(value) else default
+
+
+def _date(value) -> Optional[date]:
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class AnalyticsFilters:
+    min_revenue: float = 0.0        # рейси з прибутком >= (HAVING / WHERE по лічильнику)
+    min_occupancy: float = 0.0      # рейси з завантаженістю >= %
+    train_type: Optional[str] = None  # None = всі типи; звужує графіки по рейсах
+    top_n: int = 10                 # LIMIT для топу пасажирів
+    date_from: Optional[date] = None  # вікно дат покупки квитків (включно)
+    date_to: Optional[date] = None
+
+    @classmethod
+    def from_params(cls, params) -> 'AnalyticsFilters':
+        """Порожні/зіпсовані значення -> значення за замовчуванням."""
+        try:
+            top_n = int(params.get('top_n') or 10)
+        except (TypeError, ValueError):
+            top_n = 10
+        train_type = params.get('train_type') or None
+        return cls(
+            min_revenue=max(_float(params.get('min_revenue')), 0.0),
+            min_occupancy=max(_float(params.get('min_occupancy')), 0.0),
+            train_type=None if train_type == 'All' else train_type,
+            top_n=max(1, min(top_n, settings.ANALYTICS_TOP_N_MAX)),
+            date_from=_date(params.get('date_from')),
+            date_to=_date(params.get('date_to')),
+        )
+
+    @property
+    def windowed(self) -> bool:
+        # Лічильники і знімки - за весь час, тож вікно дат рахується лише по живих таблицях
+        return bool(self.date_from or self.date_to)
+
+    def purchase_window(self, prefix: str = '') -> Q:
+        """Умова на purchase_date квитка; prefix='tickets__' - для запитів від рейсу/пасажира."""
+        condition = Q()
+        if self.date_from:
+            condition &= Q(**{f'{prefix}purchase_date__gte': timezone.make_aware(
+                datetime.combine(self.date_from, dt_time.min))})
+        # date.max - верхньої межі немає (наступного дня вже не існує)
+        if self.date_to and self.date_to < date.max:
+            condition &= Q(**{f'{prefix}purchase_date__lt': timezone.make_aware(
+                datetime.combine(self.date_to + timedelta(days=1), dt_time.min))})
+        return condition
+
+    def day_window(self, prefix: str = '') -> Q:
+        """Та сама умова для денних кошиків SalesRollup (поле day, межі включно)."""
+        condition = Q()
+        if self.date_from:
+            condition &= Q(**{f'{prefix}day__gte': self.date_from})
+        if self.date_to:
+            condition &= Q(**{f'{prefix}day__lte': self.date_to})
+        return condition
+
+    def as_dict(self) -> dict:
+        return {
+            'min_revenue': self.min_revenue,
+            'min_occupancy': self.min_occupancy,
+            'train_type': self.train_type or 'All',
+            'top_n': self.top_n,
+            'date_from': self.date_from.isoformat() if self.date_from else None,
+            'date_to': self.date_to.isoformat() if self.date_to else None,
+        }
@@ -0,0 +1,85 @@
+# tickets/management/commands/bench_analytics.py
+import asyncio
+import concurrent.futures
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from tickets.filters import AnalyticsFilters
+from tickets.repositories import RepositoryManager
+
+
+class PeakThreads:
+    """Фоновий семплер threading.active_count() - скільки потоків одночасно жило під час прогону."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, threading.active_count())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Command(BaseCommand):
+    help = ("Порівнює get_complex_analytics (пул потоків) і aget_complex_analytics (asyncio.gather) "
+            "під N одночасними 'запитами' дашборду")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20, help="Одночасних запитів аналітики")
+        parser.add_argument('--rounds', type=int, default=3, help="Кількість повторів кожного варіанту")
+        parser.add_argument('--live', action='store_true', help="Рахувати по живих таблицях, а не по знімках")
+
+    def handle(self, *args, **options):
+        repo = RepositoryManager()
+        filters = AnalyticsFilters()
+        concurrency, live = options['concurrency'], options['live']
+
+        def sync_request():
+            try:
+                return repo.get_complex_analytics(filters, live=live)
+            finally:
+                connection.close()
+
+        def run_sync():
+            # Як потоковий WSGI-сервер: кожен запит у своєму потоці, паралельні запити - у спільному пулі tickets.executor
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(lambda _: sync_request(), range(concurrency)))
+
+        async def gather_async():
+            await asyncio.gather(*(repo.aget_complex_analytics(filters, live=live) for _ in range(concurrency)))
+
+        def run_async():
+            asyncio.run(gather_async())
+
+        # Прогрів: оновлення знімків і кеш з'єднань не мають потрапити в заміри
+        repo.get_complex_analytics(filters, live=live)
+
+        self.stdout.write(f"{concurrency} одночасних запитів, {options['rounds']} повтори, "
+                          f"{'живі таблиці' if live else 'знімки'}")
+        for name, run in (('threads', run_sync), ('asyncio', run_async)):
+            timings, peaks = [], []
+            for _ in range(options['rounds']):
+                with PeakThreads() as sampler:
+                    started = time.perf_counter()
+                    run()
+                    timings.append(time.perf_counter() - started)
+                peaks.append(sampler.peak)
+            self.stdout.write(
+                f"{name:>8}: медіана {statistics.median(timings) * 1000:.1f} мс, "
+                f"на запит {statistics.median(timings) / concurrency * 1000:.2f} мс, "
+                f"пік потоків {max(peaks)}"
+            )
@@ -0,0 +1,87 @@
+# tickets/management/commands/benchmark.py
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tickets import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Відтворюваний бенчмарк: генерує датасет, проганяє сценарії (сторінки списків, аналітика, серіалізація API, "
+            "продаж квитка, експорт API) і пише p50/p95/p99, пропускну здатність і пам'ять у JSON. "
+            "--compare BASE NEW порівнює два файли результатів")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, metavar='TICKETS',
+                            help="Спершу згенерувати датасет на TICKETS квитків")
+        parser.add_argument('--reset', action='store_true', help="Видалити попередній згенерований датасет")
+        parser.add_argument('--random-seed', type=int, default=42, help="Зерно генератора датасету")
+        parser.add_argument('--scenario', action='append', choices=sorted(benchmark.SCENARIOS),
+                            help="Сценарій (можна кілька разів); за замовчуванням - усі")
+        parser.add_argument('--warmup', type=int, default=3, help="Прогрівальних викликів на сценарій")
+        parser.add_argument('--trials', type=int, default=30, help="Вимірюваних викликів на сценарій")
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help="Одночасних викликів (окремий пул потоків бенчмарку, не DB_EXECUTOR_WORKERS)")
+        parser.add_argument('--output', default=str(settings.BENCHMARK_RESULTS_FILE),
+                            help="Куди записати JSON ('-' - у stdout)")
+        parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="Порівняти два JSON-результати")
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help="Погіршення у %%, яке вважається регресією (для --compare)")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Код помилки, якщо --compare знайшов регресію (для CI)")
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'], options['fail_on_regression'])
+        if options['trials'] < 1:
+            raise CommandError("--trials має бути >= 1")
+
+        if options['reset']:
+            benchmark.reset_bench_data()
+            self.stdout.write("Попередній датасет видалено")
+        if options['seed']:
+            counts = benchmark.seed_bench_data(options['seed'], options['random_seed'])
+            self.stdout.write(self.style.SUCCESS(f"Датасет: {counts}"))
+        def progress(name, row):
+            self.stderr.write(
+                f"{name:>22}: p50 {row['p50_ms']:8.2f} мс  p95 {row['p95_ms']:8.2f}  p99 {row['p99_ms']:8.2f}  "
+                f"{row['throughput_rps']} оп/с  запитів {row['queries']}  пам'ять {row['peak_alloc_mb']} MB"
+            )
+
+        results = benchmark.run(
+            options['scenario'] or list(benchmark.SCENARIOS), options['warmup'], options['trials'],
+            max(1, options['concurrency']), progress=progress,
+        )
+        payload = json.dumps(results, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(payload)
+        else:
+            path = Path(options['output'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(payload, encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Результати: {path}"))
+
+    def compare(self, base_path, new_path, threshold, fail):
+        base, new = benchmark.load_results(base_path), benchmark.load_results(new_path)
+        if base is None or new is None:
+            raise CommandError(f"Файл не знайдено: {base_path if base is None else new_path}")
+
+        # Різні датасет/БД/паралелізм - порівняння некоректне, але не забороняємо
+        for key in ('database', 'dataset', 'concurrency'):
+            if base['meta'].get(key) != new['meta'].get(key):
+                self.stdout.write(self.style.WARNING(
+                    f"Увага: різне {key}: {base['meta'].get(key)} vs {new['meta'].get(key)}"
+                ))
+
+        rows = benchmark.compare(base, new, threshold)
+        for row in rows:
+            line = (f"{row['scenario']:>22} {row['metric']:>15}: {row['base']:>10} -> {row['new']:>10} "
+                    f"({row['change_pct']:+.1f}%)")
+            self.stdout.write(self.style.ERROR(line) if row['regression'] else line)
+
+        regressions = [row for row in rows if row['regression']]
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"Регресій понад {threshold}% немає"))
+        elif fail:
+            raise CommandError(f"Регресій понад {threshold}%: {len(regressions)}")
@@ -0,0 +1,87 @@
+# tickets/management/commands/importtime.py
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Модулі, які не мають завантажуватись під час старту воркера (див. railway/lazy.py)
+HEAVY_MODULES = ('pandas', 'numpy', 'plotly', 'bokeh', 'psutil')
+
+# Що робить воркер до першого запиту: django.setup() + імпорт усіх в'юх через URLconf
+CHILD_SCRIPT = """
+import json, resource, sys
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+for name in sys.argv[1:]:
+    __import__(name)
+print(json.dumps({
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def parse_importtime(stderr: str):
+    """Рядки 'import time: self [us] | cumulative | name' -> [(cumulative_us, depth, name)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative), (len(name) - len(name.lstrip())) // 2, name.strip()))
+    return rows
+
+
+class Command(BaseCommand):
+    help = ("Заміряє старт воркера (python -X importtime): сумарний час імпортів, "
+            "найповільніші пакети, пікову RSS і чи не завантажились важкі модулі аналітики")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help="Скільки найповільніших пакетів показати")
+        parser.add_argument('--module', action='append', default=[],
+                            help="Додатково імпортувати модуль (наприклад, pandas - для порівняння)")
+        parser.add_argument('--max-ms', type=float, default=None,
+                            help="Помилка, якщо сумарний час імпортів більший (для CI)")
+        parser.add_argument('--json', action='store_true', help="Вивести результат як JSON")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'railway.settings')}
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, *options['module']],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(proc.stderr.strip().splitlines()[-1] if proc.stderr else 'import failed')
+
+        child = json.loads(proc.stdout.strip().splitlines()[-1])
+        rows = parse_importtime(proc.stderr)
+        top_level = sorted((r for r in rows if r[1] == 0), reverse=True)
+        total_ms = sum(r[0] for r in top_level) / 1000
+
+        result = {
+            'total_import_ms': round(total_ms, 1),
+            'modules': len(rows),
+            'rss_mb': round(child['rss_mb'], 1),
+            'heavy_loaded': child['heavy'],
+            'slowest': [{'module': name, 'ms': round(us / 1000, 1)} for us, _, name in top_level[:options['top']]],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            self.stdout.write(f"Імпорти: {result['total_import_ms']} мс, модулів: {result['modules']}, "
+                              f"пікова RSS: {result['rss_mb']} MB")
+            for row in result['slowest']:
+                self.stdout.write(f"  {row['ms']:>8.1f} мс  {row['module']}")
+            if child['heavy']:
+                self.stdout.write(self.style.WARNING(f"Завантажені важкі модулі: {', '.join(child['heavy'])}"))
+            else:
+                self.stdout.write(self.style.SUCCESS("Важкі модулі аналітики не завантажені"))
+
+        if options['max_ms'] is not None and total_ms > options['max_ms']:
+            raise CommandError(f"Старт {total_ms:.1f} мс перевищує ліміт {options['max_ms']} мс")
@@ -0,0 +1,26 @@
+# tickets/management/commands/reconcile_counters.py
+from django.core.management.base import BaseCommand
+from tickets.repositories import RepositoryManager
+
+
+class Command(BaseCommand):
+    help = ("Звіряє лічильники Trip.sold_count/revenue_total, Cashier.tickets_count/total_sales "
+            "і Passenger.total_spent, а також денні агрегати SalesRollup з квитками та виправляє розбіжності")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Лише показати розбіжності, нічого не змінювати")
+        parser.add_argument('--rollups', action='store_true', help="Перерахувати денні агрегати продажів (SalesRollup), навіть якщо розбіжностей немає")
+
+    def handle(self, *args, **options):
+        drifted = RepositoryManager().reconcile_counters(dry_run=options['dry_run'])
+
+        for model_name, count in drifted.items():
+            if count:
+                action = "знайдено" if options['dry_run'] else "виправлено"
+                self.stdout.write(self.style.WARNING(f"{model_name}: {action} розбіжностей - {count}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{model_name}: лічильники узгоджені"))
+
+        if options['rollups'] and not options['dry_run']:
+            buckets = RepositoryManager().rebuild_sales_rollup()
+            self.stdout.write(self.style.SUCCESS(f"SalesRollup: перераховано кошиків - {buckets}"))
@@ -0,0 +1,28 @@
+# tickets/management/commands/refresh_analytics.py
+import time
+
+from django.core.management.base import BaseCommand
+from tickets.repositories import RepositoryManager
+
+
+class Command(BaseCommand):
+    help = "Перераховує матеріалізовані знімки аналітики (для cron або як фоновий цикл з --interval)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Повторювати кожні N секунд (0 - виконати один раз)",
+        )
+
+    def handle(self, *args, **options):
+        repo = RepositoryManager()
+        interval = options['interval']
+
+        while True:
+            state = repo.refresh_analytics_snapshots()
+            self.stdout.write(self.style.SUCCESS(
+                f"Знімки оновлено о {state.refreshed_at:%Y-%m-%d %H:%M:%S} за {state.duration_ms} мс"
+            ))
+            if interval <= 0:
+                break
+            time.sleep(interval)
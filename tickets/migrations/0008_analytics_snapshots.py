@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_ticket_purchase_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsSnapshotState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refreshed_at', models.DateTimeField()),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrainTypeStatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('train_type', models.CharField(max_length=100, unique=True)),
+                ('avg_passenger_age', models.FloatField(null=True)),
+                ('max_ticket_price', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.15 on 2026-10-18 17:11
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    for model_name, fk, count_field, sum_field in (
+        ('Trip', 'trip', 'sold_count', 'revenue_total'),
+        ('Cashier', 'cashier', 'tickets_count', 'total_sales'),
+    ):
+        tickets = Ticket.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk)
+        apps.get_model('tickets', model_name).objects.update(**{
+            count_field: Coalesce(Subquery(tickets.annotate(c=Count('id')).values('c')), 0),
+            sum_field: Coalesce(
+                Subquery(tickets.annotate(s=Sum('paid_amount')).values('s')),
+                Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2)
+            ),
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_analytics_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashier',
+            name='tickets_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cashier',
+            name='total_sales',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='revenue_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='sold_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
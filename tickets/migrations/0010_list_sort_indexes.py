@@ -0,0 +1,41 @@
+# Generated by Django 5.1.15 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_trip_cashier_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cashier',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='cashier_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashier',
+            index=models.Index(fields=['hire_date', 'id'], name='cashier_hire_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passenger',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='passenger_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passenger',
+            index=models.Index(fields=['age', 'id'], name='passenger_age_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['base_price', 'id'], name='ticket_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['purchase_date', 'id'], name='ticket_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['payment_method', 'id'], name='ticket_payment_id_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_list_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='passenger',
+            index=models.Index(fields=['passport'], name='passenger_passport_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['trip', 'purchase_date'], name='ticket_trip_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['cashier', 'paid_amount'], name='ticket_cashier_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['departure'], name='trip_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['train_type'], name='trip_train_type_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-18 17:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    SalesRollup = apps.get_model('tickets', 'SalesRollup')
+    rows = Ticket.objects.annotate(day=TruncDate('purchase_date')).values(
+        'day', 'trip_id', 'cashier_id', 'payment_method'
+    ).annotate(tickets_sold=Count('id'), revenue=Sum('paid_amount')).order_by()
+    SalesRollup.objects.bulk_create((SalesRollup(**row) for row in rows), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('payment_method', models.CharField(blank=True, default='Cash', max_length=50)),
+                ('tickets_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cashier', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='tickets.cashier')),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='tickets.trip')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'trip', 'cashier', 'payment_method'), name='sales_rollup_bucket_uniq'),
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-18 17:36
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_total_spent(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    tickets = Ticket.objects.filter(passenger=OuterRef('pk')).order_by().values('passenger')
+    apps.get_model('tickets', 'Passenger').objects.update(total_spent=Coalesce(
+        Subquery(tickets.annotate(s=Sum('paid_amount')).values('s')),
+        Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passenger',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(backfill_total_spent, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='passenger',
+            index=models.Index(fields=['-total_spent', 'id'], name='passenger_spent_id_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0013_passenger_total_spent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cashier',
+            name='tickets_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='cashier',
+            name='total_sales',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='passenger',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='trip',
+            name='revenue_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='trip',
+            name='sold_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
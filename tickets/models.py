@@ -1,9 +1,24 @@
 from decimal import Decimal
-from django.db import models
+from collections import defaultdict
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.forms import ValidationError
+from django.utils import timezone
+# Лічильники оновлюються F()-UPDATE без post_save - кеш репозиторіїв інвалідовуємо вручну
+from .cache import invalidate_on_commit
 from datetime import date
 from decimal import Decimal
 
+class SoldOut(Exception):
+    """На рейсі не вистачає вільних місць (перевіряється атомарно в БД)."""
+
+    def __init__(self, trip_id, requested):
+        self.trip_id = trip_id
+        self.requested = requested
+        super().__init__(f"Рейс #{trip_id}: немає {requested} вільних місць")
+
 class TicketOffice(models.Model):
     name = models.CharField(max_length=255, default="Залізнична каса Львів")
     location = models.CharField(max_length=255)
@@ -32,10 +47,35 @@ class Person(models.Model):
 class Passenger(Person):
     passport = models.CharField(max_length=50)
     age = models.PositiveIntegerField()
+    # Денормалізована сума покупок, підтримується в Ticket.save() / post_delete - таблиця лідерів.
+    # editable=False: у ModelSerializer і адмінці лише для читання, repositories.update() її відхиляє
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        # Під ?sort= у списку пасажирів: id - хвіст для курсора
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='passenger_name_id_idx'),
+            models.Index(fields=['age', 'id'], name='passenger_age_id_idx'),
+            # PassengerRepository.find_by_passport
+            models.Index(fields=['passport'], name='passenger_passport_idx'),
+            # Топ-N пасажирів: ORDER BY total_spent DESC, id - рівні суми впорядковані за id
+            models.Index(fields=['-total_spent', 'id'], name='passenger_spent_id_idx'),
+        ]
+
     def __str__(self): return f"{self.full_name} ({self.passport})"
 
 class Cashier(Person):
     hire_date = models.DateField()
+    # Денормалізовані лічильники, підтримуються в Ticket.save() / post_delete
+    tickets_count = models.PositiveIntegerField(default=0, editable=False)
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='cashier_name_id_idx'),
+            models.Index(fields=['hire_date', 'id'], name='cashier_hire_id_idx'),
+        ]
+
     def __str__(self): return self.full_name
 
 class Trip(models.Model):
@@ -52,9 +92,22 @@ class Trip(models.Model):
     departure = models.DateTimeField(auto_now_add=True) # Спрощено для прикладу
     arrival = models.DateTimeField(auto_now_add=True)
 
+    # Денормалізовані лічильники, підтримуються в Ticket.save() / post_delete
+    # (editable=False: обнулений через API чи адмінку sold_count зламав би перевірку місткості)
+    sold_count = models.PositiveIntegerField(default=0, editable=False)
+    revenue_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # TripRepository.upcoming (departure >= ...)
+            models.Index(fields=['departure'], name='trip_departure_idx'),
+            # Список типів для фільтра дашборду (DISTINCT train_type) і групування train_type_stats
+            models.Index(fields=['train_type'], name='trip_train_type_idx'),
+        ]
+
     @property
     def available_seats(self):
-        return self.capacity - self.tickets.count()
+        return self.capacity - self.sold_count
     def __str__(self): return f"{self.start_station} - {self.end_station}"
 
 class Ticket(models.Model):
@@ -68,8 +121,163 @@ class Ticket(models.Model):
     paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     payment_method = models.CharField(max_length=50, blank=True, default="Cash")
 
+    class Meta:
+        # Сортування/фільтри списку квитків (?sort=price|date|payment) + курсорна пагінація по id;
+        # trip - вже є індекс зовнішнього ключа
+        indexes = [
+            models.Index(fields=['base_price', 'id'], name='ticket_price_id_idx'),
+            models.Index(fields=['purchase_date', 'id'], name='ticket_date_id_idx'),
+            models.Index(fields=['payment_method', 'id'], name='ticket_payment_id_idx'),
+            # Продажі рейсу за період (аналітика з ?date_from/?date_to, звіти по рейсу)
+            models.Index(fields=['trip', 'purchase_date'], name='ticket_trip_date_idx'),
+            # Суми по касиру (reconcile_counters, cashier_performance) - покривний, без читання рядків
+            models.Index(fields=['cashier', 'paid_amount'], name='ticket_cashier_paid_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.base_price:
             self.base_price = self.trip.price
         self.paid_amount = self.base_price # Спрощена логіка для Лаби 3
-        super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = Ticket.objects.filter(pk=self.pk).values('passenger_id', *SalesRollup.TICKET_FIELDS).first()
+
+            # Лічильники зсуваємо ДО вставки: умовний UPDATE блокує рядок рейсу
+            # до кінця транзакції, тож перевірка місткості не має гонок
+            current = {'trip_id': self.trip_id, 'cashier_id': self.cashier_id, 'paid_amount': self.paid_amount}
+            if previous is None or any(previous[k] != v for k, v in current.items()):
+                if previous is not None:
+                    self.apply_counters(previous['trip_id'], previous['cashier_id'], -1, -previous['paid_amount'])
+                self.apply_counters(
+                    self.trip_id, self.cashier_id, 1, self.paid_amount,
+                    check_capacity=previous is None or previous['trip_id'] != self.trip_id,
+                )
+            if previous is None or (previous['passenger_id'], previous['paid_amount']) != (self.passenger_id, self.paid_amount):
+                if previous is not None:
+                    self.apply_passenger_spend({previous['passenger_id']: -previous['paid_amount']})
+                self.apply_passenger_spend({self.passenger_id: self.paid_amount})
+            super().save(*args, **kwargs)
+
+            # Денні агрегати: purchase_date відоме лише після вставки (auto_now_add)
+            if previous is None:
+                SalesRollup.record([self])
+            elif any(previous[k] != getattr(self, k) for k in SalesRollup.TICKET_FIELDS):
+                SalesRollup.record([Ticket(**previous)], sign=-1)
+                SalesRollup.record([self])
+
+    @staticmethod
+    def apply_counters(trip_id, cashier_id, tickets, amount, check_capacity=False):
+        """
+        Атомарно зсуває лічильники рейсу і касира (UPDATE ... SET x = x + n).
+        З check_capacity=True оновлення умовне (sold_count + n <= capacity)
+        і, якщо місць немає, кидає SoldOut.
+        """
+        trips = Trip.objects.filter(pk=trip_id)
+        if check_capacity:
+            trips = trips.filter(capacity__gte=F('sold_count') + tickets)
+        updated = trips.update(
+            sold_count=F('sold_count') + tickets,
+            revenue_total=F('revenue_total') + amount,
+        )
+        if check_capacity and not updated:
+            raise SoldOut(trip_id, tickets)
+        invalidate_on_commit(Trip)
+        if cashier_id is not None:
+            Ticket.apply_cashier_counters(cashier_id, tickets, amount)
+
+    @staticmethod
+    def apply_cashier_counters(cashier_id, tickets, amount):
+        Cashier.objects.filter(pk=cashier_id).update(
+            tickets_count=F('tickets_count') + tickets,
+            total_sales=F('total_sales') + amount,
+        )
+        invalidate_on_commit(Cashier)
+
+    @staticmethod
+    def apply_passenger_spend(amounts):
+        """amounts: {passenger_id: сума}; порядок id фіксований, як і для рейсів у bulk_sell."""
+        for passenger_id in sorted(amounts):
+            Passenger.objects.filter(pk=passenger_id).update(total_spent=F('total_spent') + amounts[passenger_id])
+        invalidate_on_commit(Passenger)
+
+
+# post_delete, а не Ticket.delete(): сигнал спрацьовує і для каскадних/масових видалень
+@receiver(post_delete, sender=Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    Ticket.apply_counters(instance.trip_id, instance.cashier_id, -1, -instance.paid_amount)
+    Ticket.apply_passenger_spend({instance.passenger_id: -instance.paid_amount})
+    SalesRollup.record([instance], sign=-1)
+
+
+# --- Денні агрегати продажів (день, рейс, касир, спосіб оплати) ---
+# Підтримуються інкрементально при кожному продажу/зміні/видаленні квитка.
+# Місячні/тижневі/денні ряди і будь-які вікна дат - це SUM по кількох рядках
+# на день замість GROUP BY по всіх квитках (див. RepositoryManager.sales_series).
+class SalesRollup(models.Model):
+    # Поля квитка, від яких залежить його кошик і внесок
+    TICKET_FIELDS = ('trip_id', 'cashier_id', 'paid_amount', 'payment_method', 'purchase_date')
+
+    day = models.DateField()
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='sales_rollups')
+    # Як і в Ticket: звільнений касир -> NULL. NULL-и в UniqueConstraint різні, тож кошиків з NULL на той самий
+    # (день, рейс, спосіб оплати) може бути кілька - bump() змінює лише один, суми по них лишаються точними
+    cashier = models.ForeignKey(Cashier, on_delete=models.SET_NULL, null=True, related_name='sales_rollups')
+    payment_method = models.CharField(max_length=50, blank=True, default="Cash")
+    tickets_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Заодно індекс (day, ...) для вікон дат
+            models.UniqueConstraint(fields=['day', 'trip', 'cashier', 'payment_method'], name='sales_rollup_bucket_uniq'),
+        ]
+
+    @classmethod
+    def record(cls, tickets, sign=1):
+        """Додає (sign=1) або знімає (sign=-1) квитки з їхніх денних кошиків."""
+        buckets = defaultdict(lambda: [0, Decimal('0')])
+        for ticket in tickets:
+            key = (timezone.localdate(ticket.purchase_date), ticket.trip_id, ticket.cashier_id, ticket.payment_method)
+            buckets[key][0] += sign
+            buckets[key][1] += sign * ticket.paid_amount
+        # Фіксований порядок блокувань, як у bulk_sell
+        for key in sorted(buckets, key=lambda k: (k[0], k[1], k[2] or 0, k[3])):
+            cls.bump(*key, *buckets[key])
+
+    @classmethod
+    def bump(cls, day, trip_id, cashier_id, payment_method, tickets, amount):
+        buckets = cls.objects.filter(day=day, trip_id=trip_id, cashier_id=cashier_id, payment_method=payment_method)
+        delta = {'tickets_sold': F('tickets_sold') + tickets, 'revenue': F('revenue') + amount}
+
+        def update_one():
+            # Рівно один кошик: з cashier=NULL їх може бути кілька (див. поле cashier),
+            # і UPDATE по всіх збігах зарахував би внесок кожному з них
+            bucket_id = buckets.order_by('pk').values_list('pk', flat=True).first()
+            return bucket_id is not None and cls.objects.filter(pk=bucket_id).update(**delta)
+
+        # Від'ємний внесок без кошика - квиток видаляється разом з рейсом, кошик теж
+        if update_one() or tickets <= 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    day=day, trip_id=trip_id, cashier_id=cashier_id, payment_method=payment_method,
+                    tickets_sold=tickets, revenue=amount,
+                )
+        except IntegrityError:
+            # Паралельна транзакція щойно створила цей кошик
+            update_one()
+
+
+# --- Матеріалізовані знімки аналітики (див. RepositoryManager.refresh_analytics_snapshots) ---
+class AnalyticsSnapshotState(models.Model):
+    # Один рядок (pk=1): коли знімки востаннє перераховувались
+    refreshed_at = models.DateTimeField()
+    duration_ms = models.PositiveIntegerField(default=0)
+
+class TrainTypeStatsSnapshot(models.Model):
+    train_type = models.CharField(max_length=100, unique=True)
+    avg_passenger_age = models.FloatField(null=True)
+    max_ticket_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
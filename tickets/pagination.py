@@ -0,0 +1,154 @@
+# tickets/pagination.py
+# --- Keyset (cursor) пагінація ---
+# Замість OFFSET n + COUNT(*) сторінка береться умовою "після останнього показаного
+# рядка" по впорядкованих полях: WHERE (a, id) > (:a, :id) ORDER BY a, id LIMIT n.
+# Вартість сторінки не залежить від її номера, якщо для полів сортування є індекс.
+# Останнє поле ordering має бути унікальним (зазвичай id/-id), щоб порядок був стабільним.
+import base64
+import datetime
+import json
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрізає час до мілісекунд - курсор по purchase_date тоді повторює рядки
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values, backwards: bool = False) -> str:
+    payload = json.dumps({'v': list(values), 'b': backwards}, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]):
+    """Повертає (values, backwards) або (None, False) для порожнього/зіпсованого курсора."""
+    if not cursor:
+        return None, False
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None, False
+    values = payload.get('v') if isinstance(payload, dict) else None
+    if not isinstance(values, list) or not all(isinstance(v, (str, int, float, bool, type(None))) for v in values):
+        return None, False
+    return values, bool(payload.get('b'))
+
+
+def _ordering_field(model, name: str):
+    """Поле моделі для ключа сортування: passenger__last_name, trip_id (FK -> його pk) або None."""
+    *path, last = name.split('__')
+    try:
+        for part in path:
+            model = model._meta.get_field(part).related_model
+        field = model._meta.get_field(last)
+    except (FieldDoesNotExist, AttributeError):
+        # trip_id - attname, а не name
+        field = next((f for f in model._meta.concrete_fields if f.attname == last), None) if model else None
+    if field is not None and field.is_relation:
+        field = field.target_field
+    return field
+
+
+def _cursor_values(model, ordering: Sequence[str], values: list) -> Optional[list]:
+    # Курсор приходить від клієнта: значення приводяться до типів полів; "abc" для дати/числа
+    # або null (порівняння > NULL неможливе) - недійсний курсор
+    if len(values) != len(ordering) or any(value is None for value in values):
+        return None
+    result = []
+    for field_name, value in zip(ordering, values):
+        field = _ordering_field(model, field_name.lstrip('-'))
+        try:
+            result.append(value if field is None else field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            return None
+    return result
+
+
+def _row_value(row, field: str):
+    # Підтримує і інстанси моделей (passenger__last_name -> row.passenger.last_name), і dict-и з values()
+    if isinstance(row, dict):
+        return row[field]
+    value = row
+    for part in field.split('__'):
+        value = getattr(value, part)
+    return value
+
+
+def _after(ordering: Sequence[str], values) -> Q:
+    # (a, b, id) > (va, vb, vid) з урахуванням напрямку кожного поля
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        branch = Q(**{f'{name}__{lookup}': values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            branch &= Q(**{prev_field.lstrip('-'): prev_value})
+        condition |= branch
+    return condition
+
+
+def _invert(field: str) -> str:
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def paginate_keyset(queryset, ordering: Sequence[str], cursor: Optional[str] = None, per_page: int = 20) -> KeysetPage:
+    ordering = list(ordering)
+    values, backwards = decode_cursor(cursor)
+    if values is not None:
+        values = _cursor_values(queryset.model, ordering, values)
+    if values is None:
+        # Зіпсований курсор - перша сторінка
+        backwards = False
+
+    effective = [_invert(f) for f in ordering] if backwards else ordering
+    qs = queryset.order_by(*effective)
+    if values is not None:
+        qs = qs.filter(_after(effective, values))
+
+    rows = list(qs[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    page = KeysetPage(object_list=rows)
+    if not rows:
+        return page
+
+    # Назад ми прийшли зі сторінки, що далі, тож "наступна" точно існує
+    has_next = True if backwards else has_more
+    has_previous = has_more if backwards else values is not None
+    if has_next:
+        page.next_cursor = encode_cursor([_row_value(rows[-1], f.lstrip('-')) for f in ordering])
+    if has_previous:
+        page.previous_cursor = encode_cursor([_row_value(rows[0], f.lstrip('-')) for f in ordering], backwards=True)
+    return page
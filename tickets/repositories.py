@@ -1,35 +1,150 @@
 # tickets/repositories.py
 from abc import ABC, abstractmethod
-from typing import Type, List, Optional
+from typing import Dict, Type, List, Optional
 from django.db import models
 from django.db.models import Count, Sum, Avg, Max, F, ExpressionWrapper, FloatField
-from django.db.models.functions import ExtractMonth
-from .models import Trip, Ticket, Cashier, Passenger
-from django.db import connection
+from django.db.models import DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Trunc, TruncDate
+from .models import Trip, Ticket, Cashier, Passenger, SalesRollup
+from .models import AnalyticsSnapshotState, TrainTypeStatsSnapshot
+from .signals import bump_analytics_version_on_commit
+from .filters import AnalyticsFilters
+from .columnar import ColumnTable
+from . import executor
+from . import cache as repository_cache
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from collections import defaultdict
+import asyncio
 import concurrent.futures
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_REFRESH_LOCK = 'analytics_snapshot_refresh_lock'
+
+# Кошики RepositoryManager.sales_series (Trunc по SalesRollup.day)
+SALES_PERIODS = ('day', 'week', 'month', 'quarter', 'year')
+
+# Колонки ColumnTable кожного запиту get_complex_analytics
+ANALYTICS_COLUMNS = {
+    'revenue_by_trip': ('id', 'number', 'start_station', 'end_station', 'total_revenue', 'tickets_sold'),
+    'cashier_performance': ('id', 'first_name', 'last_name', 'tickets_count', 'total_sales'),
+    'trip_occupancy': ('id', 'number', 'start_station', 'end_station', 'capacity', 'occupancy_rate'),
+    'train_type_stats': ('train_type', 'avg_passenger_age', 'max_ticket_price'),
+    'sales_by_month': ('month', 'tickets_sold', 'monthly_revenue'),
+    'top_passengers': ('id', 'first_name', 'last_name', 'total_spent'),
+}
+
 # --- Інтерфейс базового репозиторію ---
 class BaseRepository(ABC):
     model: Type[models.Model]
+    # Поля, які підтримує лише save()/сигнали (лічильники, зведення) - bulk_update/upsert і add()/update() їх не пишуть
+    protected_fields: tuple = ()
+    # Проєкції ("форми"): назва -> поля для only()/values(), None - усі колонки.
+    # list_row - рядок списку (сторінки, API list), detail - картка/retrieve, export - потоковий експорт
+    shapes: dict = {'detail': None}
 
     def __init__(self, model):
         self.model = model
 
-    def all(self) -> List[models.Model]:
-        return list(self.model.objects.all())
+    def fields_for(self, projection=None) -> Optional[tuple]:
+        """Назва форми або список полів -> кортеж полів (None - усі колонки)."""
+        if projection is None:
+            return None
+        if isinstance(projection, str):
+            try:
+                return self.shapes[projection]
+            except KeyError:
+                raise ValueError(f"{self.model.__name__}: невідома форма {projection!r}") from None
+        return tuple(projection)
+
+    def queryset(self, projection=None) -> models.QuerySet:
+        queryset = self.model.objects.all()
+        fields = self.fields_for(projection)
+        if fields is None:
+            return queryset
+        # trip__start_station -> JOIN trip одразу, інакше кожен рядок дочитував би зв'язок окремим запитом
+        related = sorted({name.split('__')[0] for name in fields if '__' in name})
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*fields)
+
+    def values(self, projection='export') -> models.QuerySet:
+        """dict-рядки лише з полями форми - без інстансів моделей (експорт, аналітика)."""
+        return self.model.objects.values(*(self.fields_for(projection) or ()))
+
+    # Читання йдуть через tickets.cache: для моделей з REPOSITORY_CACHE_TTL - read-through кеш.
+    # all() кешується лише для малих довідників (cache_all): вся таблиця - одне значення кешу,
+    # для пасажирів/рейсів воно росло б без меж і не влазило б у ліміт значення memcached/LocMem
+    cache_all = False
 
-    def get_by_id(self, pk: int) -> Optional[models.Model]:
+    def all(self, projection=None) -> List[models.Model]:
+        fields = self.fields_for(projection)
+        if not self.cache_all:
+            return list(self.queryset(fields))
+        return repository_cache.cached(self.model, 'all', lambda: list(self.queryset(fields)), fields)
+
+    def get_by_id(self, pk: int, use_cache: bool = True) -> Optional[models.Model]:
+        if use_cache:
+            # pk з URL - рядок; нормалізуємо, щоб ключ кешу збігався з get_many
+            try:
+                pk = self.model._meta.pk.to_python(pk)
+            except ValidationError:
+                return None
+            return repository_cache.cached(self.model, 'pk', lambda: self.get_by_id(pk, use_cache=False), pk)
         try:
             return self.model.objects.get(pk=pk)
         except self.model.DoesNotExist:
             return None
 
+    def get_many(self, ids, chunk_size: Optional[int] = None) -> Dict[int, models.Model]:
+        """
+        {pk: об'єкт} для ids одним-кількома запитами замість get_by_id у циклі.
+        Відсутніх pk у результаті немає; повтори в ids ігноруються.
+        """
+        to_pk = self.model._meta.pk.to_python
+        keys = list(dict.fromkeys(to_pk(pk) for pk in ids))
+        return repository_cache.cached_many(self.model, 'pk', lambda missing: self._in_bulk(missing, chunk_size), keys)
+
+    def _in_bulk(self, ids: list, chunk_size: Optional[int] = None) -> dict:
+        # Частинами: довгий IN (...) впирається в ліміт параметрів SQLite і max_allowed_packet MySQL
+        chunk_size = chunk_size or settings.REPOSITORY_GET_MANY_CHUNK_SIZE
+        result = {}
+        for start in range(0, len(ids), chunk_size):
+            result.update(self.queryset().in_bulk(ids[start:start + chunk_size]))
+        return result
+
+    def _check_writable(self, names):
+        # add()/update() приймають дані ззовні (API): лічильники і зведення ніхто, крім save()/сигналів, не пише
+        for name in names:
+            try:
+                field = self.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise ValueError(f"{self.model.__name__}: невідоме поле {name!r}") from None
+            if not self._writable(field):
+                raise ValueError(f"{self.model.__name__}.{name} підтримується save(), змінювати його не можна")
+
+    def _writable(self, field) -> bool:
+        return field.editable and field.name not in self.protected_fields and field.attname not in self.protected_fields
+
     def add(self, **kwargs) -> models.Model:
         # Створюємо і повертаємо інстанс
+        self._check_writable(kwargs)
         instance = self.model.objects.create(**kwargs)
         return instance
 
     def update(self, pk: int, **kwargs) -> Optional[models.Model]:
-        obj = self.get_by_id(pk)
+        self._check_writable(kwargs)
+        # Лише свіжий рядок: save() закешованої копії перезаписав би лічильники застарілими значеннями
+        obj = self.get_by_id(pk, use_cache=False)
         if obj is None:
             return None
         for k, v in kwargs.items():
@@ -38,127 +153,590 @@ class BaseRepository(ABC):
         return obj
 
     def delete(self, pk: int) -> bool:
-        obj = self.get_by_id(pk)
+        obj = self.get_by_id(pk, use_cache=False)
         if obj is None:
             return False
         obj.delete()
         return True
 
+    # --- Пакетні зміни: без save() і сигналів, тому кеші інвалідуються тут ---
+    def _check_fields(self, names) -> List[str]:
+        fields = []
+        for name in names:
+            field = self.model._meta.get_field(name)
+            if field.primary_key or not field.concrete:
+                raise ValueError(f"{self.model.__name__}.{name}: змінювати пакетно не можна")
+            if field.name in self.protected_fields or field.attname in self.protected_fields:
+                raise ValueError(f"{self.model.__name__}.{name} підтримується save(), а не bulk_update/upsert")
+            fields.append(field.name)
+        return fields
+
+    def _bulk_changed(self):
+        bump_analytics_version_on_commit()
+        repository_cache.invalidate_on_commit(self.model)
+
+    def bulk_update(self, pk_to_fields: dict, batch_size: Optional[int] = None) -> int:
+        """
+        {pk: {поле: значення}} -> кількість оновлених рядків.
+        Однакові зміни (у т.ч. F-вирази, напр. price=F('price') + 10) - один UPDATE ... WHERE id IN (...)
+        на пачку; різні значення - QuerySet.bulk_update (CASE WHEN) лише по змінених колонках.
+        """
+        batch_size = batch_size or settings.REPOSITORY_BULK_BATCH_SIZE
+        # Групуємо за набором колонок, а в ньому - за значеннями
+        groups = defaultdict(lambda: defaultdict(list))
+        for pk, changes in pk_to_fields.items():
+            if not changes:
+                continue
+            columns = tuple(sorted(changes))
+            groups[columns][tuple(changes[name] for name in columns)].append(pk)
+
+        updated = 0
+        with transaction.atomic():
+            for columns, by_values in groups.items():
+                fields = self._check_fields(columns)
+                if len(by_values) == 1:
+                    (values, pks), = by_values.items()
+                    changes = dict(zip(fields, values))
+                    for start in range(0, len(pks), batch_size):
+                        updated += self.queryset().filter(pk__in=pks[start:start + batch_size]).update(**changes)
+                else:
+                    objs = [self.model(pk=pk, **dict(zip(fields, values)))
+                            for values, pks in by_values.items() for pk in pks]
+                    updated += self.queryset().bulk_update(objs, fields, batch_size=batch_size)
+            if updated:
+                self._bulk_changed()
+        return updated
+
+    def _check_unique(self, unique_by: tuple):
+        # MySQL (ON DUPLICATE KEY) не бере unique_fields до уваги: без унікального ключа upsert мовчки вставить дублі
+        meta = self.model._meta
+        names = {meta.get_field(name).name for name in unique_by}
+        if len(names) == 1 and (meta.get_field(next(iter(names))).unique):
+            return
+        if any(set(constraint.fields) == names for constraint in meta.total_unique_constraints):
+            return
+        if any(set(together) == names for together in meta.unique_together):
+            return
+        raise ValueError(f"{self.model.__name__}: немає унікального ключа на {sorted(names)}")
+
+    def upsert(self, rows, unique_by=('id',), update_fields=None, batch_size: Optional[int] = None) -> int:
+        """
+        Вставка або оновлення dict-ів rows за унікальним ключем unique_by
+        (INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE, пачками по batch_size).
+        update_fields - що оновлювати при конфлікті (за замовчуванням - усі ключі рядків, крім unique_by).
+        Повертає кількість оброблених рядків.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        unique_by = (unique_by,) if isinstance(unique_by, str) else tuple(unique_by)
+        self._check_unique(unique_by)
+        columns = set().union(*rows)
+        self._check_fields(columns - set(unique_by))
+        if update_fields is None:
+            update_fields = sorted(columns - set(unique_by))
+        update_fields = self._check_fields(update_fields)
+        if not update_fields:
+            raise ValueError("upsert: немає полів для оновлення")
+
+        kwargs = {'update_conflicts': True, 'update_fields': update_fields}
+        # PostgreSQL/SQLite вимагають ціль конфлікту, MySQL її не підтримує
+        if connection.features.supports_update_conflicts_with_target:
+            kwargs['unique_fields'] = list(unique_by)
+        with transaction.atomic():
+            objs = self.queryset().bulk_create(
+                [self.model(**row) for row in rows],
+                batch_size=batch_size or settings.REPOSITORY_BULK_BATCH_SIZE, **kwargs,
+            )
+            self._bulk_changed()
+        return len(objs)
+
 # --- Конкретні репозиторії ---
 from .models import Passenger, Cashier, Trip, TicketOffice, Ticket
 
 class PassengerRepository(BaseRepository):
+    protected_fields = ('total_spent',)
+    shapes = {
+        'list_row': ('id', 'first_name', 'last_name', 'passport', 'age'),
+        'detail': None,
+        'export': ('id', 'first_name', 'last_name', 'passport', 'age', 'photo'),
+    }
+
     def __init__(self):
         super().__init__(Passenger)
 
     # можна додати domain-specific методи
     def find_by_passport(self, passport: str):
-        return list(self.model.objects.filter(passport=passport))
+        return repository_cache.cached(
+            self.model, 'passport', lambda: list(self.model.objects.filter(passport=passport)), passport
+        )
 
 
 class CashierRepository(BaseRepository):
+    protected_fields = ('tickets_count', 'total_sales')
+    cache_all = True
+    shapes = {
+        'list_row': ('id', 'first_name', 'last_name', 'hire_date'),
+        'detail': None,
+        'export': ('id', 'first_name', 'last_name', 'hire_date', 'tickets_count', 'total_sales'),
+    }
+
     def __init__(self):
         super().__init__(Cashier)
 
 
 class TripRepository(BaseRepository):
+    protected_fields = ('sold_count', 'revenue_total')
+    shapes = {
+        'list_row': ('id', 'number', 'start_station', 'end_station', 'train_type', 'departure', 'price', 'image'),
+        'detail': None,
+        'export': (
+            'id', 'number', 'start_station', 'end_station', 'distance_km', 'train_type',
+            'price', 'capacity', 'sold_count', 'revenue_total', 'departure', 'arrival',
+        ),
+    }
+
     def __init__(self):
         super().__init__(Trip)
 
     def upcoming(self, from_datetime):
+        # Не кешується: from_datetime щоразу інший
         return list(self.model.objects.filter(departure__gte=from_datetime))
 
 
 class TicketOfficeRepository(BaseRepository):
+    cache_all = True
+
     def __init__(self):
         super().__init__(TicketOffice)
 
 
 class TicketRepository(BaseRepository):
+    # Від цих полів залежать лічильники рейсів/касирів/пасажирів і SalesRollup;
+    # base_price - бо paid_amount рахується з нього в save()
+    protected_fields = ('passenger_id', 'base_price', *SalesRollup.TICKET_FIELDS)
+    shapes = {
+        # str(trip) і str(passenger) у таблиці квитків - лише ці колонки зв'язків
+        'list_row': (
+            'id', 'purchase_date', 'base_price', 'payment_method', 'trip_id',
+            'trip__start_station', 'trip__end_station',
+            'passenger__first_name', 'passenger__last_name', 'passenger__passport',
+        ),
+        'detail': None,
+        'export': (
+            'id', 'trip_id', 'passenger_id', 'cashier_id', 'purchase_date',
+            'base_price', 'paid_amount', 'payment_method',
+        ),
+    }
+
     def __init__(self):
         super().__init__(Ticket)
 
+    def _writable(self, field) -> bool:
+        # add()/update() квитка йдуть через save(), який сам зсуває лічильники і SalesRollup,
+        # тож protected_fields тут - лише заборона для bulk_update/upsert
+        return field.editable
+
+    def upsert(self, rows, unique_by=('id',), update_fields=None, batch_size: Optional[int] = None) -> int:
+        """
+        Для квитків заборонено: вставка в обхід save() не оновила б місця, лічильники і SalesRollup.
+        Нові квитки - bulk_sell/sell_seats, зміни - update() (через save()). Завжди TypeError.
+        """
+        raise TypeError("TicketRepository не підтримує upsert: квитки продаються через bulk_sell/sell_seats")
+
     def by_passenger(self, passenger_id):
         return list(self.model.objects.filter(passenger_id=passenger_id))
 
+    def bulk_sell(self, items, chunk_size: Optional[int] = None) -> List[Ticket]:
+        """
+        Продаж пакета квитків однією транзакцією.
+        items - dict-и з ключами trip, passenger, [cashier], [payment_method].
+        Ціни рейсів читаються одним запитом, лічильники оновлюються одним UPDATE
+        на рейс/касира, вставка - bulk_create пачками по chunk_size.
+        Якщо на будь-якому рейсі не вистачає місць - SoldOut і відкат всього пакета.
+        """
+        items = list(items)
+        chunk_size = chunk_size or settings.TICKETS_BULK_CHUNK_SIZE
+
+        trip_ids = {item['trip'] for item in items}
+        prices = dict(Trip.objects.filter(pk__in=trip_ids).values_list('id', 'price'))
+        missing = trip_ids - prices.keys()
+        if missing:
+            raise Trip.DoesNotExist(f"Рейси не знайдено: {sorted(missing)}")
+
+        tickets = []
+        per_trip = defaultdict(lambda: [0, 0])
+        per_cashier = defaultdict(lambda: [0, 0])
+        per_passenger = defaultdict(int)
+        for item in items:
+            price = prices[item['trip']]
+            cashier_id = item.get('cashier')
+            tickets.append(Ticket(
+                trip_id=item['trip'], passenger_id=item['passenger'], cashier_id=cashier_id,
+                base_price=price, paid_amount=price,
+                payment_method=item.get('payment_method') or 'Cash',
+            ))
+            per_trip[item['trip']][0] += 1
+            per_trip[item['trip']][1] += price
+            per_passenger[item['passenger']] += price
+            if cashier_id is not None:
+                per_cashier[cashier_id][0] += 1
+                per_cashier[cashier_id][1] += price
+
+        with transaction.atomic():
+            # Фіксований порядок блокувань, щоб паралельні пакети не ловили дедлок
+            for trip_id in sorted(per_trip):
+                count, amount = per_trip[trip_id]
+                Ticket.apply_counters(trip_id, None, count, amount, check_capacity=True)
+            for cashier_id in sorted(per_cashier):
+                count, amount = per_cashier[cashier_id]
+                Ticket.apply_cashier_counters(cashier_id, count, amount)
+            Ticket.apply_passenger_spend(per_passenger)
+            # bulk_create не викликає Ticket.save() і сигнали: лічильники не подвоюються,
+            # а версію аналітики зсуваємо вручну
+            bump_analytics_version_on_commit()
+            created = self.model.objects.bulk_create(tickets, batch_size=chunk_size)
+            SalesRollup.record(created)
+            return created
+
 
 # --- Єдина точка доступу (Repository Manager / Unit of Work) ---
 class RepositoryManager:
     @property
-    def passengers(self): return Passenger.objects.all()
+    def passengers(self): return PassengerRepository()
     @property
-    def cashiers(self): return Cashier.objects.all()
+    def cashiers(self): return CashierRepository()
     @property
-    def trips(self): return Trip.objects.all()
+    def trips(self): return TripRepository()
     @property
-    def tickets(self): return Ticket.objects.all()
-
-    def get_complex_analytics(self):
-        # 1. Визначаємо функції для кожного запиту
-        def get_revenue():
-            # Важливо: list(), щоб виконати запит прямо тут, у потоці
-            return Trip.objects.annotate(
-                total_revenue=Sum('tickets__paid_amount'),
-                tickets_sold=Count('tickets')
-            ).order_by('-total_revenue')
-
-        def get_cashiers():
-            return Cashier.objects.annotate(
-                tickets_count=Count('sold_tickets'),
-                total_sales=Sum('sold_tickets__paid_amount')
-            ).filter(tickets_count__gt=0).order_by('-total_sales')
-
-        def get_occupancy():
-            return Trip.objects.annotate(
-                sold_count=Count('tickets')
-            ).annotate(
-                occupancy_rate=ExpressionWrapper(
-                    F('sold_count') * 100.0 / F('capacity'),
-                    output_field=FloatField()
-                )
-            ).order_by('-occupancy_rate')
-
-        def get_types():
-            return Trip.objects.values('train_type').annotate(
-                avg_passenger_age=Avg('tickets__passenger__age'),
-                max_ticket_price=Max('tickets__paid_amount')
-            ).order_by('train_type')
-
-        def get_months():
-            return Ticket.objects.annotate(
-                month=ExtractMonth('purchase_date')
-            ).values('month').annotate(
-                tickets_sold=Count('id'),
-                monthly_revenue=Sum('paid_amount')
-            ).order_by('month')
-
-        def get_passengers():
-            return Passenger.objects.annotate(
-                total_spent=Sum('tickets__paid_amount')
-            ).filter(total_spent__isnull=False).order_by('-total_spent')[:10]
-
-        # 2. Запускаємо їх одночасно
+    def tickets(self): return TicketRepository()
+    @property
+    def offices(self): return TicketOfficeRepository()
+
+    # --- Запити аналітики з фільтрами, застосованими в SQL (WHERE/HAVING/LIMIT) ---
+    # Кожен запит - values_list() лише з потрібними колонками, результат - ColumnTable; виконуються вони
+    # або в пулі потоків (get_complex_analytics), або через async ORM (aget_complex_analytics).
+    # use_snapshot=False або вікно дат -> живі агрегати по таблицях.
+    # Вікно дат для сум/кількостей рахується по денних кошиках SalesRollup, а не по квитках.
+    def _analytics_querysets(self, filters: AnalyticsFilters, use_snapshot: bool = True) -> dict:
+        windowed = filters.windowed
+        use_snapshot = use_snapshot and not windowed
+        window = filters.purchase_window('tickets__')
+        rollup_window = filters.day_window('sales_rollups__')
+        min_revenue = Decimal(str(filters.min_revenue))
+        money = DecimalField(max_digits=14, decimal_places=2)
+
+        trips = Trip.objects.all()
+        if filters.train_type:
+            trips = trips.filter(train_type=filters.train_type)
+
+        # 1. Прибуток рейсів
+        if windowed:
+            revenue = trips.annotate(
+                total_revenue=Coalesce(Sum('sales_rollups__revenue', filter=rollup_window), Value(Decimal('0')),
+                                       output_field=money),
+                tickets_sold=Coalesce(Sum('sales_rollups__tickets_sold', filter=rollup_window), 0),
+            )
+        else:
+            # Денормалізовані лічильники рейсу - без JOIN на квитки
+            revenue = trips.annotate(total_revenue=F('revenue_total'), tickets_sold=F('sold_count'))
+        if filters.min_revenue > 0:
+            revenue = revenue.filter(total_revenue__gte=min_revenue)
+
+        # 2. Касири (імена tickets_count/total_sales зайняті полями Cashier, тож в анотаціях sold/sales)
+        if windowed:
+            cashiers = Cashier.objects.annotate(
+                sold=Sum('sales_rollups__tickets_sold', filter=rollup_window),
+                sales=Sum('sales_rollups__revenue', filter=rollup_window),
+            )
+        else:
+            cashiers = Cashier.objects.annotate(sold=F('tickets_count'), sales=F('total_sales'))
+
+        # 3. Завантаженість
+        sold = Coalesce(Sum('sales_rollups__tickets_sold', filter=rollup_window), 0) if windowed else F('sold_count')
+        occupancy = trips.annotate(
+            occupancy_rate=ExpressionWrapper(sold * 100.0 / F('capacity'), output_field=FloatField())
+        )
+        if filters.min_occupancy > 0:
+            occupancy = occupancy.filter(occupancy_rate__gte=filters.min_occupancy)
+
+        # 4. Типи потягів
+        if use_snapshot:
+            types = TrainTypeStatsSnapshot.objects.all()
+            if filters.train_type:
+                types = types.filter(train_type=filters.train_type)
+        else:
+            types = trips.values('train_type').annotate(
+                avg_passenger_age=Avg('tickets__passenger__age', filter=window),
+                max_ticket_price=Max('tickets__paid_amount', filter=window)
+            )
+
+        # 5. Місяці (перший день місяця, тож однакові місяці різних років не зливаються)
+        months = self._sales_buckets('month', filters.day_window()).values_list(
+            'bucket', 'tickets_sold', 'revenue'
+        )
+
+        # 6. Топ пасажирів: за весь час - діапазон індексу (-total_spent, id) без агрегації,
+        # у вікні дат - сума по квитках. id другим ключем - рівні суми завжди в одному порядку
+        if windowed:
+            passengers = Passenger.objects.annotate(spent=Sum('tickets__paid_amount', filter=window))
+        else:
+            passengers = Passenger.objects.annotate(spent=F('total_spent'))
+
+        # Поля values_list() у порядку ANALYTICS_COLUMNS
+        return {
+            'revenue_by_trip': revenue.order_by('-total_revenue').values_list(
+                'id', 'number', 'start_station', 'end_station', 'total_revenue', 'tickets_sold'
+            ),
+            'cashier_performance': cashiers.filter(sold__gt=0).order_by('-sales').values_list(
+                'id', 'first_name', 'last_name', 'sold', 'sales'
+            ),
+            'trip_occupancy': occupancy.order_by('-occupancy_rate').values_list(
+                'id', 'number', 'start_station', 'end_station', 'capacity', 'occupancy_rate'
+            ),
+            'train_type_stats': types.order_by('train_type').values_list(
+                'train_type', 'avg_passenger_age', 'max_ticket_price'
+            ),
+            'sales_by_month': months,
+            'top_passengers': passengers.filter(spent__gt=0).order_by('-spent', 'id').values_list(
+                'id', 'first_name', 'last_name', 'spent'
+            )[:filters.top_n],
+        }
+
+    @staticmethod
+    def _analytics_table(key: str, rows) -> ColumnTable:
+        return ColumnTable.from_rows(ANALYTICS_COLUMNS[key], rows)
+
+    def snapshot_refreshed_at(self):
+        state = AnalyticsSnapshotState.objects.filter(pk=1).first()
+        return state.refreshed_at if state else None
+
+    def snapshot_is_fresh(self) -> bool:
+        refreshed_at = self.snapshot_refreshed_at()
+        if refreshed_at is None:
+            return False
+        max_age = timedelta(seconds=settings.ANALYTICS_SNAPSHOT_MAX_AGE)
+        return timezone.now() - refreshed_at <= max_age
+
+    def refresh_analytics_snapshots(self) -> AnalyticsSnapshotState:
+        """Перераховує агрегати і атомарно підміняє вміст таблиць-знімків."""
+        started = time.monotonic()
+
+        live = self._analytics_querysets(AnalyticsFilters(), use_snapshot=False)
+
+        with transaction.atomic():
+            TrainTypeStatsSnapshot.objects.all().delete()
+            TrainTypeStatsSnapshot.objects.bulk_create(
+                TrainTypeStatsSnapshot(**dict(zip(ANALYTICS_COLUMNS['train_type_stats'], row)))
+                for row in live['train_type_stats']
+            )
+
+            bump_analytics_version_on_commit()
+            state, _ = AnalyticsSnapshotState.objects.update_or_create(pk=1, defaults={
+                'refreshed_at': timezone.now(),
+                'duration_ms': int((time.monotonic() - started) * 1000),
+            })
+        return state
+
+    def reconcile_counters(self, dry_run: bool = False) -> dict:
+        """
+        Порівнює лічильники Trip/Cashier/Passenger і денні кошики SalesRollup з реальними
+        агрегатами по квитках і виправляє розбіжності. Повертає кількість рядків з розбіжністю.
+        """
+        drifted = {}
+        for model, fk, count_field, sum_field in (
+            (Trip, 'trip', 'sold_count', 'revenue_total'),
+            (Cashier, 'cashier', 'tickets_count', 'total_sales'),
+            (Passenger, 'passenger', None, 'total_spent'),
+        ):
+            tickets = Ticket.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk)
+            real_count = Coalesce(Subquery(tickets.annotate(c=Count('id')).values('c')), 0)
+            real_sum = Coalesce(
+                Subquery(tickets.annotate(s=Sum('paid_amount')).values('s')),
+                Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2)
+            )
+            # Пасажир має лише суму (count_field=None)
+            expected = {sum_field: real_sum, **({count_field: real_count} if count_field else {})}
+            matches = {sum_field: F('real_sum'), **({count_field: F('real_count')} if count_field else {})}
+            ids = list(model.objects.annotate(
+                real_count=real_count, real_sum=real_sum
+            ).exclude(**matches).values_list('pk', flat=True))
+
+            drifted[model.__name__] = len(ids)
+            if dry_run:
+                continue
+            for i in range(0, len(ids), 1000):
+                model.objects.filter(pk__in=ids[i:i + 1000]).update(**expected)
+            if ids:
+                repository_cache.invalidate_on_commit(model)
+
+        # Денні кошики: розбіжність з квитками виправляє лише повний перерахунок
+        drifted['SalesRollup'] = self._sales_rollup_drift()
+        if drifted['SalesRollup'] and not dry_run:
+            self.rebuild_sales_rollup()
+        return drifted
+
+    @staticmethod
+    def _sales_rollup_drift() -> int:
+        """Кількість кошиків (день, рейс, касир, спосіб оплати), де SalesRollup не збігається з квитками."""
+        keys = ('day', 'trip_id', 'cashier_id', 'payment_method')
+        # Кошики з NULL-касиром можуть дублюватись - порівнюємо суми по ключу
+        rollup = {
+            tuple(row[k] for k in keys): (row['sold'], row['amount'])
+            for row in SalesRollup.objects.values(*keys).annotate(
+                sold=Sum('tickets_sold'), amount=Sum('revenue')
+            ).order_by()
+            if row['sold'] or row['amount']
+        }
+        real = {
+            tuple(row[k] for k in keys): (row['sold'], row['amount'])
+            for row in Ticket.objects.annotate(day=TruncDate('purchase_date')).values(*keys).annotate(
+                sold=Count('id'), amount=Sum('paid_amount')
+            ).order_by()
+        }
+        return sum(1 for key in rollup.keys() | real.keys() if rollup.get(key) != real.get(key))
+
+    # --- Ряди продажів з денних кошиків SalesRollup ---
+    @staticmethod
+    def _sales_buckets(period: str, condition=None) -> models.QuerySet:
+        rollups = SalesRollup.objects.filter(condition or models.Q())
+        return rollups.annotate(bucket=Trunc('day', period, output_field=models.DateField())).values(
+            'bucket'
+        ).annotate(
+            tickets_sold=Sum('tickets_sold'), revenue=Sum('revenue'),
+        ).filter(tickets_sold__gt=0).order_by('bucket')
+
+    def sales_series(self, period: str = 'month', filters: Optional[AnalyticsFilters] = None, **lookups) -> ColumnTable:
+        """
+        Продажі по кошиках period (day/week/month/quarter/year) за вікном дат filters:
+        колонки bucket (перший день кошика), tickets_sold, revenue.
+        lookups звужують кошики: trip_id=..., cashier_id=..., payment_method=...
+        """
+        if period not in SALES_PERIODS:
+            raise ValueError(f"Невідомий період: {period}")
+        filters = filters or AnalyticsFilters()
+        condition = filters.day_window() & models.Q(**lookups)
+        if filters.train_type:
+            condition &= models.Q(trip__train_type=filters.train_type)
+        rows = self._sales_buckets(period, condition).values_list('bucket', 'tickets_sold', 'revenue')
+        return ColumnTable.from_rows(('bucket', 'tickets_sold', 'revenue'), rows)
+
+    def rebuild_sales_rollup(self) -> int:
+        """Перераховує SalesRollup з квитків з нуля (після ручних правок БД). Повертає кількість кошиків."""
+        rows = Ticket.objects.annotate(day=TruncDate('purchase_date')).values(
+            'day', 'trip_id', 'cashier_id', 'payment_method'
+        ).annotate(tickets_sold=Count('id'), revenue=Sum('paid_amount')).order_by()
+        with transaction.atomic():
+            SalesRollup.objects.all().delete()
+            created = SalesRollup.objects.bulk_create(
+                (SalesRollup(**row) for row in rows), batch_size=settings.TICKETS_BULK_CHUNK_SIZE
+            )
+            bump_analytics_version_on_commit()
+        return len(created)
+
+    def get_summary(self, date_from=None, date_to=None, train_type=None) -> dict:
+        """
+        Зведений звіт (кількість пасажирів/касирів/рейсів і середній вік) агрегатами в БД.
+        Фільтри звужують звіт до рейсів типу train_type і до тих, хто купував/продавав
+        квитки за період [date_from, date_to]. Результат кешується на REPORT_SUMMARY_CACHE_TTL.
+        """
+        cache_key = f"report_summary:{date_from or ''}:{date_to or ''}:{train_type or ''}"
+        summary = cache.get(cache_key)
+        if summary is not None:
+            return summary
+
+        passengers = Passenger.objects.all()
+        cashiers = Cashier.objects.all()
+        trips = Trip.objects.all()
+        tickets = Ticket.objects.all()
+
+        if date_from or date_to:
+            tickets = tickets.filter(AnalyticsFilters(date_from=date_from, date_to=date_to).purchase_window())
+        if train_type:
+            trips = trips.filter(train_type=train_type)
+            tickets = tickets.filter(trip__train_type=train_type)
+        if date_from or date_to:
+            trips = trips.filter(pk__in=tickets.values('trip_id'))
+        if date_from or date_to or train_type:
+            passengers = passengers.filter(pk__in=tickets.values('passenger_id'))
+            cashiers = cashiers.filter(pk__in=tickets.values('cashier_id'))
+
+        passenger_stats = passengers.aggregate(total=Count('id'), avg_age=Avg('age'))
+        summary = {
+            'total_passengers': passenger_stats['total'],
+            'total_cashiers': cashiers.count(),
+            'total_trips': trips.count(),
+            'average_passenger_age': round(passenger_stats['avg_age'] or 0, 2),
+        }
+        cache.set(cache_key, summary, settings.REPORT_SUMMARY_CACHE_TTL)
+        return summary
+
+    def _use_live(self, filters: AnalyticsFilters, live: bool) -> bool:
+        """
+        Якщо знімки застарілі (ANALYTICS_SNAPSHOT_MAX_AGE), або перераховує їх на місці,
+        або (коли оновлення вже йде в іншому запиті) лишає попередній знімок.
+        Повертає True, якщо читати треба живі таблиці.
+        """
+        if live or filters.windowed or self.snapshot_is_fresh():
+            return live
+        has_snapshot = self.snapshot_refreshed_at() is not None
+        if settings.ANALYTICS_SNAPSHOT_REFRESH_ON_READ and cache.add(SNAPSHOT_REFRESH_LOCK, 1, timeout=300):
+            try:
+                self.refresh_analytics_snapshots()
+            finally:
+                cache.delete(SNAPSHOT_REFRESH_LOCK)
+            return False
+        return not has_snapshot
+
+    def get_complex_analytics(self, filters: Optional[AnalyticsFilters] = None, live: bool = False, keys=None):
+        """
+        Дані графіків дашборду ({ключ: ColumnTable}), вже відфільтровані в БД за filters.
+        За замовчуванням читає знімки (див. _use_live); live=True - примусовий
+        перерахунок по живих таблицях. keys обмежує набір запитів (наприклад, один графік).
+        Помилка будь-якого запиту логується з його назвою і піднімається далі.
+        """
+        filters = filters or AnalyticsFilters()
+        live = self._use_live(filters, live)
+
+        # 1. Визначаємо запити
+        querysets = self._analytics_querysets(filters, use_snapshot=not live)
+        if keys is not None:
+            querysets = {key: querysets[key] for key in keys}
+
+        # 2. Запускаємо їх одночасно у спільному пулі (теплі постійні з'єднання воркерів)
         results = {}
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            # Словник: {Future об'єкт: 'ключ_результату'}
-            future_to_key = {
-                executor.submit(get_revenue): 'revenue_by_trip',
-                executor.submit(get_cashiers): 'cashier_performance',
-                executor.submit(get_occupancy): 'trip_occupancy',
-                executor.submit(get_types): 'train_type_stats',
-                executor.submit(get_months): 'sales_by_month',
-                executor.submit(get_passengers): 'top_passengers',
-            }
-
-            for future in concurrent.futures.as_completed(future_to_key):
-                key = future_to_key[future]
-                try:
-                    results[key] = future.result()
-                except Exception as exc:
-                    print(f'{key} generated an exception: {exc}')
-                    results[key] = []
-                finally:
-                    # Закриваємо з'єднання потоку, щоб не висіло
-                    connection.close()
-
-        return results
\ No newline at end of file
+        # Словник: {Future об'єкт: 'ключ_результату'}
+        future_to_key = {executor.submit(self._analytics_table, key, qs): key for key, qs in querysets.items()}
+
+        for future in concurrent.futures.as_completed(future_to_key):
+            key = future_to_key[future]
+            try:
+                results[key] = future.result()
+            except Exception:
+                # Порожній графік замість помилки сховав би збій БД - лог з назвою запиту і далі вгору
+                logger.exception("Запит аналітики %s завершився помилкою", key)
+                raise
+
+        return results
+
+    async def aget_complex_analytics(self, filters: Optional[AnalyticsFilters] = None, live: bool = False, keys=None):
+        """
+        Async-варіант get_complex_analytics для ASGI: запити збираються через asyncio.gather
+        з async ORM (async for), без власного пулу потоків і з'єднань на кожен запит.
+        """
+        filters = filters or AnalyticsFilters()
+        live = await sync_to_async(self._use_live)(filters, live)
+
+        querysets = self._analytics_querysets(filters, use_snapshot=not live)
+        if keys is not None:
+            querysets = {key: querysets[key] for key in keys}
+
+        async def run(key, qs):
+            try:
+                return self._analytics_table(key, [row async for row in qs])
+            except Exception:
+                logger.exception("Запит аналітики %s завершився помилкою", key)
+                raise
+
+        rows = await asyncio.gather(*(run(key, qs) for key, qs in querysets.items()))
+        return dict(zip(querysets, rows))
@@ -0,0 +1,63 @@
+# tickets/reservations.py
+# --- Резервування місць без овербукінгу ---
+# Місткість перевіряє сама БД одним умовним UPDATE:
+#   UPDATE trip SET sold_count = sold_count + n WHERE id = ? AND capacity >= sold_count + n
+# Рядок рейсу лишається заблокованим до кінця транзакції, тому паралельні продавці
+# не можуть продати більше, ніж capacity, а перевірка available_seats не потрібна.
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from django.db import transaction
+
+from .models import SalesRollup, Ticket, Trip, SoldOut
+from .signals import bump_analytics_version_on_commit
+
+
+@dataclass
+class ReservationResult:
+    trip_id: int
+    requested: int
+    tickets: List[Ticket] = field(default_factory=list)
+    sold_out: bool = False
+    available_seats: Optional[int] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.sold_out
+
+
+def sell_seats(trip_id, passenger_ids, cashier_id=None, payment_method="Cash") -> ReservationResult:
+    """
+    Продає по одному квитку кожному пасажиру з passenger_ids на рейс trip_id
+    в одній транзакції: або всі місця, або жодного (sold_out=True).
+    """
+    passenger_ids = list(passenger_ids)
+    seats = len(passenger_ids)
+    result = ReservationResult(trip_id=trip_id, requested=seats)
+    if not seats:
+        return result
+
+    price = Trip.objects.values_list('price', flat=True).get(pk=trip_id)
+    try:
+        with transaction.atomic():
+            Ticket.apply_counters(trip_id, cashier_id, seats, price * seats, check_capacity=True)
+            Ticket.apply_passenger_spend({pid: price * n for pid, n in Counter(passenger_ids).items()})
+            # bulk_create не викликає Ticket.save() і сигнали: лічильники не подвоюються,
+            # а версію аналітики зсуваємо вручну
+            bump_analytics_version_on_commit()
+            result.tickets = Ticket.objects.bulk_create([
+                Ticket(
+                    trip_id=trip_id, passenger_id=passenger_id, cashier_id=cashier_id,
+                    base_price=price, paid_amount=price, payment_method=payment_method,
+                )
+                for passenger_id in passenger_ids
+            ])
+            SalesRollup.record(result.tickets)
+    except SoldOut:
+        result.sold_out = True
+
+    seats_row = Trip.objects.filter(pk=trip_id).values_list('capacity', 'sold_count').first()
+    if seats_row is not None:
+        result.available_seats = seats_row[0] - seats_row[1]
+    return result
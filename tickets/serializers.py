@@ -25,3 +25,21 @@ class TicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = '__all__'
+
+# --- Вхідні дані продажу місць на рейс (TripViewSet.reserve -> sell_seats) ---
+class ReserveSerializer(serializers.Serializer):
+    passengers = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    cashier = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    payment_method = serializers.CharField(max_length=50, required=False, default='Cash')
+
+# --- Вхідні дані пакетного продажу (квитки створює bulk_sell, тож не ModelSerializer) ---
+class BulkSellItemSerializer(serializers.Serializer):
+    trip = serializers.IntegerField(min_value=1)
+    passenger = serializers.IntegerField(min_value=1)
+    cashier = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    payment_method = serializers.CharField(max_length=50, required=False, allow_blank=True)
+
+class BulkSellSerializer(serializers.Serializer):
+    tickets = BulkSellItemSerializer(many=True)
+    # Більші значення обрізаються до TICKETS_BULK_CHUNK_SIZE_MAX (як chunk_size експорту)
+    chunk_size = serializers.IntegerField(min_value=1, required=False, allow_null=True)
@@ -0,0 +1,55 @@
+# tickets/signals.py
+# --- Версія аналітичних даних для інвалідації кешів (графіки дашборду тощо) ---
+# Кожна зміна квитків/рейсів/касирів/пасажирів збільшує версію; ключі кешу, що її містять,
+# автоматично стають неактуальними - нічого видаляти не треба.
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_on_commit
+from .models import Cashier, Passenger, Ticket, Trip
+
+ANALYTICS_VERSION_KEY = 'analytics_data_version'
+
+
+def analytics_version() -> int:
+    version = cache.get(ANALYTICS_VERSION_KEY)
+    if version is None:
+        # Стартуємо з часу, а не з 0: якщо ключ витиснуто з кешу, старі версії не повторяться
+        cache.add(ANALYTICS_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(ANALYTICS_VERSION_KEY)
+    return version
+
+
+def bump_analytics_version():
+    try:
+        cache.incr(ANALYTICS_VERSION_KEY)
+    except ValueError:
+        analytics_version()
+
+
+def bump_analytics_version_on_commit():
+    # Інвалідовуємо після коміту, щоб паралельний запит не закешував дані з незакоміченої транзакції
+    transaction.on_commit(bump_analytics_version)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+@receiver(post_save, sender=Cashier)
+@receiver(post_delete, sender=Cashier)
+@receiver(post_save, sender=Passenger)
+@receiver(post_delete, sender=Passenger)
+def analytics_data_changed(sender, **kwargs):
+    bump_analytics_version_on_commit()
+
+
+# Кеш репозиторіїв (tickets.cache): без sender - invalidate_on_commit сам ігнорує моделі без TTL
+@receiver(post_save)
+@receiver(post_delete)
+def repository_data_changed(sender, **kwargs):
+    invalidate_on_commit(sender)
@@ -1,3 +1,881 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from railway.querycount import query_budget
+
+from .columnar import ColumnTable
+from .export import iter_rows
+from .fast_serializers import FastSerializer, for_shapes
+from .filters import AnalyticsFilters
+from .models import AnalyticsSnapshotState, Cashier, Passenger, SalesRollup, SoldOut, Ticket, Trip
+from .pagination import encode_cursor, paginate_keyset
+from .repositories import SNAPSHOT_REFRESH_LOCK, CashierRepository, PassengerRepository, RepositoryManager
+from .repositories import TicketRepository, TripRepository
+from .reservations import sell_seats
+from .serializers import CashierSerializer, PassengerSerializer, TripSerializer
+
+
+# SQLite блокує всю базу на запис (паралельні продавці ловлять "database table is locked"),
+# тож тест має сенс лише на БД з блокуванням рядків (MySQL у продакшні)
+@skipUnlessDBFeature('has_select_for_update')
+class SeatReservationLoadTest(TransactionTestCase):
+    """64 паралельні продавці змагаються за один рейс - овербукінгу бути не повинно."""
+
+    SELLERS = 64
+    CAPACITY = 40
+
+    def setUp(self):
+        self.trip = Trip.objects.create(
+            start_station="Львів", end_station="Київ", distance_km=540, capacity=self.CAPACITY, price=500,
+        )
+        self.cashier = Cashier.objects.create(first_name="Ігор", last_name="Коваленко", hire_date=date(2020, 5, 10))
+        self.passenger_ids = [
+            Passenger.objects.create(first_name=f"П{i}", last_name="Тест", passport=f"AB{i:06d}", age=30).pk
+            for i in range(self.SELLERS * 2)
+        ]
+
+    def test_no_overbooking_with_concurrent_sellers(self):
+        barrier = threading.Barrier(self.SELLERS)
+        results, errors = [], []
+        lock = threading.Lock()
+
+        def seller(n):
+            # Кожен продавець бере 1 або 2 місця, стартують усі одночасно
+            passengers = self.passenger_ids[n * 2:n * 2 + 1 + n % 2]
+            try:
+                barrier.wait()
+                result = sell_seats(self.trip.pk, passengers, cashier_id=self.cashier.pk)
+                with lock:
+                    results.append(result)
+            except Exception as exc:
+                with lock:
+                    errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=seller, args=(n,)) for n in range(self.SELLERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), self.SELLERS)
+
+        sold = sum(len(r.tickets) for r in results if r.ok)
+        self.trip.refresh_from_db()
+        self.cashier.refresh_from_db()
+
+        self.assertLessEqual(sold, self.CAPACITY)
+        self.assertTrue(any(r.sold_out for r in results))
+        self.assertEqual(Ticket.objects.filter(trip=self.trip).count(), sold)
+        self.assertEqual(self.trip.sold_count, sold)
+        self.assertEqual(self.cashier.tickets_count, sold)
+        # Відмова лише тоді, коли місць справді не вистачало
+        self.assertGreaterEqual(sold, self.CAPACITY - 1)
+
+
+class SellSeatsTest(TestCase):
+    """sell_seats: усі місця або жодного, без часткового продажу і зсуву лічильників."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trip = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540, capacity=3, price=200)
+        cls.passenger_ids = [
+            Passenger.objects.create(first_name=f"П{i}", last_name="Тест", passport=f"AB{i:06d}", age=30).pk
+            for i in range(4)
+        ]
+
+    def test_all_or_nothing(self):
+        result = sell_seats(self.trip.pk, self.passenger_ids[:2])
+        self.assertTrue(result.ok)
+        self.assertEqual((len(result.tickets), result.available_seats), (2, 1))
+
+        result = sell_seats(self.trip.pk, self.passenger_ids[2:])
+        self.assertTrue(result.sold_out)
+        self.assertEqual((result.tickets, result.available_seats), ([], 1))
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.sold_count, self.trip.revenue_total), (2, Decimal('400')))
+        self.assertEqual(Ticket.objects.filter(trip=self.trip).count(), 2)
+
+
+class CounterMaintenanceTest(TestCase):
+    """Лічильники Trip/Cashier/Passenger зсуваються в Ticket.save()/post_delete і не пишуться ззовні."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('counters', password='x')
+        cls.trip = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540, price=300, capacity=1)
+        cls.other_trip = Trip.objects.create(start_station="Львів", end_station="Одеса", distance_km=800, price=500)
+        cls.cashier = Cashier.objects.create(first_name="Ігор", last_name="Коваленко", hire_date=date(2020, 5, 10))
+        cls.passenger = Passenger.objects.create(first_name="Олена", last_name="Тест", passport="AB000001", age=30)
+
+    def assertCounters(self, obj, **expected):
+        obj.refresh_from_db()
+        self.assertEqual({name: getattr(obj, name) for name in expected}, expected)
+
+    def test_save_edit_delete(self):
+        ticket = Ticket.objects.create(trip=self.trip, passenger=self.passenger, cashier=self.cashier)
+        self.assertCounters(self.trip, sold_count=1, revenue_total=Decimal('300'))
+        self.assertCounters(self.cashier, tickets_count=1, total_sales=Decimal('300'))
+        self.assertCounters(self.passenger, total_spent=Decimal('300'))
+
+        # Пересадка на інший рейс без касира: старі лічильники знімаються, нові додаються
+        ticket.trip, ticket.cashier, ticket.base_price = self.other_trip, None, Decimal('500')
+        ticket.save()
+        self.assertCounters(self.trip, sold_count=0, revenue_total=Decimal('0'))
+        self.assertCounters(self.other_trip, sold_count=1, revenue_total=Decimal('500'))
+        self.assertCounters(self.cashier, tickets_count=0, total_sales=Decimal('0'))
+        self.assertCounters(self.passenger, total_spent=Decimal('500'))
+
+        ticket.delete()
+        self.assertCounters(self.other_trip, sold_count=0, revenue_total=Decimal('0'))
+        self.assertCounters(self.passenger, total_spent=Decimal('0'))
+
+    def test_capacity(self):
+        Ticket.objects.create(trip=self.trip, passenger=self.passenger)
+        with self.assertRaises(SoldOut):
+            Ticket.objects.create(trip=self.trip, passenger=self.passenger)
+        self.assertCounters(self.trip, sold_count=1)
+
+    def test_reconcile_counters(self):
+        Ticket.objects.create(trip=self.trip, passenger=self.passenger, cashier=self.cashier)
+        Trip.objects.filter(pk=self.trip.pk).update(sold_count=0, revenue_total=7)
+        Passenger.objects.filter(pk=self.passenger.pk).update(total_spent=99999)
+
+        repo = RepositoryManager()
+        drifted = repo.reconcile_counters(dry_run=True)
+        self.assertEqual((drifted['Trip'], drifted['Cashier'], drifted['Passenger']), (1, 0, 1))
+        self.assertCounters(self.trip, sold_count=0)
+
+        repo.reconcile_counters()
+        self.assertCounters(self.trip, sold_count=1, revenue_total=Decimal('300'))
+        self.assertCounters(self.passenger, total_spent=Decimal('300'))
+        self.assertEqual(repo.reconcile_counters(dry_run=True)['Trip'], 0)
+
+    def test_counters_are_read_only(self):
+        Ticket.objects.create(trip=self.trip, passenger=self.passenger)
+        with self.assertRaises(ValueError):
+            TripRepository().update(self.trip.pk, sold_count=0)
+        with self.assertRaises(ValueError):
+            CashierRepository().add(first_name="Н", last_name="Н", hire_date=date(2021, 1, 1), total_sales=5)
+
+        api = APIClient()
+        api.force_authenticate(self.user)
+        for url, body in ((f'/api/trips/{self.trip.pk}/', {'sold_count': 0}),
+                          (f'/api/passengers/{self.passenger.pk}/', {'total_spent': '99999'})):
+            with self.subTest(url=url):
+                self.assertEqual(api.put(url, body, format='json').status_code, 400)
+        self.assertCounters(self.trip, sold_count=1)
+        self.assertCounters(self.passenger, total_spent=Decimal('300'))
+        # Звичайні поля змінюються як і раніше
+        response = api.put(f'/api/trips/{self.trip.pk}/', {'number': '743K'}, format='json')
+        self.assertEqual((response.status_code, response.data['number'], response.data['sold_count']), (200, '743K', 1))
+
+
+class SalesRollupTest(TestCase):
+    """Денні кошики SalesRollup зсуваються разом з квитками і сходяться з ними в sales_series."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trip = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540, price=100)
+        cls.cashiers = [Cashier.objects.create(first_name=f"К{i}", last_name="Тест", hire_date=date(2020, 1, 1))
+                        for i in range(3)]
+        cls.passenger = Passenger.objects.create(first_name="Олена", last_name="Тест", passport="AB000001", age=30)
+
+    def totals(self):
+        series = RepositoryManager().sales_series('year')
+        return sum(series['tickets_sold']), sum(series['revenue'])
+
+    def sell(self, cashier=None, payment_method="Cash"):
+        return Ticket.objects.create(trip=self.trip, passenger=self.passenger, cashier=cashier,
+                                     payment_method=payment_method)
+
+    def test_create_edit_delete(self):
+        ticket = self.sell(self.cashiers[0])
+        self.assertEqual(self.totals(), (1, Decimal('100')))
+        ticket.payment_method, ticket.base_price = "Card", Decimal('150')
+        ticket.save()
+        self.assertEqual(self.totals(), (1, Decimal('150')))
+        bucket = SalesRollup.objects.get(payment_method="Card")
+        self.assertEqual((bucket.cashier_id, bucket.tickets_sold, bucket.revenue), (self.cashiers[0].pk, 1, Decimal('150')))
+        ticket.delete()
+        self.assertEqual(self.totals(), (0, 0))
+
+    def test_deleted_cashiers_do_not_double_count(self):
+        # Кошики видалених касирів стають NULL-дублями того самого (день, рейс, спосіб оплати)
+        for cashier in self.cashiers[:2]:
+            self.sell(cashier)
+            cashier.delete()
+        self.assertEqual(SalesRollup.objects.filter(cashier__isnull=True).count(), 2)
+        extra = self.sell()
+        self.assertEqual(self.totals(), (3, Decimal('300')))
+        extra.delete()
+        self.assertEqual(self.totals(), (2, Decimal('200')))
+        self.assertEqual(RepositoryManager().reconcile_counters(dry_run=True)['SalesRollup'], 0)
+
+    def test_reconcile_rebuilds_drifted_rollup(self):
+        self.sell(self.cashiers[0])
+        self.sell(self.cashiers[1], payment_method="Card")
+        SalesRollup.objects.filter(payment_method="Card").update(tickets_sold=5)
+        repo = RepositoryManager()
+        self.assertEqual(repo.reconcile_counters(dry_run=True)['SalesRollup'], 1)
+        self.assertEqual(repo.reconcile_counters()['SalesRollup'], 1)
+        self.assertEqual(self.totals(), (2, Decimal('200')))
+        self.assertEqual(repo.reconcile_counters(dry_run=True)['SalesRollup'], 0)
+
+
+class IndexPlanTest(TestCase):
+    """EXPLAIN гарячих запитів: кожен має йти через свій індекс, а не повним скануванням таблиці."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cashier = Cashier.objects.create(first_name="Ігор", last_name="Коваленко", hire_date=date(2020, 5, 10))
+        for i in range(20):
+            trip = Trip.objects.create(
+                start_station="Львів", end_station=f"Місто {i}", distance_km=100 + i,
+                train_type=('Intercity', 'Regular')[i % 2],
+            )
+            passenger = Passenger.objects.create(first_name=f"П{i}", last_name="Тест", passport=f"AB{i:06d}", age=30)
+            Ticket.objects.create(trip=trip, passenger=passenger, cashier=cashier)
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"Запит не використовує {index_name}:\n{queryset.query}\n{plan}")
+
+    def test_find_by_passport(self):
+        self.assertUsesIndex(Passenger.objects.filter(passport='AB000007'), 'passenger_passport_idx')
+
+    def test_upcoming_trips(self):
+        self.assertUsesIndex(Trip.objects.filter(departure__gte=timezone.now()), 'trip_departure_idx')
+
+    def test_distinct_train_types(self):
+        self.assertUsesIndex(
+            Trip.objects.order_by().values_list('train_type', flat=True).distinct(), 'trip_train_type_idx'
+        )
+
+    def test_trip_sales_in_window(self):
+        trip = Trip.objects.first()
+        since = timezone.now() - timedelta(days=30)
+        self.assertUsesIndex(Ticket.objects.filter(trip=trip, purchase_date__gte=since), 'ticket_trip_date_idx')
+
+    def test_cashier_totals(self):
+        cashier = Cashier.objects.get()
+        totals = Ticket.objects.filter(cashier=cashier).order_by().values('cashier').annotate(s=Sum('paid_amount'))
+        self.assertUsesIndex(totals, 'ticket_cashier_paid_idx')
+
+    def test_top_spenders(self):
+        self.assertUsesIndex(
+            Passenger.objects.filter(total_spent__gt=0).order_by('-total_spent', 'id')[:10], 'passenger_spent_id_idx'
+        )
+
+
+class FastSerializerParityTest(TestCase):
+    """FastSerializer (list/retrieve у REST) має віддавати те саме, що й ModelSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Passenger.objects.create(first_name="Олена", last_name="Без фото", passport="AB000001", age=30)
+        Passenger.objects.create(first_name="Іван", last_name="Фото", passport="AB000002", age=41,
+                                 photo='people/іван фото.png', total_spent=Decimal('1234.5'))
+        Passenger.objects.create(first_name="Порожнє", last_name="Фото", passport="AB000003", age=7, photo='')
+        Cashier.objects.create(first_name="Ігор", last_name="Коваленко", hire_date=date(2020, 5, 10),
+                               tickets_count=3, total_sales=Decimal('0.1'))
+        Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540)
+        Trip.objects.create(start_station="Одеса", end_station="Ужгород", distance_km=1100, image='trips/нічний.jpg',
+                            revenue_total=Decimal('99999.99'), number='101K', train_type='Night')
+
+    def assertParity(self, model, repository, serializer_class):
+        queryset = model.objects.order_by('id')
+        for shape, fast in for_shapes(model, repository.shapes).items():
+            with self.subTest(model=model.__name__, shape=shape):
+                fields = repository.shapes[shape]
+                expected = [dict(row) for row in serializer_class(queryset, many=True).data]
+                if fields is not None:
+                    expected = [{name: row[name] for name in fields} for row in expected]
+                # values()-рядки (list) і інстанси (retrieve, ?ids= з get_many)
+                self.assertEqual(fast.many(fast.values(queryset)), expected)
+                self.assertEqual(fast.many(list(queryset)), expected)
+
+    def test_parity(self):
+        # Не-UTC таймзона: datetime має переводитись так само, як у DRF
+        for tz in ('UTC', 'Europe/Kyiv'):
+            with timezone.override(tz):
+                self.assertParity(Passenger, PassengerRepository, PassengerSerializer)
+                self.assertParity(Cashier, CashierRepository, CashierSerializer)
+                self.assertParity(Trip, TripRepository, TripSerializer)
+
+    def test_nulls_decimals_and_dates(self):
+        passenger = FastSerializer(Passenger).to_representation(Passenger.objects.get(passport="AB000001"))
+        self.assertIsNone(passenger['photo'])
+        self.assertEqual(passenger['total_spent'], '0.00')
+        rich = FastSerializer(Passenger).to_representation(Passenger.objects.get(passport="AB000002"))
+        self.assertEqual(rich['total_spent'], '1234.50')
+        cashier = FastSerializer(Cashier).many(FastSerializer(Cashier).values(Cashier.objects.all()))[0]
+        self.assertEqual((cashier['hire_date'], cashier['total_sales']), ('2020-05-10', '0.10'))
+        # Незбережений інстанс: Decimal не пройшов конвертер БД, квантування - на серіалізаторі
+        unsaved = FastSerializer(Passenger).to_representation(Passenger(total_spent=Decimal('7.5'), age=1))
+        self.assertEqual(unsaved['total_spent'], PassengerSerializer(Passenger(total_spent=Decimal('7.5'))).data['total_spent'])
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Головні сторінки і REST-ендпоінти вкладаються в QUERY_BUDGETS[url name] на сторінці з 20+ рядків -
+    N+1 (запит на кожен рядок або зв'язок) одразу перевищить бюджет.
+    """
+
+    ROWS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('budget', password='x')
+        cashiers = [Cashier.objects.create(first_name=f"К{i}", last_name="Тест", hire_date=date(2020, 1, 1 + i))
+                    for i in range(3)]
+        for i in range(cls.ROWS):
+            trip = Trip.objects.create(start_station="Львів", end_station=f"Місто {i}", distance_km=100 + i,
+                                       image=f'trips/{i}.jpg')
+            passenger = Passenger.objects.create(first_name=f"П{i}", last_name="Тест", passport=f"AB{i:06d}", age=30)
+            Ticket.objects.create(trip=trip, passenger=passenger, cashier=cashiers[i % 3])
+        cls.ticket = Ticket.objects.first()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertWithinBudget(self, url, client=None):
+        budget = settings.QUERY_BUDGETS[resolve(url.split('?')[0]).url_name]
+        with self.subTest(url=url), query_budget(budget, label=url):
+            response = (client or self.client).get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_list_pages(self):
+        for url in ('/passengers/', '/passengers/?sort=age', '/cashiers/', '/trips/', '/tickets/',
+                    '/tickets/?sort=passenger', '/tickets/?sort=-date&passenger=Т'):
+            self.assertWithinBudget(url)
+
+    def test_ticket_detail(self):
+        self.assertWithinBudget(f'/tickets/{self.ticket.pk}/')
+
+    def test_api(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        ids = ','.join(str(pk) for pk in Passenger.objects.values_list('id', flat=True))
+        trip_ids = ','.join(str(pk) for pk in Trip.objects.values_list('id', flat=True))
+        for url in ('/api/passengers/', '/api/passengers/?shape=detail', f'/api/passengers/?ids={ids}',
+                    '/api/cashiers/', f'/api/trips/?ids={trip_ids}', '/api/trips/?limit=100',
+                    f'/api/passengers/{self.ticket.passenger_id}/', f'/api/trips/{self.ticket.trip_id}/',
+                    f'/api/cashiers/{self.ticket.cashier_id}/'):
+            self.assertWithinBudget(url, api)
+
+
+class TicketListFilterTest(TestCase):
+    """Фільтри /tickets/ застосовуються в SQL; зіпсовані значення ігноруються, а не дають 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('filters', password='x')
+        passenger = Passenger.objects.create(first_name="Олена", last_name="Тест", passport="AB000001", age=30)
+        for price in (100, 300):
+            trip = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540, price=price)
+            Ticket.objects.create(trip=trip, passenger=passenger)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def prices(self, query):
+        response = self.client.get(f'/tickets/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(ticket.base_price for ticket in response.context['tickets'])
+
+    def test_price_filters(self):
+        self.assertEqual(self.prices('price_min=200'), [Decimal('300')])
+        self.assertEqual(self.prices('price_max=200&price_min=abc'), [Decimal('100')])
+
+    def test_invalid_values_are_ignored(self):
+        for query in ('price_min=NaN', 'price_max=Infinity', 'price_min=-inf', 'price_min=sNaN',
+                      'date_from=2024-02-30', 'date_to=nonsense'):
+            with self.subTest(query=query):
+                self.assertEqual(self.prices(query), [Decimal('100'), Decimal('300')])
+
+
+class AnalyticsFiltersTest(TransactionTestCase):
+    """Фільтри дашборду: зіпсовані параметри -> значення за замовчуванням, самі фільтри - в SQL."""
+
+    # get_complex_analytics виконує запити в пулі потоків (окремі з'єднання) - потрібні закомічені дані
+    def setUp(self):
+        passenger = Passenger.objects.create(first_name="Олена", last_name="Тест", passport="AB000001", age=30)
+        self.fast = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540,
+                                        price=500, train_type='Intercity')
+        self.slow = Trip.objects.create(start_station="Львів", end_station="Стрий", distance_km=70,
+                                        price=50, train_type='Regular')
+        Ticket.objects.create(trip=self.fast, passenger=passenger)
+        old = Ticket.objects.create(trip=self.slow, passenger=passenger)
+        Ticket.objects.filter(pk=old.pk).update(purchase_date=timezone.now() - timedelta(days=60))
+        RepositoryManager().rebuild_sales_rollup()
+
+    def test_from_params(self):
+        filters = AnalyticsFilters.from_params({
+            'min_revenue': 'nan', 'min_occupancy': 'inf', 'top_n': '100000', 'train_type': 'All',
+            'date_from': '2024-02-30', 'date_to': '9999-12-31',
+        })
+        self.assertEqual((filters.min_revenue, filters.min_occupancy, filters.train_type), (0.0, 0.0, None))
+        self.assertEqual(filters.top_n, settings.ANALYTICS_TOP_N_MAX)
+        self.assertEqual((filters.date_from, filters.date_to), (None, date.max))
+        # Вікно до date.max - без верхньої межі, а не OverflowError
+        self.assertEqual(Ticket.objects.filter(filters.purchase_window()).count(), 2)
+
+    def trips(self, **filters):
+        analytics = RepositoryManager().get_complex_analytics(AnalyticsFilters(**filters), live=True)
+        return sorted(analytics['revenue_by_trip']['id'])
+
+    def test_filters_in_sql(self):
+        self.assertEqual(self.trips(), [self.fast.pk, self.slow.pk])
+        self.assertEqual(self.trips(train_type='Regular'), [self.slow.pk])
+        self.assertEqual(self.trips(min_revenue=100), [self.fast.pk])
+        # Вікно дат: прибуток рейсу рахується лише з квитків у вікні
+        since = timezone.localdate() - timedelta(days=7)
+        self.assertEqual(self.trips(date_from=since, min_revenue=1), [self.fast.pk])
+        months = RepositoryManager().get_complex_analytics(AnalyticsFilters(date_from=since), live=True)['sales_by_month']
+        self.assertEqual(sum(months['tickets_sold']), 1)
+
+
+class DashboardChartsTest(TransactionTestCase):
+    """Кешовані фрагменти Plotly - без вбудованого plotly.js: бібліотека підключається один раз на сторінку."""
+
+    def setUp(self):
+        trip = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540)
+        passenger = Passenger.objects.create(first_name="Олена", last_name="Тест", passport="AB000001", age=30)
+        cashier = Cashier.objects.create(first_name="Ігор", last_name="Коваленко", hire_date=date(2020, 5, 10))
+        Ticket.objects.create(trip=trip, passenger=passenger, cashier=cashier)
+        self.client.force_login(get_user_model().objects.create_user('charts', password='x'))
+
+    def test_plotly_js_loaded_once(self):
+        response = self.client.get('/dashboard/?live=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.count(b'cdn.plot.ly/plotly-'), 1)
+        self.assertGreaterEqual(response.content.count(b'Plotly.newPlot'), 5)
+        self.assertLess(len(response.content), 500_000)
+
+
+class ReportSummaryTest(TestCase):
+    """get_summary: агрегати в БД, фільтри за типом потяга і періодом, кеш на REPORT_SUMMARY_CACHE_TTL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('summary', password='x')
+        young = Passenger.objects.create(first_name="Олена", last_name="Тест", passport="AB000001", age=20)
+        old = Passenger.objects.create(first_name="Іван", last_name="Тест", passport="AB000002", age=40)
+        Passenger.objects.create(first_name="Без", last_name="Квитків", passport="AB000003", age=60)
+        cashiers = [Cashier.objects.create(first_name=f"К{i}", last_name="Тест", hire_date=date(2020, 1, 1))
+                    for i in range(2)]
+        fast = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540, train_type='Intercity')
+        slow = Trip.objects.create(start_station="Львів", end_station="Стрий", distance_km=70, train_type='Regular')
+        Ticket.objects.create(trip=fast, passenger=young, cashier=cashiers[0])
+        ticket = Ticket.objects.create(trip=slow, passenger=old, cashier=cashiers[1])
+        Ticket.objects.filter(pk=ticket.pk).update(purchase_date=timezone.now() - timedelta(days=60))
+
+    def setUp(self):
+        cache.clear()
+
+    def summary(self, **filters):
+        result = RepositoryManager().get_summary(**filters)
+        return (result['total_passengers'], result['total_cashiers'], result['total_trips'],
+                result['average_passenger_age'])
+
+    def test_filters(self):
+        self.assertEqual(self.summary(), (3, 2, 2, 40))
+        self.assertEqual(self.summary(train_type='Regular'), (1, 1, 1, 40))
+        self.assertEqual(self.summary(date_from=timezone.localdate() - timedelta(days=7)), (1, 1, 1, 20))
+        self.assertEqual(self.summary(date_to=timezone.localdate() - timedelta(days=30), train_type='Intercity'),
+                         (0, 0, 0, 0))
+
+    def test_cached(self):
+        self.assertEqual(self.summary()[0], 3)
+        Passenger.objects.create(first_name="Нова", last_name="Тест", passport="AB000004", age=30)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.summary()[0], 3)
+        # Інші фільтри - інший ключ кешу
+        self.assertEqual(self.summary(train_type='Regular')[0], 1)
+        cache.clear()
+        self.assertEqual(self.summary()[0], 4)
+
+    def test_api(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        self.assertEqual(api.get('/api/reports/summary/?date_from=2024-13-01').status_code, 400)
+        response = api.get('/api/reports/summary/?train_type=All')
+        self.assertEqual((response.status_code, response.data['total_trips']), (200, 2))
+
+
+class AnalyticsErrorsTest(TestCase):
+    """Збій запиту аналітики не ховається за порожнім графіком: лог з назвою запиту і виняток."""
+
+    def fail_on_months(self, key, rows):
+        if key == 'sales_by_month':
+            raise RuntimeError("boom")
+        return ColumnTable.from_rows(('x',), [])
+
+    def test_failure_is_logged_and_raised(self):
+        repo = RepositoryManager()
+        calls = (lambda: repo.get_complex_analytics(live=True),
+                 lambda: async_to_sync(repo.aget_complex_analytics)(live=True))
+        with mock.patch.object(RepositoryManager, '_analytics_table', side_effect=self.fail_on_months):
+            for call in calls:
+                with self.subTest(call=call), self.assertLogs('tickets.repositories', 'ERROR') as logs:
+                    with self.assertRaisesMessage(RuntimeError, "boom"):
+                        call()
+                self.assertIn('sales_by_month', logs.output[0])
+
+
+@override_settings(ANALYTICS_SNAPSHOT_REFRESH_ON_READ=False)
+class AnalyticsSnapshotTest(TransactionTestCase):
+    """Знімки аналітики: свіжий читається замість живих таблиць, застарілий перераховується або лишається."""
+
+    def setUp(self):
+        cache.clear()
+        self.passenger = Passenger.objects.create(first_name="Олена", last_name="Тест", passport="AB000001", age=30)
+        self.sell('Intercity')
+
+    def sell(self, train_type):
+        trip = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540, train_type=train_type)
+        Ticket.objects.create(trip=trip, passenger=self.passenger)
+
+    def train_types(self, **kwargs):
+        return RepositoryManager().get_complex_analytics(**kwargs)['train_type_stats']['train_type']
+
+    def age_snapshot(self):
+        AnalyticsSnapshotState.objects.filter(pk=1).update(
+            refreshed_at=timezone.now() - timedelta(seconds=settings.ANALYTICS_SNAPSHOT_MAX_AGE + 1))
+
+    def test_no_snapshot_falls_back_to_live(self):
+        self.assertIsNone(RepositoryManager().snapshot_refreshed_at())
+        self.assertEqual(self.train_types(), ['Intercity'])
+
+    def test_fresh_snapshot(self):
+        repo = RepositoryManager()
+        repo.refresh_analytics_snapshots()
+        self.assertTrue(repo.snapshot_is_fresh())
+        self.sell('Regular')
+        self.assertEqual(self.train_types(), ['Intercity'])
+        # live=1 і вікно дат - завжди живі таблиці
+        self.assertEqual(self.train_types(live=True), ['Intercity', 'Regular'])
+        window = AnalyticsFilters(date_from=timezone.localdate())
+        self.assertEqual(self.train_types(filters=window), ['Intercity', 'Regular'])
+
+    def test_stale_snapshot(self):
+        repo = RepositoryManager()
+        repo.refresh_analytics_snapshots()
+        self.sell('Regular')
+        self.age_snapshot()
+        self.assertFalse(repo.snapshot_is_fresh())
+        # Без оновлення під час запиту - попередній знімок
+        self.assertEqual(self.train_types(), ['Intercity'])
+        with self.settings(ANALYTICS_SNAPSHOT_REFRESH_ON_READ=True):
+            # Оновлення вже йде в іншому запиті - теж попередній знімок
+            cache.add(SNAPSHOT_REFRESH_LOCK, 1)
+            self.assertEqual(self.train_types(), ['Intercity'])
+            cache.delete(SNAPSHOT_REFRESH_LOCK)
+            self.assertEqual(self.train_types(), ['Intercity', 'Regular'])
+        self.assertTrue(repo.snapshot_is_fresh())
+
+
+class BulkSellTest(TestCase):
+    """bulk_sell: пакет продається цілком або відкочується цілком (SoldOut на будь-якому рейсі)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('bulk', password='x')
+        cls.roomy = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540, price=100)
+        cls.tight = Trip.objects.create(start_station="Львів", end_station="Стрий", distance_km=70, price=50, capacity=1)
+        cls.cashier = Cashier.objects.create(first_name="Ігор", last_name="Коваленко", hire_date=date(2020, 5, 10))
+        cls.passengers = [Passenger.objects.create(first_name=f"П{i}", last_name="Тест", passport=f"AB{i:06d}", age=30)
+                          for i in range(3)]
+
+    def items(self, *trips):
+        return [{'trip': trip.pk, 'passenger': self.passengers[i].pk, 'cashier': self.cashier.pk}
+                for i, trip in enumerate(trips)]
+
+    def test_sells_batch_in_chunks(self):
+        created = TicketRepository().bulk_sell(self.items(self.roomy, self.roomy, self.tight), chunk_size=2)
+        self.assertEqual(len(created), 3)
+        self.roomy.refresh_from_db()
+        self.cashier.refresh_from_db()
+        self.assertEqual((self.roomy.sold_count, self.roomy.revenue_total), (2, Decimal('200')))
+        self.assertEqual((self.cashier.tickets_count, self.cashier.total_sales), (3, Decimal('250')))
+        self.assertEqual(sum(RepositoryManager().sales_series('year')['tickets_sold']), 3)
+
+    def test_sold_out_rolls_back_whole_batch(self):
+        with self.assertRaises(SoldOut) as raised:
+            TicketRepository().bulk_sell(self.items(self.roomy, self.tight, self.tight))
+        self.assertEqual(raised.exception.trip_id, self.tight.pk)
+        self.assertFalse(Ticket.objects.exists())
+        self.assertFalse(SalesRollup.objects.exists())
+        for obj in (self.roomy, self.tight, self.cashier, self.passengers[0]):
+            obj.refresh_from_db()
+        self.assertEqual((self.roomy.sold_count, self.tight.sold_count, self.cashier.tickets_count), (0, 0, 0))
+        self.assertEqual(self.passengers[0].total_spent, 0)
+
+    def test_api(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        response = api.post('/api/tickets/bulk/', {'tickets': self.items(self.roomy, self.tight, self.tight)},
+                            format='json')
+        self.assertEqual((response.status_code, response.data['trip']), (409, self.tight.pk))
+        self.assertFalse(Ticket.objects.exists())
+
+        for body in ({'tickets': [{'trip': 'x', 'passenger': 1}]}, {'tickets': self.items(self.roomy), 'chunk_size': 0},
+                     {'tickets': [{'trip': self.roomy.pk, 'passenger': 10 ** 6}]}):
+            with self.subTest(body=body):
+                self.assertEqual(api.post('/api/tickets/bulk/', body, format='json').status_code, 400)
+
+        response = api.post('/api/tickets/bulk/', {'tickets': self.items(self.roomy, self.roomy)}, format='json')
+        self.assertEqual((response.status_code, response.data['created']), (201, 2))
+
+
+class KeysetPaginationTest(TestCase):
+    """Курсори next/previous проходять усі рядки без пропусків і повторів; зіпсований курсор - перша сторінка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('keyset', password='x')
+        # Повтори price: порядок між рівними тримає id
+        for i in range(7):
+            Trip.objects.create(start_station="Львів", end_station=f"Місто {i}", distance_km=100, price=100 * (i % 3))
+
+    def walk(self, ordering, per_page=3):
+        queryset = Trip.objects.all()
+        pages, cursor = [], None
+        while True:
+            page = paginate_keyset(queryset, ordering, cursor, per_page)
+            pages.append(page)
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_forward_and_back(self):
+        for ordering in (('id',), ('-id',), ('price', 'id'), ('-price', '-id'), ('-price', 'id')):
+            with self.subTest(ordering=ordering):
+                pages = self.walk(ordering)
+                expected = list(Trip.objects.order_by(*ordering).values_list('id', flat=True))
+                self.assertEqual([trip.pk for page in pages for trip in page], expected)
+                self.assertEqual([len(page) for page in pages], [3, 3, 1])
+                self.assertFalse(pages[0].has_previous)
+                # previous з кожної сторінки повертає рівно попередню
+                for before, page in zip(pages, pages[1:]):
+                    back = paginate_keyset(Trip.objects.all(), ordering, page.previous_cursor, 3)
+                    self.assertEqual([t.pk for t in back], [t.pk for t in before])
+                    self.assertEqual(back.has_previous, before.has_previous)
+
+    def test_tampered_cursors(self):
+        first = [t.pk for t in paginate_keyset(Trip.objects.all(), ('price', 'id'), None, 3)]
+        valid = paginate_keyset(Trip.objects.all(), ('price', 'id'), None, 3).next_cursor
+        for cursor in ('!!!', 'bm90IGpzb24', encode_cursor([1]), encode_cursor([None, None]),
+                       encode_cursor(['abc', 1]), encode_cursor([{'x': 1}, 1]), valid[:-2]):
+            with self.subTest(cursor=cursor):
+                page = paginate_keyset(Trip.objects.all(), ('price', 'id'), cursor, 3)
+                self.assertEqual([t.pk for t in page], first)
+                self.assertFalse(page.has_previous)
+
+    def test_api_links(self):
+        api = APIClient()
+        api.force_authenticate(self.user)
+        response = api.get('/api/trips/?limit=5')
+        self.assertEqual((len(response.data['results']), response.data['previous']), (5, None))
+        response = api.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+        response = api.get('/api/trips/?cursor=garbage&count=1')
+        self.assertEqual((response.status_code, response.data['count']), (200, 7))
+
+
+class ExportStreamingTest(TestCase):
+    """Експорт віддається потоком: рядки читаються keyset-пачками по chunk_size, а не одним запитом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('export', password='x')
+        for i in range(5):
+            Passenger.objects.create(first_name=f"П{i}", last_name="Тест", passport=f"AB{i:06d}", age=20 + i)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.expected = [dict(row) for row in Passenger.objects.order_by('id').values(*PassengerRepository.shapes['export'])]
+
+    def test_rows_are_read_lazily_in_chunks(self):
+        rows = iter_rows('passengers', chunk_size=2)
+        with self.assertNumQueries(1):
+            self.assertEqual(next(rows), self.expected[0])
+        with self.assertNumQueries(2):
+            self.assertEqual([self.expected[0], *rows], self.expected)
+
+    def test_json_and_ndjson(self):
+        response = self.api.get('/api/export/passengers/?format=json&chunk_size=2')
+        self.assertTrue(response.streaming)
+        self.assertIn('passengers.json', response['Content-Disposition'])
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), self.expected)
+
+        response = self.api.get('/api/export/passengers/?format=ndjson&chunk_size=abc')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.expected)
+
+    def test_unknown_entity(self):
+        self.assertEqual(self.api.get('/api/export/secrets/').status_code, 404)
+
+
+@override_settings(REPOSITORY_CACHE_ENABLED=True)
+class RepositoryCacheTest(TestCase):
+    """Read-through кеш репозиторіїв: влучання без SQL, інвалідація після коміту, all() лише для cache_all."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trip = Trip.objects.create(start_station="Львів", end_station="Київ", distance_km=540, price=100)
+        cls.cashier = Cashier.objects.create(first_name="Ігор", last_name="Коваленко", hire_date=date(2020, 5, 10))
+        cls.passenger = Passenger.objects.create(first_name="Олена", last_name="Тест", passport="AB000001", age=30)
+
+    def setUp(self):
+        caches[settings.REPOSITORY_CACHE_ALIAS].clear()
+
+    def test_get_by_id_and_invalidation_on_save(self):
+        trips = TripRepository()
+        self.assertEqual(trips.get_by_id(self.trip.pk).price, 100)
+        with self.assertNumQueries(0):
+            self.assertEqual(trips.get_by_id(str(self.trip.pk)).price, 100)
+            self.assertIsNone(trips.get_by_id('abc'))
+        with self.captureOnCommitCallbacks(execute=True):
+            trips.update(self.trip.pk, price=250)
+        self.assertEqual(trips.get_by_id(self.trip.pk).price, 250)
+
+    def test_missing_pk_is_cached(self):
+        self.assertIsNone(PassengerRepository().get_by_id(10 ** 6))
+        with self.assertNumQueries(0):
+            self.assertIsNone(PassengerRepository().get_by_id(10 ** 6))
+
+    def test_counter_and_bulk_updates_invalidate(self):
+        trips = TripRepository()
+        self.assertEqual(trips.get_by_id(self.trip.pk).sold_count, 0)
+        # F()-UPDATE лічильників іде повз post_save рейсу
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(trip=self.trip, passenger=self.passenger)
+        self.assertEqual(trips.get_by_id(self.trip.pk).sold_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            trips.bulk_update({self.trip.pk: {'price': 300}})
+        self.assertEqual(trips.get_by_id(self.trip.pk).price, 300)
+
+    def test_get_many_shares_entries(self):
+        other = Passenger.objects.create(first_name="Іван", last_name="Тест", passport="AB000002", age=40)
+        passengers = PassengerRepository()
+        passengers.get_by_id(self.passenger.pk)
+        with self.assertNumQueries(1):
+            found = passengers.get_many([self.passenger.pk, other.pk, 10 ** 6])
+        self.assertEqual(set(found), {self.passenger.pk, other.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(set(passengers.get_many([other.pk, 10 ** 6])), {other.pk})
+
+    def test_all_cached_only_for_small_lookups(self):
+        self.assertEqual(len(CashierRepository().all()), 1)
+        with self.assertNumQueries(0):
+            CashierRepository().all()
+        PassengerRepository().all()
+        with self.assertNumQueries(1):
+            PassengerRepository().all()
+
+
+@override_settings(REPOSITORY_CACHE_ENABLED=False)
+class GetManyTest(TestCase):
+    """get_many: {pk: об'єкт} частинами по chunk_size замість get_by_id у циклі."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = [Passenger.objects.create(first_name=f"П{i}", last_name="Тест", passport=f"AB{i:06d}", age=30).pk
+                   for i in range(5)]
+
+    def test_chunks(self):
+        passengers = PassengerRepository()
+        # Повтори і рядкові pk зводяться до унікальних int; відсутніх у результаті немає
+        ids = [*self.ids, str(self.ids[0]), self.ids[1], 10 ** 6]
+        with self.assertNumQueries(3):
+            found = passengers.get_many(ids, chunk_size=2)
+        self.assertEqual(sorted(found), self.ids)
+        self.assertEqual(found[self.ids[2]].passport, 'AB000002')
+        with self.settings(REPOSITORY_GET_MANY_CHUNK_SIZE=4), self.assertNumQueries(2):
+            self.assertEqual(len(passengers.get_many(ids)), 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(passengers.get_many([]), {})
+
+
+class BulkWriteTest(TestCase):
+    """bulk_update/upsert: пакетні зміни без save(), але лічильники і квитки ними не змінюються."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.trips = [Trip.objects.create(start_station="Львів", end_station=f"Місто {i}", distance_km=100, price=100)
+                     for i in range(4)]
+
+    def prices(self):
+        return list(Trip.objects.order_by('id').values_list('price', flat=True))
+
+    def test_bulk_update(self):
+        repo = TripRepository()
+        a, b, c, d = (trip.pk for trip in self.trips)
+        # Однакові зміни - один UPDATE на пачку (batch_size=2 -> 2 запити), F-вирази теж
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(repo.bulk_update({a: {'price': F('price') + 10}, b: {'price': F('price') + 10},
+                                               c: {'price': F('price') + 10}}, batch_size=2), 3)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in queries.captured_queries), 2)
+        self.assertEqual(self.prices(), [110, 110, 110, 100])
+        self.assertEqual(repo.bulk_update({a: {'price': 1}, d: {'price': 4, 'capacity': 7}, b: {}}), 2)
+        self.assertEqual(self.prices(), [1, 110, 110, 4])
+        self.assertEqual(Trip.objects.get(pk=d).capacity, 7)
+
+    def test_protected_and_key_fields(self):
+        for repo, changes in ((TripRepository(), {'sold_count': 0}), (TripRepository(), {'id': 99}),
+                              (PassengerRepository(), {'total_spent': 1}), (TicketRepository(), {'base_price': 1}),
+                              (TicketRepository(), {'trip_id': 1})):
+            with self.subTest(model=repo.model.__name__, changes=changes):
+                with self.assertRaises(ValueError):
+                    repo.bulk_update({self.trips[0].pk: changes})
+        self.assertEqual(self.prices(), [100] * 4)
+
+    def test_upsert(self):
+        repo = TripRepository()
+        rows = [
+            {'id': self.trips[0].pk, 'start_station': "Львів", 'end_station': "Київ", 'distance_km': 540, 'price': 500},
+            {'id': 10 ** 6, 'start_station': "Одеса", 'end_station': "Ужгород", 'distance_km': 1100, 'price': 900},
+        ]
+        self.assertEqual(repo.upsert(rows, update_fields=['price']), 2)
+        self.assertEqual(Trip.objects.get(pk=self.trips[0].pk).price, 500)
+        self.assertEqual(Trip.objects.get(pk=10 ** 6).end_station, "Ужгород")
+        self.assertEqual(Trip.objects.count(), 5)
+
+    def test_upsert_errors(self):
+        row = {'id': self.trips[0].pk, 'price': 1}
+        for kwargs, error in (
+            ({'rows': [{'passport': 'AB1', 'age': 1}], 'unique_by': 'passport'}, "немає унікального ключа"),
+            ({'rows': [{**row, 'sold_count': 0}]}, "sold_count"),
+            ({'rows': [row], 'update_fields': []}, "немає полів"),
+        ):
+            repo = PassengerRepository() if kwargs.get('unique_by') else TripRepository()
+            with self.subTest(kwargs=kwargs), self.assertRaisesMessage(ValueError, error):
+                repo.upsert(**kwargs)
+        with self.assertRaises(TypeError):
+            TicketRepository().upsert([{'id': 1, 'payment_method': 'Card'}])
+        self.assertEqual(TripRepository().upsert([]), 0)
+        self.assertEqual(self.prices(), [100] * 4)
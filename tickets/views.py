@@ -2,14 +2,9 @@ from django.shortcuts import render, redirect
 from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.urls import reverse_lazy
-import plotly.express as px
-import pandas as pd
+from railway.lazy import LazyModule
 from .models import Passenger, Cashier, Trip, Ticket
 from .repositories import RepositoryManager
-from bokeh.plotting import figure
-from bokeh.embed import components
-from bokeh.models import ColumnDataSource, HoverTool
-from bokeh.palettes import Spectral6
 import math
 import time
 import concurrent.futures
@@ -19,6 +14,9 @@ from django.contrib.auth.decorators import login_required
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 
+# Важкі бібліотеки - ліниво, при першому використанні
+px = LazyModule('plotly.express')
+pd = LazyModule('pandas')
 
 repo = RepositoryManager()
 
@@ -27,6 +25,10 @@ def my_protected_view(request):
     # Цей код буде доступний лише авторизованим користувачам
     
     def dashboard_bokeh_view(request):
+        from bokeh.plotting import figure
+        from bokeh.embed import components
+        from bokeh.models import ColumnDataSource, HoverTool
+
         analytics_qs = repo.get_complex_analytics()
         plots = {}
 
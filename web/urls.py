@@ -30,5 +30,6 @@ urlpatterns = [
 
     path('dashboard/', views.dashboard_view, name='dashboard'),
     path('dashboard/v2/', views.dashboard_bokeh_view, name='dashboard_bokeh'),
+    path('dashboard/v2/async/', views.dashboard_bokeh_async_view, name='dashboard_bokeh_async'),
     path('performance/', views.performance_view, name='performance'),
 ]
\ No newline at end of file
@@ -4,31 +4,34 @@ from django.urls import reverse_lazy
 from django.contrib.auth.views import LoginView
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
-from django.db import connection
 
 # --- АНАЛІТИКА ---
-import pandas as pd
-import plotly.express as px
-import time
-import concurrent.futures
+# pandas/plotly/bokeh важкі, а CRUD-сторінкам не потрібні:
+# імпортуються при першому використанні (railway/lazy.py)
+from railway.lazy import LazyModule
 from math import pi
 
-# --- BOKEH ---
-from bokeh.plotting import figure
-from bokeh.embed import components
-from bokeh.models import ColumnDataSource, HoverTool, LinearColorMapper
-from bokeh.transform import cumsum, transform
-from bokeh.resources import CDN
-from bokeh.palettes import Category20c, Viridis256
+pd = LazyModule('pandas')
+px = LazyModule('plotly.express')
+go = LazyModule('plotly.graph_objects')
+plotly_offline = LazyModule('plotly.offline')
+bokeh_resources = LazyModule('bokeh.resources')
 
 # --- МОДЕЛІ ---
-from tickets.models import Passenger, Cashier, Trip, Ticket
+from tickets.models import Passenger, Cashier, Trip, Ticket, SoldOut
 from tickets.repositories import RepositoryManager
+from tickets.pagination import paginate_keyset
+from tickets.signals import analytics_version
+from tickets.charts import chart_columns
+from tickets.filters import AnalyticsFilters
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 
-import psutil
-import os
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import hashlib
+from decimal import Decimal, InvalidOperation
+from django.db.models import Q
+from django.utils.dateparse import parse_date
 
 
 repo = RepositoryManager()
@@ -59,123 +62,164 @@ def home(request):
 # 2. DASHBOARD V1 (PLOTLY)
 # ==========================================
 
+def cached_chart(chart_id, params, build, use_cache=True):
+    """
+    Кеш готового HTML графіка за (chart_id, фільтри, версія аналітичних даних).
+    Версія зсувається при будь-якій зміні квитків/рейсів (tickets.signals),
+    тож графік перебудовується лише коли змінились його дані або фільтри.
+    """
+    if not use_cache:
+        return build()
+    filters = '&'.join(f"{k}={v}" for k, v in sorted(params.items()))
+    key = f"chart:{chart_id}:{analytics_version()}:{hashlib.md5(filters.encode()).hexdigest()}"
+    html = cache.get(key)
+    if html is None:
+        html = build() or ''
+        cache.set(key, html, settings.CHART_CACHE_TTL)
+    return html or None
+
+
+def plotly_script() -> str:
+    # plotly.js підключається один раз на сторінку (як bokeh CDN resources):
+    # вбудований у кожен фрагмент бандл - ~4.8 МБ на графік і на кожну версію кешу
+    version = plotly_offline.get_plotlyjs_version()
+    return f'<script src="https://cdn.plot.ly/plotly-{version}.min.js" charset="utf-8"></script>'
+
+
 def dashboard_view(request):
-    analytics = repo.get_complex_analytics()
+    live = request.GET.get('live') == '1'
     graphs = {}
 
     # --- ОТРИМАННЯ ФІЛЬТРІВ ---
-    min_revenue = float(request.GET.get('min_revenue', 0))
-    min_occupancy = float(request.GET.get('min_occupancy', 0))
-    top_n = int(request.GET.get('top_n', 10))
-    filter_type = request.GET.get('train_type', 'All')
+    # Фільтри застосовуються в SQL (tickets.filters.AnalyticsFilters), тож у
+    # DataFrame потрапляють лише рядки, які реально малюються
+    filters = AnalyticsFilters.from_params(request.GET)
+    min_revenue = filters.min_revenue
+    min_occupancy = filters.min_occupancy
+    top_n = filters.top_n
+
+    analytics = {}
+
+    def columns(key):
+        # До БД ідемо лише при першому промаху кешу графіків
+        if not analytics:
+            analytics.update(repo.get_complex_analytics(filters, live=live))
+        return analytics[key].as_dict()
+
+    # Логіка назв
+    def get_short_name(row):
+        num = row['number']
+        if num and str(num).lower() != 'none' and str(num).strip() != '':
+            return str(num)
+        return f"#{row['id']}"
 
     # === 1. Прибуток (Bar) ===
-    df1 = pd.DataFrame(list(analytics['revenue_by_trip'].values('id', 'number', 'start_station', 'end_station', 'total_revenue')))
-    df1 = df1.fillna(0)
-    
-    if not df1.empty:
+    def build_revenue():
+        df1 = pd.DataFrame(columns('revenue_by_trip'))
+        if df1.empty:
+            return None
+        df1 = df1.fillna(0)
         df1['total_revenue'] = df1['total_revenue'].astype(float)
-        
-        # Фільтр: Мін. прибуток
-        df1 = df1[df1['total_revenue'] >= min_revenue]
-        
-        # Логіка назв
-        def get_short_name(row):
-            num = row['number']
-            if num and str(num).lower() != 'none' and str(num).strip() != '':
-                return str(num)
-            return f"#{row['id']}"
-
-        if not df1.empty:
-            df1['short_name'] = df1.apply(get_short_name, axis=1)
-            df1['full_route'] = df1['start_station'] + " - " + df1['end_station']
-            
-            fig = px.bar(
-                df1, 
-                x='short_name', 
-                y='total_revenue', 
-                title=f"1. Прибуток рейсів (> {min_revenue} грн)", 
-                color='total_revenue',
-                hover_name='full_route',
-                labels={'short_name': 'Рейс', 'total_revenue': 'Прибуток (грн)'}
-            )
-            graphs['g1'] = fig.to_html(full_html=False)
+        df1['short_name'] = df1.apply(get_short_name, axis=1)
+        df1['full_route'] = df1['start_station'] + " - " + df1['end_station']
+
+        fig = px.bar(
+            df1,
+            x='short_name',
+            y='total_revenue',
+            title=f"1. Прибуток рейсів (> {min_revenue} грн)",
+            color='total_revenue',
+            hover_name='full_route',
+            labels={'short_name': 'Рейс', 'total_revenue': 'Прибуток (грн)'}
+        )
+        return fig.to_html(full_html=False, include_plotlyjs=False)
 
     # === 2. Касири (Pie) ===
-    df2 = pd.DataFrame(list(analytics['cashier_performance'].values('first_name', 'last_name', 'total_sales')))
-    df2 = df2.fillna(0)
-    if not df2.empty:
+    def build_cashiers():
+        df2 = pd.DataFrame(columns('cashier_performance'))
+        if df2.empty:
+            return None
+        df2 = df2.fillna(0)
         df2['total_sales'] = df2['total_sales'].astype(float)
         df2['name'] = df2['first_name'] + " " + df2['last_name']
         fig = px.pie(df2, values='total_sales', names='name', title="2. Продажі касирів")
-        graphs['g2'] = fig.to_html(full_html=False)
+        return fig.to_html(full_html=False, include_plotlyjs=False)
 
     # === 3. Завантаженість (Bar) ===
-    df3 = pd.DataFrame(list(analytics['trip_occupancy'].values('id', 'number', 'occupancy_rate')))
-    df3 = df3.fillna(0)
-    if not df3.empty:
+    def build_occupancy():
+        df3 = pd.DataFrame(columns('trip_occupancy'))
+        if df3.empty:
+            return None
+        df3 = df3.fillna(0)
         df3['occupancy_rate'] = df3['occupancy_rate'].astype(float)
-        
-        # Фільтр: Завантаженість
-        df3 = df3[df3['occupancy_rate'] >= min_occupancy]
-
-        if not df3.empty:
-            def get_route_name(row):
-                num = row['number']
-                if num and str(num).lower() != 'none' and str(num).strip() != '':
-                    return str(num)
-                return f"#{row['id']}"
-
-            df3['route'] = df3.apply(get_route_name, axis=1)
-            
-            fig = px.bar(df3, x='route', y='occupancy_rate', title=f"3. Завантаженість > {min_occupancy}%", range_y=[0, 100])
-            graphs['g3'] = fig.to_html(full_html=False)
+        df3['route'] = df3.apply(get_short_name, axis=1)
+
+        fig = px.bar(df3, x='route', y='occupancy_rate', title=f"3. Завантаженість > {min_occupancy}%", range_y=[0, 100])
+        return fig.to_html(full_html=False, include_plotlyjs=False)
 
     # === 4. Типи (Scatter) ===
-    df4 = pd.DataFrame(list(analytics['train_type_stats'].values('train_type', 'avg_passenger_age', 'max_ticket_price')))
-    df4 = df4.fillna(0)
-    if not df4.empty:
-        # Фільтр: Тип потяга
-        if filter_type != 'All':
-            df4 = df4[df4['train_type'] == filter_type]
-
-        if not df4.empty:
-            df4['max'] = df4['max_ticket_price'].astype(float)
-            df4['age'] = df4['avg_passenger_age'].astype(float)
-            fig = px.scatter(df4, x='age', y='max', size='max', color='train_type', title="4. Вік vs Ціна", size_max=60)
-            graphs['g4'] = fig.to_html(full_html=False)
+    def build_train_types():
+        df4 = pd.DataFrame(columns('train_type_stats'))
+        if df4.empty:
+            return None
+        df4 = df4.fillna(0)
+        df4['max'] = df4['max_ticket_price'].astype(float)
+        df4['age'] = df4['avg_passenger_age'].astype(float)
+        fig = px.scatter(df4, x='age', y='max', size='max', color='train_type', title="4. Вік vs Ціна", size_max=60)
+        return fig.to_html(full_html=False, include_plotlyjs=False)
 
     # === 5. Місяці (Line) ===
-    df5 = pd.DataFrame(list(analytics['sales_by_month'].values('month', 'tickets_sold')))
-    df5 = df5.fillna(0)
-    if not df5.empty:
-        df5 = df5.sort_values('month')
+    def build_months():
+        df5 = pd.DataFrame(columns('sales_by_month'))
+        if df5.empty:
+            return None
+        df5 = df5.fillna(0)
         fig = px.line(df5, x='month', y='tickets_sold', markers=True, title="5. Продажі по місяцях")
-        graphs['g5'] = fig.to_html(full_html=False)
+        return fig.to_html(full_html=False, include_plotlyjs=False)
 
     # === 6. VIP (Horizontal Bar) ===
-    df6 = pd.DataFrame(list(analytics['top_passengers'].values('id', 'first_name', 'last_name', 'total_spent')))
-    df6 = df6.fillna(0)
-    if not df6.empty:
+    def build_top_passengers():
+        df6 = pd.DataFrame(columns('top_passengers'))
+        if df6.empty:
+            return None
+        df6 = df6.fillna(0)
         df6['sum'] = df6['total_spent'].astype(float)
         df6['name'] = df6['first_name'] + " " + df6['last_name'] + " (#" + df6['id'].astype(str) + ")"
-        
-        # Сортування і Фільтр Топ-N
-        df6 = df6.sort_values('sum', ascending=True) # Plotly малює знизу вгору
-        df6 = df6.tail(top_n) # Беремо N найбільших
+
+        # Топ-N вже обрізаний і впорядкований у БД (рівні суми - за id); Plotly малює знизу вгору
+        df6 = df6.iloc[::-1]
 
         fig = px.bar(df6, x='sum', y='name', orientation='h', title=f"6. Топ-{top_n} VIP Клієнтів")
-        graphs['g6'] = fig.to_html(full_html=False)
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
+    # Ключ кешу графіка - лише ті фільтри, що на нього впливають
+    window = {'date_from': filters.date_from, 'date_to': filters.date_to}
+    trip_filters = {**window, 'train_type': filters.train_type}
+    charts = [
+        ('g1', build_revenue, {**trip_filters, 'min_revenue': min_revenue}),
+        ('g2', build_cashiers, window),
+        ('g3', build_occupancy, {**trip_filters, 'min_occupancy': min_occupancy}),
+        ('g4', build_train_types, trip_filters),
+        ('g5', build_months, window),
+        ('g6', build_top_passengers, {**window, 'top_n': top_n}),
+    ]
+    for chart_id, build, params in charts:
+        html = cached_chart(chart_id, params, build, use_cache=not live)
+        if html:
+            graphs[chart_id] = html
 
     # Список типів для меню
     all_types = list(Trip.objects.values_list('train_type', flat=True).distinct())
 
     return render(request, 'web/dashboard.html', {
         'graphs': graphs,
+        'plotly_js': plotly_script(),
         'min_revenue': int(min_revenue),
         'min_occupancy': int(min_occupancy),
         'top_n': top_n,
-        'selected_type': filter_type,
+        'selected_type': filters.train_type or 'All',
+        'date_from': filters.date_from,
+        'date_to': filters.date_to,
         'all_types': all_types
     })
 
@@ -183,287 +227,230 @@ def dashboard_view(request):
 # 3. DASHBOARD V2 (BOKEH) - MAXIMUM INTERACTIVITY
 # ==========================================
 
-def dashboard_bokeh_view(request):
-    analytics = repo.get_complex_analytics()
+def bokeh_dashboard_context(filters: AnalyticsFilters, all_types) -> dict:
+    return {
+        'min_occupancy': int(filters.min_occupancy),
+        'min_revenue': int(filters.min_revenue),
+        'top_n': filters.top_n,
+        'selected_type': filters.train_type or 'All',
+        'date_from': filters.date_from,
+        'date_to': filters.date_to,
+        'all_types': all_types
+    }
+
+
+def build_bokeh_plots(analytics, filters: AnalyticsFilters) -> dict:
+    """Шість графіків Bokeh з уже відфільтрованих даних аналітики -> {'s1': script, 'd1': div, ...}."""
+    from bokeh.plotting import figure
+    from bokeh.embed import components
+    from bokeh.models import ColumnDataSource, HoverTool, LinearColorMapper
+    from bokeh.transform import cumsum, transform
+    from bokeh.palettes import Category20c, Viridis256
+
+    min_revenue = filters.min_revenue
+    min_occupancy = filters.min_occupancy
+    top_n = filters.top_n
     plots = {}
-    
-    # Отримуємо значення з GET, якщо пусто - ставимо 0
-    try: min_revenue = float(request.GET.get('min_revenue', 0) or 0)
-    except: min_revenue = 0.0
-
-    try: min_occupancy = float(request.GET.get('min_occupancy', 0) or 0)
-    except: min_occupancy = 0.0
-
-    try: top_n = int(request.GET.get('top_n', 10) or 10)
-    except: top_n = 10
-    
-    filter_type = request.GET.get('train_type', 'All')
-    
+
     TOOLS = "pan,wheel_zoom,box_zoom,reset,save"
 
     # === 1. Прибуток (LOLLIPOP) ===
-    raw_data = list(analytics['revenue_by_trip'].values('id', 'number', 'start_station', 'end_station', 'total_revenue'))
-    
-    # Фільтрація по прибутку
-    raw_data = [d for d in raw_data if float(d['total_revenue'] or 0) >= min_revenue]
-
-    if raw_data:
-        x_axis = []
-        routes = []
-        revenues = []
-        
-        for i in raw_data:
-            num = i['number']
-            if num and str(num).lower() != 'none' and str(num).strip() != '':
-                # ВАЖЛИВО: Додаємо ID, щоб назва була унікальною!
-                # Інакше Bokeh зникне, якщо є два рейси з однаковим номером.
-                display_num = f"{num} (id:{i['id']})"
-            else:
-                display_num = f"#{i['id']}"
-            
-            x_axis.append(display_num)
-            routes.append(f"{i['start_station']}-{i['end_station']}")
-            revenues.append(float(i['total_revenue'] or 0))
-        
-        source = ColumnDataSource(data=dict(x=x_axis, y=revenues, route=routes))
-        p = figure(x_range=x_axis, height=350, title=f"1. Прибуток > {min_revenue} грн", 
+    data = chart_columns('revenue', analytics)
+    if data['x']:
+        source = ColumnDataSource(data=data)
+        p = figure(x_range=data['x'], height=350, title=f"1. Прибуток > {min_revenue} грн",
                    toolbar_location="right", tools=TOOLS)
-        
+
         p.segment(x0='x', y0=0, x1='x', y1='y', line_width=2, color="#390650", source=source)
         p.circle(x='x', y='y', size=15, fill_color="#390650", line_color="white", line_width=2, source=source)
         p.add_tools(HoverTool(tooltips=[("Рейс", "@x"), ("Маршрут", "@route"), ("Сума", "@y{0.00} грн")]))
         plots['s1'], plots['d1'] = components(p)
 
     # === 2. Касири (DONUT) ===
-    raw_data = list(analytics['cashier_performance'].values('first_name', 'last_name', 'total_sales'))
-    if raw_data:
-        data = pd.DataFrame(raw_data)
-        data['total_sales'] = data['total_sales'].astype(float).fillna(0)
-        data['name'] = data['first_name'] + ' ' + data['last_name']
-        data['angle'] = data['total_sales'] / data['total_sales'].sum() * 2 * pi
-        
+    data = chart_columns('cashiers', analytics)
+    if data['name']:
+        total = sum(data['sales']) or 1
+        data['angle'] = [sales / total * 2 * pi for sales in data['sales']]
+
         # Безпечні кольори (щоб не було помилок індексу)
         colors_list = Category20c[20]
-        data['color'] = [colors_list[i % 20] for i in range(len(data))]
-        
-        source = ColumnDataSource(data)
-        p = figure(height=350, title="2. Частка продажів касирів", 
+        data['color'] = [colors_list[i % 20] for i in range(len(data['name']))]
+
+        source = ColumnDataSource(data=data)
+        p = figure(height=350, title="2. Частка продажів касирів",
                    toolbar_location="right", tools=TOOLS, x_range=(-0.5, 1.0))
-        
-        p.wedge(x=0, y=1, radius=0.4, start_angle=cumsum('angle', include_zero=True), 
-                end_angle=cumsum('angle'), line_color="white", fill_color='color', 
+
+        p.wedge(x=0, y=1, radius=0.4, start_angle=cumsum('angle', include_zero=True),
+                end_angle=cumsum('angle'), line_color="white", fill_color='color',
                 legend_field='name', source=source)
-        
+
         p.axis.visible = False
         p.grid.grid_line_color = None
         plots['s2'], plots['d2'] = components(p)
 
     # === 3. Завантаженість (H-BAR) ===
-    raw_data = list(analytics['trip_occupancy'].values('id', 'number', 'occupancy_rate'))
-    if raw_data:
-        filtered_data = [d for d in raw_data if float(d['occupancy_rate'] or 0) >= min_occupancy]
-        if filtered_data:
-            routes = []
-            rates = []
-            for d in filtered_data:
-                num = d['number']
-                if num and str(num).lower() != 'none' and str(num).strip() != '':
-                    # ВАЖЛИВО: Унікальна назва
-                    display_num = f"{num} (id:{d['id']})"
-                else:
-                    display_num = f"#{d['id']}"
-                
-                routes.append(display_num)
-                rates.append(float(d['occupancy_rate'] or 0))
-            
-            source = ColumnDataSource(data=dict(y_routes=routes, right=rates))
-            p = figure(y_range=routes, height=350, title=f"3. Завантаженість > {min_occupancy}%", 
-                       toolbar_location="right", tools=TOOLS)
-            
-            mapper = LinearColorMapper(palette=Viridis256, low=0, high=100)
-            p.hbar(y='y_routes', right='right', height=0.6, source=source, fill_color=transform('right', mapper))
-            p.add_tools(HoverTool(tooltips=[("Рейс", "@y_routes"), ("Заповнено", "@right{0.0}%")]))
-            plots['s3'], plots['d3'] = components(p)
+    data = chart_columns('occupancy', analytics)
+    if data['y_routes']:
+        source = ColumnDataSource(data=data)
+        p = figure(y_range=data['y_routes'], height=350, title=f"3. Завантаженість > {min_occupancy}%",
+                   toolbar_location="right", tools=TOOLS)
+
+        mapper = LinearColorMapper(palette=Viridis256, low=0, high=100)
+        p.hbar(y='y_routes', right='right', height=0.6, source=source, fill_color=transform('right', mapper))
+        p.add_tools(HoverTool(tooltips=[("Рейс", "@y_routes"), ("Заповнено", "@right{0.0}%")]))
+        plots['s3'], plots['d3'] = components(p)
 
     # === 4. Типи (SCATTER) ===
-    raw_data = list(analytics['train_type_stats'].values('train_type', 'avg_passenger_age', 'max_ticket_price'))
-    if raw_data:
-        if filter_type != 'All':
-            raw_data = [d for d in raw_data if d['train_type'] == filter_type]
-        ages = [float(i['avg_passenger_age'] or 0) for i in raw_data]
-        prices = [float(i['max_ticket_price'] or 0) for i in raw_data]
-        types = [i['train_type'] for i in raw_data]
-        
-        source = ColumnDataSource(data=dict(x=ages, y=prices, t_type=types))
+    data = chart_columns('train_types', analytics)
+    if data['t_type']:
+        source = ColumnDataSource(data=data)
         p = figure(height=350, title="4. Ціна vs Вік", toolbar_location="right", tools=TOOLS)
-        
+
         p.circle(x='x', y='y', size=20, source=source, color="firebrick", alpha=0.6)
         p.add_tools(HoverTool(tooltips=[("Тип", "@t_type"), ("Вік", "@x{0.0}"), ("Ціна", "@y{0.00}")]))
         plots['s4'], plots['d4'] = components(p)
 
     # === 5. Місяці (LINE) ===
-    raw_data = list(analytics['sales_by_month'].values('month', 'tickets_sold'))
-    if raw_data:
-        raw_data.sort(key=lambda x: x['month'])
-        months = [i['month'] for i in raw_data]
-        sold = [i['tickets_sold'] for i in raw_data]
-        
-        source = ColumnDataSource(data=dict(x=months, y=sold))
-        p = figure(height=350, title="5. Динаміка продажів", toolbar_location="right", tools=TOOLS)
-        
+    data = chart_columns('months', analytics)
+    if data['x']:
+        source = ColumnDataSource(data=data)
+        p = figure(x_range=data['x'], height=350, title="5. Динаміка продажів", toolbar_location="right", tools=TOOLS)
+
         p.line(x='x', y='y', line_width=3, color="green", source=source)
         p.circle(x='x', y='y', size=8, fill_color="white", source=source)
         p.add_tools(HoverTool(tooltips=[("Місяць", "@x"), ("Продано", "@y{0} шт")]))
         plots['s5'], plots['d5'] = components(p)
 
     # === 6. VIP (H-BAR) ===
-    raw_data = list(analytics['top_passengers'].values('id', 'first_name', 'last_name', 'total_spent'))
-    if raw_data:
-        # Сортування
-        raw_data.sort(key=lambda x: float(x['total_spent'] or 0), reverse=True)
-        # Топ N
-        raw_data = raw_data[:top_n]
-        
-        # Унікальні імена (додаємо ID)
-        names = [f"{i['first_name']} {i['last_name']} (#{i['id']})" for i in raw_data]
-        spent = [float(i['total_spent'] or 0) for i in raw_data]
-        
-        # Розвертаємо для графіка
-        names.reverse()
-        spent.reverse()
-
-        source = ColumnDataSource(data=dict(y=names, right=spent))
-        p = figure(y_range=names, height=350, title=f"6. Топ-{top_n} VIP Клієнтів", toolbar_location="right", tools=TOOLS)
-        
+    data = chart_columns('top_passengers', analytics)
+    if data['y']:
+        source = ColumnDataSource(data=data)
+        p = figure(y_range=data['y'], height=350, title=f"6. Топ-{top_n} VIP Клієнтів", toolbar_location="right", tools=TOOLS)
+
         p.hbar(y='y', right='right', height=0.6, source=source, color="purple")
         p.add_tools(HoverTool(tooltips=[("Клієнт", "@y"), ("Витрачено", "@right{0.00} грн")]))
         plots['s6'], plots['d6'] = components(p)
 
-    all_types = list(Trip.objects.values_list('train_type', flat=True).distinct())
-    resources = CDN.render()
+    return plots
 
-    return render(request, 'web/dashboard_bokeh.html', {
-        'plots': plots, 
-        'resources': resources,
-        'min_occupancy': int(min_occupancy), 
-        'min_revenue': int(min_revenue),
-        'top_n': top_n,
-        'selected_type': filter_type, 
-        'all_types': all_types
-    })
+
+def dashboard_bokeh_view(request):
+    filters = AnalyticsFilters.from_params(request.GET)
+    all_types = list(Trip.objects.values_list('train_type', flat=True).distinct())
+    context = bokeh_dashboard_context(filters, all_types)
+
+    # Клієнтський режим: сторінка вантажиться один раз, графіки будує BokehJS,
+    # а дані тягнуться з /api/analytics/<chart>/ при кожній зміні фільтрів
+    if request.GET.get('mode') == 'client':
+        context['resources'] = bokeh_resources.Resources(mode='cdn', components=['bokeh', 'bokeh-api']).render()
+        return render(request, 'web/dashboard_bokeh_client.html', context)
+
+    analytics = repo.get_complex_analytics(filters, live=request.GET.get('live') == '1')
+    context['plots'] = build_bokeh_plots(analytics, filters)
+    context['resources'] = bokeh_resources.CDN.render()
+    return render(request, 'web/dashboard_bokeh.html', context)
+
+
+async def dashboard_bokeh_async_view(request):
+    """
+    Той самий серверний Bokeh-дашборд, але для ASGI (uvicorn railway.asgi:application):
+    запити аналітики збираються через asyncio.gather, без пулу потоків на кожен запит.
+    """
+    filters = AnalyticsFilters.from_params(request.GET)
+    all_types = [t async for t in Trip.objects.values_list('train_type', flat=True).distinct()]
+    context = bokeh_dashboard_context(filters, all_types)
+
+    analytics = await repo.aget_complex_analytics(filters, live=request.GET.get('live') == '1')
+    context['plots'] = build_bokeh_plots(analytics, filters)
+    # base.html читає request.user - завантажуємо його тут, а не синхронно під час рендерингу
+    request.user = await request.auser()
+    context['resources'] = bokeh_resources.CDN.render()
+    return render(request, 'web/dashboard_bokeh.html', context)
 
 # ==========================================
 # 4. PERFORMANCE VIEW
 # ==========================================
 
 def performance_view(request):
-    # Параметри експерименту
-    TOTAL_REQUESTS = 200  # Вимога: 100-200 запитів
-    BATCH_SIZE = 20       # Розмір "пакету" даних в одному запиті
-    
-    results = []
+    # Бенчмарк більше не запускається в запиті (блокував воркер і давав шумні одиничні заміри):
+    # сторінка показує останній результат `manage.py benchmark` (BENCHMARK_RESULTS_FILE).
+    # Імпорт локальний: tickets.benchmark тягне тестові клієнти Django/DRF, воркеру на старті вони не потрібні
+    from tickets.benchmark import load_results
+    results = load_results(settings.BENCHMARK_RESULTS_FILE)
     graph = None
-    optimal_config = None
-    
-    if request.GET.get('run'):
-        # Отримуємо поточний процес для заміру RAM
-        process = psutil.Process(os.getpid())
-
-        # Функція, що виконується в потоці
-        def db_task(n):
-            # Імітуємо реальну роботу: вибірка пакету даних
-            # connection.close() обов'язковий, щоб не вичерпати ліміт з'єднань БД
-            try:
-                list(Ticket.objects.values_list('id', 'base_price')[:BATCH_SIZE])
-            finally:
-                connection.close() 
-
-        # Варіанти кількості потоків для пошуку оптимуму
-        thread_options = [1, 2, 4, 8, 16, 32, 64]
-        
-        print(f"Starting benchmark with {TOTAL_REQUESTS} requests...")
-
-        for workers in thread_options:
-            # 1. Фіксуємо пам'ять ДО
-            mem_before = process.memory_info().rss / 1024 / 1024 # MB
-            
-            start_time = time.time()
-            
-            # 2. ЗАПУСК (Алгоритм багатопотоковості)
-            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-                list(executor.map(db_task, range(TOTAL_REQUESTS)))
-            
-            duration = time.time() - start_time
-            
-            # 3. Фіксуємо пам'ять ПІСЛЯ
-            mem_after = process.memory_info().rss / 1024 / 1024 # MB
-            mem_diff = max(0, mem_after - mem_before) # Скільки "з'їли"
-            
-            # Зберігаємо метрики
-            results.append({
-                'workers': workers, 
-                'time': round(duration, 3), 
-                'ram': round(mem_diff, 2)
-            })
-
-        # --- АЛГОРИТМ ПОШУКУ ОПТИМАЛЬНОГО ПАРАМЕТРА ---
-        # Шукаємо запис з мінімальним часом виконання
-        if results:
-            optimal_config = min(results, key=lambda x: x['time'])
-
-        # --- ВІЗУАЛІЗАЦІЯ (Dual Axis Chart) ---
-        df = pd.DataFrame(results)
-        
-        # Створюємо графік з двома осями Y
-        fig = make_subplots(specs=[[{"secondary_y": True}]])
-
-        # Лінія 1: Час (Ліва вісь)
-        fig.add_trace(
-            go.Scatter(
-                x=df['workers'], y=df['time'], name="Час (сек)",
-                mode='lines+markers', line=dict(color='#dc3545', width=3)
-            ),
-            secondary_y=False,
-        )
+    rows = []
 
-        # Лінія 2: RAM (Права вісь)
-        fig.add_trace(
-            go.Scatter(
-                x=df['workers'], y=df['ram'], name="RAM (MB)",
-                mode='lines+markers', line=dict(color='#0d6efd', width=3, dash='dot')
-            ),
-            secondary_y=True,
-        )
+    if results:
+        rows = [{'name': name, **row} for name, row in results['scenarios'].items()]
 
-        # Оформлення
+        # --- ВІЗУАЛІЗАЦІЯ: перцентилі латентності по сценаріях ---
+        names = [row['name'] for row in rows]
+        fig = go.Figure([
+            go.Bar(name=label, x=names, y=[row[key] for row in rows], marker_color=color)
+            for label, key, color in (
+                ('p50', 'p50_ms', '#28a745'), ('p95', 'p95_ms', '#ffc107'), ('p99', 'p99_ms', '#dc3545'),
+            )
+        ])
         fig.update_layout(
-            title_text=f"Результати тестування ({TOTAL_REQUESTS} запитів)",
-            hovermode="x unified",
-            legend=dict(orientation="h", y=1.1, x=0.5, xanchor="center")
+            barmode='group',
+            title_text=f"Латентність сценаріїв ({results['meta']['trials']} повторів)",
+            yaxis_title="мс",
+            legend=dict(orientation="h", y=1.1, x=0.5, xanchor="center"),
         )
-
-        fig.update_xaxes(title_text="Кількість потоків (Threads)")
-        fig.update_yaxes(title_text="<b>Час виконання (с)</b>", secondary_y=False)
-        fig.update_yaxes(title_text="<b>Використання RAM (MB)</b>", secondary_y=True)
-
-        graph = fig.to_html(full_html=False)
+        # Один графік без кешу - plotly.js з CDN, а не вбудований бандл на кілька МБ
+        graph = fig.to_html(full_html=False, include_plotlyjs='cdn')
 
     return render(request, 'web/performance.html', {
-        'graph': graph, 
-        'results': results,
-        'optimal': optimal_config,
-        'request_count': TOTAL_REQUESTS
+        'graph': graph,
+        'results': rows,
+        'meta': results['meta'] if results else None,
+        'results_file': settings.BENCHMARK_RESULTS_FILE,
     })
 
 # ==========================================
 # 5. CRUD
 # ==========================================
 
-class PassengerListView(ListView):
+class KeysetPaginationMixin:
+    # Курсорна пагінація (?cursor=...) замість ?page=N: без COUNT(*) і OFFSET
+    keyset_ordering = ('id',)
+    # Серверне сортування ?sort=<ключ> / ?sort=-<ключ> (лише з білого списку, під кожен ключ є індекс):
+    # ключ -> поля ORDER BY; id дописується в кінець як унікальний хвіст для курсора
+    sort_options = {}
+
+    def get_sort(self) -> str:
+        sort = self.request.GET.get('sort', '')
+        return sort if sort.lstrip('-') in self.sort_options else ''
+
+    def get_keyset_ordering(self):
+        sort = self.get_sort()
+        if not sort:
+            return self.keyset_ordering
+        prefix = '-' if sort.startswith('-') else ''
+        return tuple(f'{prefix}{field}' for field in (*self.sort_options[sort.lstrip('-')], 'id'))
+
+    def paginate_queryset(self, queryset, page_size):
+        page = paginate_keyset(queryset, self.get_keyset_ordering(), self.request.GET.get('cursor'), page_size)
+        return (None, page, page.object_list, page.has_next or page.has_previous)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['current_sort'] = self.get_sort()
+        return context
+
+class PassengerListView(KeysetPaginationMixin, ListView):
     model = Passenger
     template_name = 'web/passenger_list.html'
     context_object_name = 'passengers'
     paginate_by = 20
+    sort_options = {
+        'name': ('last_name', 'first_name'),
+        'age': ('age',),
+    }
+
+    def get_queryset(self):
+        # Лише колонки рядка таблиці (без фото, лічильників)
+        return repo.passengers.queryset('list_row')
 
 class PassengerCreateView(CreateView):
     model = Passenger
@@ -482,38 +469,126 @@ class PassengerDeleteView(DeleteView):
     template_name = 'web/passenger_confirm_delete.html'
     success_url = reverse_lazy('passenger_list')
 
-class CashierListView(ListView):
+class CashierListView(KeysetPaginationMixin, ListView):
     model = Cashier
     template_name = 'web/cashier_list.html'
     context_object_name = 'cashiers'
     paginate_by = 20
+    sort_options = {
+        'name': ('last_name', 'first_name'),
+        'hire_date': ('hire_date',),
+    }
+
+    def get_queryset(self):
+        # Лише колонки рядка таблиці (без фото, лічильників)
+        return repo.cashiers.queryset('list_row')
 
-class TripListView(ListView):
+class TripListView(KeysetPaginationMixin, ListView):
     model = Trip
     template_name = 'web/trip_list.html'
     context_object_name = 'trips'
     paginate_by = 20
 
-class TicketsListView(ListView):
+    def get_queryset(self):
+        return repo.trips.queryset('list_row')
+
+class TicketsListView(KeysetPaginationMixin, ListView):
     model = Ticket
     template_name = 'web/ticket_list.html'
     context_object_name = 'tickets'
     paginate_by = 20
+    keyset_ordering = ('-id',)
+    sort_options = {
+        'price': ('base_price',),
+        'date': ('purchase_date',),
+        'trip': ('trip_id',),
+        'passenger': ('passenger__last_name', 'passenger__first_name'),
+        'payment': ('payment_method',),
+    }
+
+    def get_filters(self) -> dict:
+        # ?price_min=&price_max=&date_from=&date_to=&trip=&passenger=&payment_method=; зіпсовані значення ігноруються
+        params = self.request.GET
+        filters = {}
+        for name in ('price_min', 'price_max'):
+            try:
+                value = Decimal(params[name])
+            except (KeyError, InvalidOperation):
+                continue
+            # NaN/Infinity - теж Decimal, але DecimalField їх не приймає (ValidationError у filter())
+            if value.is_finite():
+                filters[name] = value
+        for name in ('date_from', 'date_to'):
+            try:
+                value = parse_date(params.get(name) or '')
+            except (ValueError, ValidationError):
+                value = None
+            if value:
+                filters[name] = value
+        if params.get('trip', '').isdigit():
+            filters['trip'] = int(params['trip'])
+        for name in ('passenger', 'payment_method'):
+            if params.get(name, '').strip():
+                filters[name] = params[name].strip()
+        return filters
+
     def get_queryset(self):
-        return Ticket.objects.select_related('trip', 'passenger', 'cashier').all().order_by('-id')
+        # list_row: JOIN лише trip/passenger і лише колонки, потрібні таблиці та сортуванню
+        queryset = repo.tickets.queryset('list_row')
+        filters = self.filters = self.get_filters()
+        if 'price_min' in filters:
+            queryset = queryset.filter(base_price__gte=filters['price_min'])
+        if 'price_max' in filters:
+            queryset = queryset.filter(base_price__lte=filters['price_max'])
+        if 'date_from' in filters or 'date_to' in filters:
+            queryset = queryset.filter(AnalyticsFilters(
+                date_from=filters.get('date_from'), date_to=filters.get('date_to')
+            ).purchase_window())
+        if 'trip' in filters:
+            queryset = queryset.filter(trip_id=filters['trip'])
+        if 'passenger' in filters:
+            # Префікс, а не contains: LIKE 'abc%' використовує індекс по імені
+            name = filters['passenger']
+            queryset = queryset.filter(
+                Q(passenger__last_name__istartswith=name) | Q(passenger__first_name__istartswith=name)
+            )
+        if 'payment_method' in filters:
+            queryset = queryset.filter(payment_method=filters['payment_method'])
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['filters'] = self.filters
+        context['payment_methods'] = Ticket.objects.order_by('payment_method').values_list(
+            'payment_method', flat=True
+        ).distinct()
+        return context
 
 class TicketsDetailView(DetailView):
     model = Ticket
     template_name = 'web/ticket_detail.html'
     context_object_name = 'ticket'
 
-class TicketsCreateView(CreateView):
+    def get_queryset(self):
+        # Рейс (назва, фото) - тим самим запитом, а не окремим при зверненні шаблону до ticket.trip
+        return Ticket.objects.select_related('trip')
+
+class SoldOutFormMixin:
+    # Ticket.save() атомарно перевіряє місткість рейсу; показуємо це як помилку форми
+    def form_valid(self, form):
+        try:
+            return super().form_valid(form)
+        except SoldOut:
+            form.add_error('trip', "На цьому рейсі немає вільних місць")
+            return self.form_invalid(form)
+
+class TicketsCreateView(SoldOutFormMixin, CreateView):
     model = Ticket
     template_name = 'web/ticket_form.html'
     fields = ['trip', 'passenger', 'cashier', 'base_price', 'payment_method']
     success_url = reverse_lazy('tickets_list')
 
-class TicketsUpdateView(UpdateView):
+class TicketsUpdateView(SoldOutFormMixin, UpdateView):
     model = Ticket
     template_name = 'web/ticket_form.html'
     fields = ['trip', 'passenger', 'cashier', 'base_price', 'payment_method']